@@ -1,521 +1,770 @@
-# Metadata-Extractor Versi Deployement Ke Github Version 2
-
-import os
-import csv
-import datetime
-import threading
-import json
-import hashlib
-from typing import Dict, List, Any
-from pathlib import Path
-
-# GUI imports
-try:
-    from tkinterdnd2 import TkinterDnD, DND_FILES
-except ImportError:
-    raise ImportError("Please install tkinterdnd2: pip install tkinterdnd2")
-
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox, filedialog
-
-# Metadata extraction imports
-try:
-    from PIL import Image
-    from PIL.ExifTags import TAGS
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    print("Warning: PIL/Pillow not available. Image metadata extraction disabled.")
-
-try:
-    from pymediainfo import MediaInfo
-    MEDIAINFO_AVAILABLE = True
-except ImportError:
-    MEDIAINFO_AVAILABLE = False
-    print("Warning: pymediainfo not available. Media metadata extraction disabled.")
-
-# Supported file extensions
-IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.tiff', '.tif', '.png', '.bmp', '.gif', '.webp'}
-VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.m4v', '.webm'}
-AUDIO_EXTENSIONS = {'.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a'}
-DOCUMENT_EXTENSIONS = {'.pdf', '.doc', '.docx', '.txt', '.rtf'}
-
-class MetadataExtractor:
-    """Enhanced metadata extraction with error handling and performance optimization"""
-    
-    @staticmethod
-    def calculate_file_hash(filepath: str, algorithm: str = 'md5') -> str:
-        """Calculate file hash for integrity verification"""
-        try:
-            hash_obj = hashlib.new(algorithm)
-            with open(filepath, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_obj.update(chunk)
-            return hash_obj.hexdigest()
-        except Exception as e:
-            return f"Error: {str(e)}"
-    
-    @staticmethod
-    def get_file_type_category(filepath: str) -> str:
-        """Determine file category based on extension"""
-        ext = Path(filepath).suffix.lower()
-        if ext in IMAGE_EXTENSIONS:
-            return 'image'
-        elif ext in VIDEO_EXTENSIONS:
-            return 'video'
-        elif ext in AUDIO_EXTENSIONS:
-            return 'audio'
-        elif ext in DOCUMENT_EXTENSIONS:
-            return 'document'
-        else:
-            return 'other'
-    
-    @staticmethod
-    def extract_basic_metadata(filepath: str) -> Dict[str, Any]:
-        """Extract basic file system metadata"""
-        try:
-            stat = os.stat(filepath)
-            path_obj = Path(filepath)
-            
-            return {
-                'filename': path_obj.name,
-                'filepath': str(path_obj.absolute()),
-                'directory': str(path_obj.parent),
-                'extension': path_obj.suffix.lower(),
-                'file_type': MetadataExtractor.get_file_type_category(filepath),
-                'size_bytes': stat.st_size,
-                'size_mb': round(stat.st_size / (1024 * 1024), 2),
-                'created': datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                'modified': datetime.datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                'accessed': datetime.datetime.fromtimestamp(stat.st_atime).isoformat(),
-                'permissions': oct(stat.st_mode)[-3:],
-                'md5_hash': MetadataExtractor.calculate_file_hash(filepath, 'md5'),
-                'extraction_timestamp': datetime.datetime.now().isoformat()
-            }
-        except Exception as e:
-            return {'error': f"Failed to extract basic metadata: {str(e)}"}
-    
-    @staticmethod
-    def extract_image_metadata(filepath: str) -> Dict[str, Any]:
-        """Extract EXIF data from images"""
-        if not PIL_AVAILABLE:
-            return {'error': 'PIL/Pillow not available'}
-        
-        metadata = {}
-        try:
-            with Image.open(filepath) as img:
-                # Basic image info
-                metadata.update({
-                    'image_width': img.width,
-                    'image_height': img.height,
-                    'image_mode': img.mode,
-                    'image_format': img.format,
-                    'has_transparency': img.mode in ('RGBA', 'LA') or 'transparency' in img.info
-                })
-                
-                # EXIF data
-                exif_data = img._getexif()
-                if exif_data:
-                    for tag_id, value in exif_data.items():
-                        tag = TAGS.get(tag_id, f"Unknown_{tag_id}")
-                        # Convert complex objects to strings
-                        if isinstance(value, (bytes, tuple)):
-                            value = str(value)
-                        metadata[f'exif_{tag}'] = value
-                else:
-                    metadata['exif_status'] = 'No EXIF data found'
-                    
-        except Exception as e:
-            metadata['image_error'] = str(e)
-        
-        return metadata
-    
-    @staticmethod
-    def extract_media_metadata(filepath: str) -> Dict[str, Any]:
-        """Extract metadata from video/audio files"""
-        if not MEDIAINFO_AVAILABLE:
-            return {'error': 'pymediainfo not available'}
-        
-        metadata = {}
-        try:
-            media_info = MediaInfo.parse(filepath)
-            
-            for track in media_info.tracks:
-                track_type = track.track_type.lower()
-                track_data = track.to_data()
-                
-                # Add track-specific prefix
-                for attr, val in track_data.items():
-                    if val is not None and val != '':
-                        key = f'{track_type}_{attr}'
-                        metadata[key] = val
-                        
-        except Exception as e:
-            metadata['media_error'] = str(e)
-        
-        return metadata
-    
-    @staticmethod
-    def extract_all_metadata(filepath: str) -> Dict[str, Any]:
-        """Extract comprehensive metadata from a file"""
-        if not os.path.isfile(filepath):
-            return {'error': f'File not found: {filepath}'}
-        
-        # Start with basic metadata
-        metadata = MetadataExtractor.extract_basic_metadata(filepath)
-        
-        if 'error' in metadata:
-            return metadata
-        
-        file_type = metadata.get('file_type', 'other')
-        ext = metadata.get('extension', '').lower()
-        
-        # Extract type-specific metadata
-        if file_type == 'image' and ext in IMAGE_EXTENSIONS:
-            image_meta = MetadataExtractor.extract_image_metadata(filepath)
-            metadata.update(image_meta)
-        
-        elif file_type in ['video', 'audio'] and (ext in VIDEO_EXTENSIONS or ext in AUDIO_EXTENSIONS):
-            media_meta = MetadataExtractor.extract_media_metadata(filepath)
-            metadata.update(media_meta)
-        
-        return metadata
-
-class CSVManager:
-    """Enhanced CSV management with better error handling"""
-    
-    @staticmethod
-    def write_metadata_row(metadata: Dict[str, Any], csv_file_path: str) -> bool:
-        """Write metadata to CSV file with improved error handling"""
-        try:
-            file_exists = os.path.isfile(csv_file_path)
-            
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(csv_file_path), exist_ok=True)
-            
-            with open(csv_file_path, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=metadata.keys())
-                
-                if not file_exists:
-                    writer.writeheader()
-                
-                writer.writerow(metadata)
-            return True
-            
-        except Exception as e:
-            print(f"Error writing to CSV: {str(e)}")
-            return False
-    
-    @staticmethod
-    def export_to_json(metadata_list: List[Dict], json_file_path: str) -> bool:
-        """Export metadata to JSON format"""
-        try:
-            with open(json_file_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata_list, f, indent=2, ensure_ascii=False)
-            return True
-        except Exception as e:
-            print(f"Error writing to JSON: {str(e)}")
-            return False
-
-class MetadataExtractorApp:
-    """Enhanced GUI application with better UX and features"""
-    
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Enhanced Metadata Extractor v2.0 by @Tactical_Scientist")
-        self.root.geometry("900x700")
-        
-        # Data storage
-        self.processed_files = []
-        self.current_metadata = []
-        
-        self.setup_menu()
-        self.setup_widgets()
-        self.setup_status_bar()
-    
-    def setup_menu(self):
-        """Create application menu"""
-        menubar = tk.Menu(self.root)
-        self.root.config(menu=menubar)
-        
-        # File menu
-        file_menu = tk.Menu(menubar, tearoff=0)
-        menubar.add_cascade(label="File", menu=file_menu)
-        file_menu.add_command(label="Open Files...", command=self.open_files)
-        file_menu.add_separator()
-        file_menu.add_command(label="Export to JSON...", command=self.export_json)
-        file_menu.add_command(label="Clear Output", command=self.clear_output)
-        file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.root.quit)
-        
-        # Help menu
-        help_menu = tk.Menu(menubar, tearoff=0)
-        menubar.add_cascade(label="Help", menu=help_menu)
-        help_menu.add_command(label="About", command=self.show_about)
-    
-    def setup_widgets(self):
-        """Setup main application widgets"""
-        main_frame = ttk.Frame(self.root, padding=10)
-        main_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Instructions
-        instruction_frame = ttk.LabelFrame(main_frame, text="Instructions", padding=5)
-        instruction_frame.pack(fill=tk.X, pady=(0, 10))
-        
-        ttk.Label(instruction_frame, 
-                 text="Drag & drop files here, or use File > Open Files... to select files").pack(anchor=tk.W)
-        
-        # Processing options
-        options_frame = ttk.LabelFrame(main_frame, text="Options", padding=5)
-        options_frame.pack(fill=tk.X, pady=(0, 10))
-        
-        self.include_hash = tk.BooleanVar(value=True)
-        ttk.Checkbutton(options_frame, text="Include file hash (MD5)", 
-                       variable=self.include_hash).pack(side=tk.LEFT)
-        
-        self.auto_export = tk.BooleanVar(value=True)
-        ttk.Checkbutton(options_frame, text="Auto-export to CSV", 
-                       variable=self.auto_export).pack(side=tk.LEFT, padx=(20, 0))
-        
-        # Progress bar
-        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
-        self.progress.pack(fill=tk.X, pady=(0, 5))
-        
-        # Output text area
-        text_frame = ttk.LabelFrame(main_frame, text="Output", padding=5)
-        text_frame.pack(fill=tk.BOTH, expand=True)
-        
-        self.text = scrolledtext.ScrolledText(text_frame, width=100, height=25, 
-                                            font=('Consolas', 9))
-        self.text.pack(fill=tk.BOTH, expand=True)
-        
-        # Control buttons
-        button_frame = ttk.Frame(main_frame)
-        button_frame.pack(fill=tk.X, pady=(10, 0))
-        
-        ttk.Button(button_frame, text="Open Files", 
-                  command=self.open_files).pack(side=tk.LEFT)
-        ttk.Button(button_frame, text="Clear Output", 
-                  command=self.clear_output).pack(side=tk.LEFT, padx=(5, 0))
-        ttk.Button(button_frame, text="Export JSON", 
-                  command=self.export_json).pack(side=tk.LEFT, padx=(5, 0))
-        
-        # Enable drag-and-drop
-        self.root.drop_target_register(DND_FILES)
-        self.root.dnd_bind('<<Drop>>', self.on_drop)
-    
-    def setup_status_bar(self):
-        """Setup status bar"""
-        self.status_bar = ttk.Label(self.root, text="Ready", relief=tk.SUNKEN, anchor=tk.W)
-        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
-    
-    def update_status(self, message: str):
-        """Update status bar message"""
-        self.status_bar.config(text=message)
-        self.root.update_idletasks()
-    
-    def on_drop(self, event):
-        """Handle drag-and-drop files"""
-        files = self.root.splitlist(event.data)
-        self.process_files_async(files)
-    
-    def open_files(self):
-        """Open file dialog to select files"""
-        filetypes = [
-            ("All files", "*.*"),
-            ("Images", "*.jpg *.jpeg *.png *.tiff *.bmp *.gif *.webp"),
-            ("Videos", "*.mp4 *.mov *.avi *.mkv *.flv *.wmv *.m4v *.webm"),
-            ("Audio", "*.mp3 *.wav *.flac *.aac *.ogg *.wma *.m4a")
-        ]
-        
-        files = filedialog.askopenfilenames(
-            title="Select files to extract metadata",
-            filetypes=filetypes
-        )
-        
-        if files:
-            self.process_files_async(files)
-    
-    def process_files_async(self, file_list):
-        """Process files in background thread"""
-        threading.Thread(target=self.process_files, args=(file_list,), daemon=True).start()
-    
-    def process_files(self, file_list):
-        """Process multiple files and extract metadata"""
-        self.root.after(0, lambda: self.progress.start())
-        self.root.after(0, lambda: self.update_status("Processing files..."))
-        
-        total_files = len(file_list)
-        processed = 0
-        
-        for filepath in file_list:
-            # Clean filepath (remove braces if present)
-            filepath = filepath.strip('{}').strip('"').strip("'")
-            
-            if not os.path.isfile(filepath):
-                self.root.after(0, lambda f=filepath: self.log_message(f"Skipped: {f} (not a file)\n"))
-                continue
-            
-            processed += 1
-            self.root.after(0, lambda p=processed, t=total_files: 
-                          self.update_status(f"Processing file {p}/{t}..."))
-            
-            # Extract metadata
-            metadata = MetadataExtractor.extract_all_metadata(filepath)
-            
-            if 'error' in metadata:
-                self.root.after(0, lambda f=filepath, e=metadata['error']: 
-                              self.log_message(f"Error processing {f}: {e}\n"))
-                continue
-            
-            # Store metadata
-            self.current_metadata.append(metadata)
-            self.processed_files.append(filepath)
-            
-            # Display results
-            self.root.after(0, lambda m=metadata: self.display_metadata(m))
-            
-            # Auto-export to CSV if enabled
-            if self.auto_export.get():
-                folder = os.path.dirname(os.path.abspath(filepath))
-                csv_path = os.path.join(folder, 'metadata_output.csv')
-                CSVManager.write_metadata_row(metadata, csv_path)
-        
-        self.root.after(0, lambda: self.progress.stop())
-        self.root.after(0, lambda: self.update_status(f"Completed processing {processed} files"))
-    
-    def display_metadata(self, metadata: Dict[str, Any]):
-        """Display metadata in the text widget"""
-        filename = metadata.get('filename', 'Unknown')
-        
-        self.text.insert(tk.END, f"{'='*60}\n")
-        self.text.insert(tk.END, f"METADATA FOR: {filename}\n")
-        self.text.insert(tk.END, f"{'='*60}\n")
-        
-        # Group metadata by category
-        categories = {
-            'File Info': [],
-            'Image Data': [],
-            'Media Data': [],
-            'EXIF Data': [],
-            'Other': []
-        }
-        
-        for key, value in metadata.items():
-            if key.startswith('exif_'):
-                categories['EXIF Data'].append((key, value))
-            elif key.startswith(('image_', 'video_', 'audio_', 'general_')):
-                categories['Media Data'].append((key, value))
-            elif key in ['filename', 'filepath', 'size_bytes', 'size_mb', 'file_type', 'extension']:
-                categories['File Info'].append((key, value))
-            else:
-                categories['Other'].append((key, value))
-        
-        # Display by category
-        for category, items in categories.items():
-            if items:
-                self.text.insert(tk.END, f"\n[{category}]\n")
-                for key, value in sorted(items):
-                    self.text.insert(tk.END, f"  {key}: {value}\n")
-        
-        self.text.insert(tk.END, "\n")
-        self.text.see(tk.END)
-    
-    def log_message(self, message: str):
-        """Log a message to the text widget"""
-        self.text.insert(tk.END, message)
-        self.text.see(tk.END)
-    
-    def clear_output(self):
-        """Clear the output text widget"""
-        self.text.delete(1.0, tk.END)
-        self.current_metadata.clear()
-        self.processed_files.clear()
-        self.update_status("Output cleared")
-    
-    def export_json(self):
-        """Export current metadata to JSON file"""
-        if not self.current_metadata:
-            messagebox.showwarning("No Data", "No metadata to export. Process some files first.")
-            return
-        
-        filename = filedialog.asksaveasfilename(
-            title="Export metadata to JSON",
-            defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
-        )
-        
-        if filename:
-            if CSVManager.export_to_json(self.current_metadata, filename):
-                messagebox.showinfo("Success", f"Metadata exported to {filename}")
-                self.update_status(f"Exported to {filename}")
-            else:
-                messagebox.showerror("Error", "Failed to export metadata")
-    
-    def show_about(self):
-        """Show about dialog"""
-        about_text = """Enhanced Metadata Extractor v2.0
-        
-Created by @Tactical_Scientist
-
-Features:
-• Drag & drop support for multiple files
-• Comprehensive metadata extraction for images, videos, and audio
-• Export to CSV and JSON formats
-• File hash calculation for integrity verification
-• Enhanced error handling and user interface
-
-Supported formats:
-• Images: JPG, PNG, TIFF, BMP, GIF, WebP
-• Videos: MP4, MOV, AVI, MKV, FLV, WMV, M4V, WebM
-• Audio: MP3, WAV, FLAC, AAC, OGG, WMA, M4A
-
-Dependencies:
-• tkinterdnd2: Drag & drop support
-• Pillow (PIL): Image metadata extraction
-• pymediainfo: Video/audio metadata extraction"""
-        
-        messagebox.showinfo("About", about_text)
-
-def check_dependencies():
-    """Check and report missing dependencies"""
-    missing = []
-    
-    try:
-        import tkinterdnd2
-    except ImportError:
-        missing.append("tkinterdnd2")
-    
-    if not PIL_AVAILABLE:
-        missing.append("Pillow")
-    
-    if not MEDIAINFO_AVAILABLE:
-        missing.append("pymediainfo")
-    
-    if missing:
-        deps = ", ".join(missing)
-        message = f"Missing dependencies: {deps}\n\nInstall with:\npip install {' '.join(missing)}"
-        messagebox.showerror("Missing Dependencies", message)
-        return False
-    
-    return True
-
-def main():
-    """Main application entry point"""
-    if not check_dependencies():
-        return
-    
-    root = TkinterDnD.Tk()
-    app = MetadataExtractorApp(root)
-    
-    # Set window icon (if available)
-    try:
-        root.iconbitmap("icon.ico")  # Add your icon file
-    except:
-        pass
-    
-    root.mainloop()
-
-if __name__ == "__main__":
-
-    main()
+# Metadata-Extractor Versi Deployement Ke Github Version 2
+
+import datetime
+import json
+import os
+import queue
+import shutil
+import threading
+from array import array
+from typing import Dict, Any, List, Sequence, Optional, Callable
+
+# GUI imports
+import tkinter as tk
+from tkinter import ttk, scrolledtext, messagebox, filedialog
+
+# Drag-and-drop is optional: without it files are opened via File > Open Files...
+try:
+    from tkinterdnd2 import TkinterDnD, DND_FILES
+    DND_AVAILABLE = True
+except ImportError:
+    DND_AVAILABLE = False
+
+# Metadata extraction core (shared with the headless batch CLI). The classes
+# are re-exported for scripts that used to import them from this file; new
+# code should import them from metadata_extractor directly.
+from metadata_extractor.core import (
+    MetadataExtractor, CSVManager, PIL_AVAILABLE, MEDIAINFO_AVAILABLE
+)
+from metadata_extractor.archives import ArchiveExtractor
+from metadata_extractor.iosched import DeviceScheduler
+from metadata_extractor.jobs import DEFAULT_JOBS_DIR, ExtractionJob, unfinished_jobs
+from metadata_extractor.metrics import METRICS
+from metadata_extractor.pipeline import StagedPipeline
+from metadata_extractor.projection import plan_projection
+from metadata_extractor.sinks import CSVWriterPool, SessionJournal
+from metadata_extractor.watch import DEFAULT_JOURNAL_NAME, FolderWatcher
+
+# Worker updates are applied to the UI in batches once per frame (~20 fps)
+FRAME_INTERVAL_MS = 50
+
+# Cap on queued updates applied in a single frame, so bursts cannot stall the UI
+MAX_UPDATES_PER_FRAME = 2000
+
+# The performance panel is redrawn every this many frames (~2 per second)
+METRICS_REFRESH_FRAMES = 10
+
+class VirtualResultsTable(ttk.Frame):
+    """Results table that only keeps the visible rows in the Treeview
+
+    Row values live in a plain list; the Treeview holds one screenful of
+    item slots that are refilled on scroll, resize or new rows, so the
+    widget stays the same size whether 10 or 100,000 files were processed.
+    """
+    
+    COLUMNS = (
+        ('file', 'File', 260),
+        ('type', 'Type', 70),
+        ('size', 'Size (MB)', 80),
+        ('modified', 'Modified', 140),
+        ('status', 'Status', 260),
+    )
+    
+    def __init__(self, master, on_select: Optional[Callable[[int], None]] = None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_select = on_select
+        self.rows = []
+        self.refs = array('q')  # per-row reference (journal offset), -1 if none
+        self.first = 0
+        self.visible = 20
+        self.selected = None
+        
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in self.COLUMNS],
+                                 show='headings', selectmode='browse')
+        for name, heading, width in self.COLUMNS:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, width=width, anchor=tk.W, stretch=name in ('file', 'status'))
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self.tree.bind('<MouseWheel>', self._on_wheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Up>', lambda e: self._move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self._move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self._move_selection(-self.visible))
+        self.tree.bind('<Next>', lambda e: self._move_selection(self.visible))
+        self.tree.bind('<Home>', lambda e: self._move_selection(-len(self.rows)))
+        self.tree.bind('<End>', lambda e: self._move_selection(len(self.rows)))
+    
+    def append(self, rows: List[Sequence[str]], refs: List[int]):
+        """Add a batch of rows; follows the tail if the view was at the bottom"""
+        at_bottom = self.first + self.visible >= len(self.rows)
+        self.rows.extend(rows)
+        self.refs.extend(refs)
+        if at_bottom:
+            self.first = len(self.rows) - self.visible
+        self.render()
+    
+    def clear(self):
+        """Remove every row"""
+        self.rows = []
+        self.refs = array('q')
+        self.first = 0
+        self.selected = None
+        self.render()
+    
+    def render(self):
+        """Refill the visible item slots from the row list"""
+        total = len(self.rows)
+        self.first = max(0, min(self.first, total - self.visible))
+        count = min(self.visible, total - self.first)
+        
+        slots = self.tree.get_children()
+        if len(slots) > count:
+            self.tree.delete(*slots[count:])
+        for slot in range(count):
+            values = self.rows[self.first + slot]
+            if slot < len(slots):
+                self.tree.item(slots[slot], values=values)
+            else:
+                self.tree.insert('', tk.END, iid=str(slot), values=values)
+        
+        if self.selected is not None and self.first <= self.selected < self.first + count:
+            self.tree.selection_set(str(self.selected - self.first))
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+        
+        if total:
+            self.scrollbar.set(self.first / total, (self.first + count) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def scroll(self, delta: int):
+        """Scroll by `delta` rows"""
+        self.first += delta
+        self.render()
+    
+    def select(self, index: int):
+        """Select a row by index, scrolling it into view"""
+        if not self.rows:
+            return
+        index = max(0, min(index, len(self.rows) - 1))
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + self.visible:
+            self.first = index - self.visible + 1
+        self.selected = index
+        self.render()
+        if self.on_select:
+            self.on_select(index)
+    
+    def _move_selection(self, step: int):
+        """Keyboard navigation across the whole row list, not just the slots"""
+        start = self.selected if self.selected is not None else self.first - 1
+        self.select(start + step)
+        return 'break'
+    
+    def _on_tree_select(self, event):
+        """Map the selected slot back to a row index"""
+        selection = self.tree.selection()
+        if not selection:
+            return
+        index = self.first + int(selection[0])
+        if index == self.selected or index >= len(self.rows):
+            return
+        self.selected = index
+        if self.on_select:
+            self.on_select(index)
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        """Handle scrollbar drags and arrow/trough clicks"""
+        if action == 'moveto':
+            self.first = int(float(amount) * len(self.rows))
+            self.render()
+        elif action == 'scroll':
+            step = int(amount)
+            self.scroll(step * self.visible if unit == 'pages' else step)
+    
+    def _on_wheel(self, event):
+        """Mouse wheel on Windows/macOS"""
+        self.scroll(-3 if event.delta > 0 else 3)
+        return 'break'
+    
+    def _on_resize(self, event):
+        """Recompute how many rows fit in the widget"""
+        slots = self.tree.get_children()
+        bbox = self.tree.bbox(slots[0]) if slots else ''
+        if bbox:
+            header, row_height = bbox[1], bbox[3]
+        else:
+            header, row_height = 25, 20
+        visible = max(1, (event.height - header) // max(1, row_height))
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+class MetadataExtractorApp:
+    """Enhanced GUI application with better UX and features"""
+    
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Enhanced Metadata Extractor v2.0 by @Tactical_Scientist")
+        self.root.geometry("900x700")
+        
+        # Records are streamed to a session spool instead of kept in memory
+        self.session = SessionJournal()
+        
+        # Worker threads never touch widgets; they post here instead
+        self.ui_queue = queue.Queue()
+        self.frame_count = 0
+        
+        # Set to stop the drop-folder watcher thread
+        self.watch_stop = None
+        
+        self.setup_menu()
+        self.setup_widgets()
+        self.setup_status_bar()
+        self.toggle_metrics()
+        self.root.after(FRAME_INTERVAL_MS, self.drain_ui_queue)
+        self.root.after(0, self.offer_resume)
+    
+    def setup_menu(self):
+        """Create application menu"""
+        menubar = tk.Menu(self.root)
+        self.root.config(menu=menubar)
+        
+        # File menu
+        file_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="File", menu=file_menu)
+        file_menu.add_command(label="Open Files...", command=self.open_files)
+        file_menu.add_command(label="Watch Folder...", command=self.watch_folder)
+        file_menu.add_command(label="Stop Watching", command=self.stop_watching)
+        file_menu.add_separator()
+        file_menu.add_command(label="Export to JSON...", command=self.export_json)
+        file_menu.add_command(label="Export Performance Report...", command=self.export_metrics)
+        file_menu.add_command(label="Clear Output", command=self.clear_output)
+        file_menu.add_separator()
+        file_menu.add_command(label="Exit", command=self.root.quit)
+        
+        # Help menu
+        help_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Help", menu=help_menu)
+        help_menu.add_command(label="About", command=self.show_about)
+    
+    def setup_widgets(self):
+        """Setup main application widgets"""
+        main_frame = ttk.Frame(self.root, padding=10)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Instructions
+        instruction_frame = ttk.LabelFrame(main_frame, text="Instructions", padding=5)
+        instruction_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(instruction_frame, 
+                 text="Drag & drop files here, or use File > Open Files... to select files"
+                      if DND_AVAILABLE else
+                      "Use File > Open Files... to select files (install tkinterdnd2 for drag & drop)"
+                 ).pack(anchor=tk.W)
+        
+        # Processing options
+        options_frame = ttk.LabelFrame(main_frame, text="Options", padding=5)
+        options_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.include_hash = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Include file hash (MD5)", 
+                       variable=self.include_hash).pack(side=tk.LEFT)
+        
+        self.auto_export = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Auto-export to CSV", 
+                       variable=self.auto_export).pack(side=tk.LEFT, padx=(20, 0))
+        
+        self.deep_media = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Deep media analysis (MediaInfo)", 
+                       variable=self.deep_media).pack(side=tk.LEFT, padx=(20, 0))
+        
+        self.scan_archives = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Scan inside archives", 
+                       variable=self.scan_archives).pack(side=tk.LEFT, padx=(20, 0))
+        
+        self.collect_metrics = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Performance metrics", variable=self.collect_metrics,
+                       command=self.toggle_metrics).pack(side=tk.LEFT, padx=(20, 0))
+        
+        # Progress bar
+        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
+        self.progress.pack(fill=tk.X, pady=(0, 5))
+        
+        # Results table (one row per file) above the details of the selected file
+        panes = ttk.PanedWindow(main_frame, orient=tk.VERTICAL)
+        panes.pack(fill=tk.BOTH, expand=True)
+        
+        results_frame = ttk.LabelFrame(panes, text="Results", padding=5)
+        self.results = VirtualResultsTable(results_frame, on_select=self.show_details)
+        self.results.pack(fill=tk.BOTH, expand=True)
+        panes.add(results_frame, weight=3)
+        
+        details_frame = ttk.LabelFrame(panes, text="Details", padding=5)
+        self.text = scrolledtext.ScrolledText(details_frame, width=100, height=12, 
+                                            font=('Consolas', 9))
+        self.text.pack(fill=tk.BOTH, expand=True)
+        panes.add(details_frame, weight=2)
+        
+        # Control buttons
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        ttk.Button(button_frame, text="Open Files", 
+                  command=self.open_files).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text="Clear Output", 
+                  command=self.clear_output).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(button_frame, text="Export JSON", 
+                  command=self.export_json).pack(side=tk.LEFT, padx=(5, 0))
+        
+        # Enable drag-and-drop
+        if DND_AVAILABLE:
+            self.root.drop_target_register(DND_FILES)
+            self.root.dnd_bind('<<Drop>>', self.on_drop)
+    
+    def setup_status_bar(self):
+        """Setup status bar"""
+        self.status_bar = ttk.Label(self.root, text="Ready", relief=tk.SUNKEN, anchor=tk.W)
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        # Live per-stage timings (stat, hash, parsers, CSV) above the status line
+        self.metrics_bar = ttk.Label(self.root, text="", anchor=tk.W, font=('Consolas', 8))
+        self.metrics_bar.pack(side=tk.BOTTOM, fill=tk.X)
+    
+    def toggle_metrics(self):
+        """Switch stage instrumentation on or off"""
+        METRICS.enabled = self.collect_metrics.get()
+        if not METRICS.enabled:
+            self.metrics_bar.config(text="")
+    
+    def refresh_metrics(self):
+        """Redraw the performance panel"""
+        if METRICS.enabled:
+            self.metrics_bar.config(text=METRICS.format_line())
+    
+    def update_status(self, message: str):
+        """Update status bar message"""
+        self.status_bar.config(text=message)
+        self.root.update_idletasks()
+    
+    def on_drop(self, event):
+        """Handle drag-and-drop files"""
+        files = self.root.splitlist(event.data)
+        self.process_files_async(files)
+    
+    def open_files(self):
+        """Open file dialog to select files"""
+        filetypes = [
+            ("All files", "*.*"),
+            ("Images", "*.jpg *.jpeg *.png *.tiff *.bmp *.gif *.webp"),
+            ("Videos", "*.mp4 *.mov *.avi *.mkv *.flv *.wmv *.m4v *.webm"),
+            ("Audio", "*.mp3 *.wav *.flac *.aac *.ogg *.wma *.m4a")
+        ]
+        
+        files = filedialog.askopenfilenames(
+            title="Select files to extract metadata",
+            filetypes=filetypes
+        )
+        
+        if files:
+            self.process_files_async(files)
+    
+    def watch_folder(self):
+        """Process files dropped into a folder as soon as they finish copying"""
+        folder = filedialog.askdirectory(title="Select a folder to watch")
+        if not folder:
+            return
+        self.stop_watching()
+        self.watch_stop = threading.Event()
+        threading.Thread(target=self.run_watcher, args=(folder, self.watch_stop),
+                         daemon=True).start()
+    
+    def stop_watching(self):
+        """Stop the folder watcher, if one is running"""
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+            self.watch_stop = None
+    
+    def run_watcher(self, folder: str, stop: threading.Event):
+        """Watcher thread: hand each settled batch to process_files"""
+        try:
+            watcher = FolderWatcher([folder], os.path.join(folder, DEFAULT_JOURNAL_NAME),
+                                    exclude_names=('metadata_output.csv', 'metadata_output.csv.tmp'))
+        except OSError as e:
+            self.ui_queue.put(('status', f"Cannot watch {folder}: {str(e)}"))
+            return
+        self.ui_queue.put(('status', f"Watching {folder} ({watcher.mode})"))
+        try:
+            for batch in watcher.batches(stop):
+                # The watch journal already makes batches resumable
+                self.process_files([filepath for filepath, _ in batch], resumable=False)
+                # Journaled only after the batch was written, so a crash repeats it
+                watcher.mark_processed(batch)
+                self.ui_queue.put(('status', f"Watching {folder} ({watcher.mode})"))
+        finally:
+            watcher.close()
+        self.ui_queue.put(('status', f"Stopped watching {folder}"))
+    
+    def offer_resume(self):
+        """Offer to resume extractions interrupted by a crash or reboot"""
+        resume = []
+        for job_dir in unfinished_jobs():
+            if messagebox.askyesno("Resume Interrupted Job",
+                                   f"An extraction started {os.path.basename(job_dir)} did not "
+                                   f"finish.\n\nResume it where it stopped?"):
+                resume.append(job_dir)
+            else:
+                shutil.rmtree(job_dir, ignore_errors=True)
+        if resume:
+            threading.Thread(target=lambda: [self.process_files([], job_dir) for job_dir in resume],
+                             daemon=True).start()
+    
+    def process_files_async(self, file_list):
+        """Process files in background thread"""
+        threading.Thread(target=self.process_files, args=(file_list,), daemon=True).start()
+    
+    def process_files(self, file_list, job_dir: Optional[str] = None, resumable: bool = True):
+        """Process multiple files and extract metadata
+        
+        Progress is checkpointed to a job under DEFAULT_JOBS_DIR (unless
+        `resumable` is False), so a crash loses at most a few seconds of
+        work; pass `job_dir` to resume such a job.
+        """
+        self.ui_queue.put(('progress', True))
+        self.ui_queue.put(('status', "Processing files..."))
+        
+        job = None
+        auto_export = self.auto_export.get()
+        include_hash = self.include_hash.get()
+        deep_media = self.deep_media.get()
+        scan_archives = self.scan_archives.get()
+        if job_dir is not None:
+            try:
+                job = ExtractionJob(job_dir)
+            except (ValueError, OSError) as e:
+                self.ui_queue.put(('progress', False))
+                self.ui_queue.put(('status', f"Cannot resume job {job_dir}: {str(e)}"))
+                return
+            # The job runs with the settings it was started with
+            file_list = job.params['files']
+            auto_export = job.params['auto_export']
+            include_hash = job.params['include_hash']
+            deep_media = job.params['deep_media']
+            scan_archives = job.params['archives']
+        
+        files = []
+        for filepath in file_list:
+            # Clean filepath (remove braces if present)
+            filepath = filepath.strip('{}').strip('"').strip("'")
+            
+            if not os.path.isfile(filepath):
+                self.log_message(filepath, "Skipped (not a file)")
+                continue
+            files.append(filepath)
+        
+        if job is None and resumable:
+            name = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            job = ExtractionJob(os.path.join(DEFAULT_JOBS_DIR, name),
+                                {'files': files, 'auto_export': auto_export,
+                                 'include_hash': include_hash, 'deep_media': deep_media,
+                                 'archives': scan_archives})
+        
+        def csv_path_for(metadata):
+            # 'directory' is real even for archive members (whose filepath is virtual)
+            folder = os.path.abspath(metadata.get('directory')
+                                     or os.path.dirname(metadata['filepath']))
+            return os.path.join(folder, 'metadata_output.csv')
+        
+        total_files = len(files)
+        processed = 0
+        if job is not None:
+            # CSVs are written from the journaled records once all files are done
+            csv_pool = CSVWriterPool(before_finalize=job.before_csv, after_finalize=job.after_csv)
+            for metadata in job.replay():
+                offset = self.session.write(metadata)
+                self.ui_queue.put(('row', (self.summarize(metadata), offset)))
+            processed = job.done_files
+            files = list(job.pending(files))
+        else:
+            csv_pool = CSVWriterPool()
+        
+        try:
+            if job is None or not job.extracted:
+                # Stat, hashing and header parsing overlap on separate stage threads
+                # Unticking "Include file hash" skips the whole-file read, not just the column
+                projection = plan_projection(exclude=() if include_hash else ('hashes',))
+                # Dropped files may span an SSD, a USB disk and a share: reads are
+                # scheduled per device, each with its own adaptive concurrency
+                pipeline = StagedPipeline(deep_media=deep_media, projection=projection,
+                                          io_scheduler=DeviceScheduler())
+                records = pipeline.run(files)
+                if scan_archives:
+                    # Members are streamed from the archive, never unpacked to disk
+                    records = ArchiveExtractor(deep_media=deep_media,
+                                               projection=projection).expand(records)
+                for metadata in records:
+                    filepath = metadata.get('filepath', '')
+                    if 'parent_path' in metadata:
+                        self.ui_queue.put(('status', f"Scanning archive {metadata['parent_path']}..."))
+                    else:
+                        processed += 1
+                        self.ui_queue.put(('status', f"Processing file {processed}/{total_files}..."))
+                    
+                    if 'error' in metadata:
+                        self.log_message(filepath, f"Error: {metadata['error']}")
+                        continue
+                    
+                    # Store metadata; the table only keeps a summary and the spool offset
+                    offset = self.session.write(metadata)
+                    self.ui_queue.put(('row', (self.summarize(metadata), offset)))
+                    
+                    if job is not None:
+                        job.write(metadata)
+                    elif auto_export:
+                        csv_pool.write(csv_path_for(metadata), metadata)
+            
+            if job is not None:
+                job.finish_extraction()
+                if auto_export:
+                    for metadata in job.replay():
+                        csv_pool.write(csv_path_for(metadata), metadata)
+        finally:
+            if job is not None and not job.extracted:
+                job.close()
+        
+        # Headers are decided here, once every row's columns are known
+        exported = csv_pool.close()
+        if job is not None:
+            if exported:
+                job.discard()
+            else:
+                job.close()  # the export is redone when the job is resumed
+        
+        self.ui_queue.put(('progress', False))
+        self.ui_queue.put(('status', f"Completed processing {processed} files"))
+    
+    def drain_ui_queue(self):
+        """Apply queued worker updates in one batch, then wait for the next frame"""
+        rows, refs = [], []
+        status = None
+        for _ in range(MAX_UPDATES_PER_FRAME):
+            try:
+                kind, payload = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'row':
+                rows.append(payload[0])
+                refs.append(payload[1])
+            elif kind == 'status':
+                status = payload  # only the latest status is worth drawing
+            elif kind == 'progress':
+                if payload:
+                    self.progress.start()
+                else:
+                    self.progress.stop()
+                    self.refresh_metrics()
+        
+        if rows:
+            self.results.append(rows, refs)
+        if status is not None:
+            self.update_status(status)
+        self.frame_count += 1
+        if self.frame_count % METRICS_REFRESH_FRAMES == 0:
+            self.refresh_metrics()
+        self.root.after(FRAME_INTERVAL_MS, self.drain_ui_queue)
+    
+    @staticmethod
+    def summarize(metadata: Dict[str, Any]) -> tuple:
+        """Table row for one record"""
+        status = metadata.get('image_error') or metadata.get('media_error') or 'OK'
+        if status == 'OK' and metadata.get('type_mismatch'):
+            status = f"Type mismatch ({metadata.get('detected_format') or 'unknown'})"
+        return (
+            metadata.get('filename', ''),
+            metadata.get('file_type', ''),
+            metadata.get('size_mb', ''),
+            str(metadata.get('modified', ''))[:19].replace('T', ' '),
+            status,
+        )
+    
+    def show_details(self, index: int):
+        """Show the full record behind a table row"""
+        offset = self.results.refs[index]
+        if offset < 0:
+            self.text.delete(1.0, tk.END)
+            self.text.insert(tk.END, "\n".join(str(v) for v in self.results.rows[index] if v))
+            return
+        try:
+            metadata = self.session.read(offset)
+        except (OSError, ValueError) as e:
+            metadata = {'error': f"Record no longer available: {e}"}
+        self.display_metadata(metadata)
+    
+    def display_metadata(self, metadata: Dict[str, Any]):
+        """Display one record in the details pane"""
+        filename = metadata.get('filename', 'Unknown')
+        
+        lines = [
+            '=' * 60,
+            f"METADATA FOR: {filename}",
+            '=' * 60,
+        ]
+        
+        # Group metadata by category
+        categories = {
+            'File Info': [],
+            'Image Data': [],
+            'Media Data': [],
+            'EXIF Data': [],
+            'Other': []
+        }
+        
+        for key, value in metadata.items():
+            if key.startswith('exif_'):
+                categories['EXIF Data'].append((key, value))
+            elif key.startswith(('image_', 'video_', 'audio_', 'general_')):
+                categories['Media Data'].append((key, value))
+            elif key in ['filename', 'filepath', 'size_bytes', 'size_mb', 'file_type', 'extension',
+                         'claimed_type', 'detected_type', 'detected_format', 'type_mismatch',
+                         'parent_path', 'archive_path', 'archive_member', 'archive_depth']:
+                categories['File Info'].append((key, value))
+            else:
+                categories['Other'].append((key, value))
+        
+        # Display by category
+        for category, items in categories.items():
+            if items:
+                lines.append(f"\n[{category}]")
+                for key, value in sorted(items):
+                    lines.append(f"  {key}: {value}")
+        
+        # One insert per record instead of one per key
+        self.text.delete(1.0, tk.END)
+        self.text.insert(tk.END, "\n".join(lines) + "\n")
+    
+    def log_message(self, filepath: str, message: str):
+        """Add a table row for a file that produced no record (thread-safe)"""
+        row = (os.path.basename(filepath) or filepath, '', '', '', f"{message}: {filepath}")
+        self.ui_queue.put(('row', (row, -1)))
+    
+    def clear_output(self):
+        """Clear the results table and details pane"""
+        self.results.clear()
+        self.text.delete(1.0, tk.END)
+        METRICS.reset()
+        self.refresh_metrics()
+        self.session.clear()
+        self.update_status("Output cleared")
+    
+    def export_json(self):
+        """Export current metadata to JSON file"""
+        if not self.session.count:
+            messagebox.showwarning("No Data", "No metadata to export. Process some files first.")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="Export metadata to JSON",
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("JSON Lines", "*.jsonl"),
+                       ("Compressed JSON Lines", "*.jsonl.gz"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            self.update_status(f"Exporting to {filename}...")
+            threading.Thread(target=self.export_json_worker, args=(filename,), daemon=True).start()
+    
+    def export_json_worker(self, filename: str):
+        """Copy the session spool to the export file off the UI thread"""
+        try:
+            self.session.export(filename)
+        except Exception as e:
+            self.root.after(0, lambda e=e: messagebox.showerror("Error", f"Failed to export metadata: {e}"))
+            return
+        self.root.after(0, lambda: messagebox.showinfo("Success", f"Metadata exported to {filename}"))
+        self.root.after(0, lambda: self.update_status(f"Exported to {filename}"))
+    
+    def export_metrics(self):
+        """Save the per-stage timing summary of this session as JSON"""
+        if not METRICS.enabled:
+            messagebox.showwarning("Metrics Disabled", "Enable 'Performance metrics' and process some files first.")
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            title="Export performance report",
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        
+        if filename:
+            try:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(METRICS.summary(), f, indent=2)
+                self.update_status(f"Performance report saved to {filename}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save performance report: {e}")
+    
+    def show_about(self):
+        """Show about dialog"""
+        about_text = """Enhanced Metadata Extractor v2.0
+        
+Created by @Tactical_Scientist
+
+Features:
+• Drag & drop support for multiple files
+• Comprehensive metadata extraction for images, videos, and audio
+• Export to CSV and JSON formats
+• File hash calculation for integrity verification
+• Enhanced error handling and user interface
+
+Supported formats:
+• Images: JPG, PNG, TIFF, BMP, GIF, WebP
+• Videos: MP4, MOV, AVI, MKV, FLV, WMV, M4V, WebM
+• Audio: MP3, WAV, FLAC, AAC, OGG, WMA, M4A
+
+Dependencies:
+• tkinterdnd2: Drag & drop support
+• Pillow (PIL): Image metadata extraction
+• pymediainfo: Video/audio metadata extraction"""
+        
+        messagebox.showinfo("About", about_text)
+
+def check_dependencies():
+    """Warn about missing optional dependencies; the app runs without them"""
+    missing = []
+    
+    if not DND_AVAILABLE:
+        missing.append("tkinterdnd2")
+    
+    if not PIL_AVAILABLE:
+        missing.append("Pillow")
+    
+    if not MEDIAINFO_AVAILABLE:
+        missing.append("pymediainfo")
+    
+    if missing:
+        deps = ", ".join(missing)
+        message = (f"Missing optional dependencies: {deps}\n\n"
+                   "Drag & drop, non-JPEG/TIFF images and non-MP4/WAV/FLAC media "
+                   "need these packages; everything else works without them.\n\n"
+                   f"Install with:\npip install {' '.join(missing)}")
+        messagebox.showwarning("Missing Dependencies", message)
+    
+    return True
+
+def main():
+    """Main application entry point"""
+    if not check_dependencies():
+        return
+    
+    root = TkinterDnD.Tk() if DND_AVAILABLE else tk.Tk()
+    app = MetadataExtractorApp(root)
+    
+    # Set window icon (if available)
+    try:
+        root.iconbitmap("icon.ico")  # Add your icon file
+    except:
+        pass
+    
+    root.mainloop()
+    app.session.close()
+
+if __name__ == "__main__":
+
+    main()
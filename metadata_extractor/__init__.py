@@ -0,0 +1,40 @@
+"""Metadata Extractor core package (headless, no GUI dependencies)
+
+Public names are resolved lazily: `from metadata_extractor import
+MetadataExtractor` imports only the core module, not the batch engine,
+cache or pipeline, which keeps start-up cheap for short-lived workers.
+"""
+
+import importlib
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    'MetadataExtractor': 'core',
+    'CSVManager': 'core',
+    'IMAGE_EXTENSIONS': 'core',
+    'VIDEO_EXTENSIONS': 'core',
+    'AUDIO_EXTENSIONS': 'core',
+    'DOCUMENT_EXTENSIONS': 'core',
+    'BatchExtractor': 'batch',
+    'iter_files': 'batch',
+    'StagedPipeline': 'pipeline',
+    'FileHasher': 'hashing',
+    'ExtractionCache': 'cache',
+    'REGISTRY': 'plugins',
+    'register_extractor': 'plugins',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
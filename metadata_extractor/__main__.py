@@ -0,0 +1,8 @@
+"""Allow running the headless extractor with `python -m metadata_extractor`"""
+
+import sys
+
+from .cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""Stream-through extraction of ZIP and TAR archive members
+
+Members are never extracted to a scratch directory. Each one is read
+once as a stream: every chunk goes to the hashers, the first bytes are
+kept for type sniffing, and members that need parsing (images, media,
+nested archives) are collected in memory up to `memory_limit`. Members
+that fit are parsed entirely from memory; larger ones are parsed from
+their first PARSE_HEADER_SIZE bytes and the rest is only hashed. Only a
+nested archive larger than the limit is spilled (to an anonymous
+temporary file, one per nesting level) because ZIP needs to seek.
+
+Member records have the same keys as MetadataExtractor.extract_all_metadata
+plus parent_path, archive_path, archive_member and archive_depth. Their
+filepath is virtual ('case.zip!/photos/a.jpg'); directory is the real
+folder of the outermost archive, so per-folder CSV output still works.
+7z and RAR need third-party libraries and are only detected, not opened.
+"""
+
+import bz2
+import datetime
+import gzip
+import hashlib
+import lzma
+import os
+import tarfile
+import tempfile
+import zipfile
+from pathlib import PurePosixPath
+from typing import TYPE_CHECKING, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Sequence
+
+from .core import PARSE_HEADER_SIZE, MetadataExtractor
+from .hashing import BUFFER_SIZE, DEFAULT_ALGORITHMS, normalize_algorithms
+from .metrics import METRICS
+from .projection import FULL_PROJECTION, Projection
+from .signatures import sniff
+
+if TYPE_CHECKING:
+    from .hashsets import KnownFiles
+
+# How deep archives inside archives are followed
+DEFAULT_MAX_DEPTH = 3
+
+# Members up to this size are parsed entirely in memory
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# Separator between an archive path and a member name in virtual paths
+MEMBER_SEPARATOR = '!/'
+
+# Sniffed formats that are opened and traversed
+ARCHIVE_FORMATS = {'zip', 'tar', 'gzip', 'bzip2', 'xz'}
+
+# Single-stream compressors, tried when the stream is not a tar
+_STREAM_OPENERS = {'gzip': gzip.GzipFile, 'bzip2': bz2.BZ2File, 'xz': lzma.LZMAFile}
+
+# Member types whose content (not just the header) may be parsed
+_PARSED_TYPES = ('image', 'video', 'audio')
+
+
+class _Member:
+    """Name and archive-level attributes of one member"""
+
+    __slots__ = ('name', 'modified', 'mode', 'compressed_size')
+
+    def __init__(self, name: str, modified: str = '', mode: Optional[int] = None,
+                 compressed_size: Optional[int] = None):
+        self.name = name
+        self.modified = modified
+        self.mode = mode
+        self.compressed_size = compressed_size
+
+
+def is_archive(metadata: Dict[str, Any]) -> bool:
+    """True if a record describes an archive that can be traversed"""
+    return metadata.get('detected_format') in ARCHIVE_FORMATS
+
+
+class ArchiveExtractor:
+    """Yield member records for ZIP, TAR (optionally compressed) and gz/bz2/xz files"""
+
+    def __init__(self, hash_algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+                 max_depth: int = DEFAULT_MAX_DEPTH, memory_limit: int = DEFAULT_MEMORY_LIMIT,
+                 deep_media: bool = False, projection: Projection = FULL_PROJECTION,
+                 known_files: Optional['KnownFiles'] = None):
+        # Members are always sniffed (to find nested archives); hashing and
+        # parsing follow the projection
+        self.projection = projection
+        # Known-good members (and archives) are tagged but neither parsed nor opened
+        self.known_files = known_files
+        self.hash_algorithms = normalize_algorithms(hash_algorithms) if projection.hashes else ()
+        self.max_depth = max(1, max_depth)
+        self.memory_limit = max(PARSE_HEADER_SIZE, memory_limit)
+        self.deep_media = deep_media
+
+    def expand(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Pass records through, following each archive record with its members"""
+        for metadata in records:
+            yield metadata
+            if ('error' not in metadata and is_archive(metadata)
+                    and metadata.get('known_file') != 'good'):
+                yield from self.iter_members(metadata['filepath'], metadata['detected_format'])
+
+    def iter_members(self, filepath: str,
+                     archive_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Records for every regular member of the archive at `filepath`"""
+        if archive_format is None:
+            with open(filepath, 'rb') as f:
+                signature = sniff(f.read(PARSE_HEADER_SIZE))
+            archive_format = signature.format if signature else ''
+        directory = os.path.dirname(os.path.abspath(filepath))
+        with open(filepath, 'rb') as f:
+            yield from self._walk(f, archive_format, os.path.abspath(filepath),
+                                  os.path.abspath(filepath), directory, 1)
+
+    # Traversal ------------------------------------------------------------
+
+    def _walk(self, source: BinaryIO, archive_format: str, parent: str, root: str,
+              directory: str, depth: int) -> Iterator[Dict[str, Any]]:
+        """Yield member records of one archive opened from a seekable file object"""
+        try:
+            if archive_format == 'zip':
+                yield from self._walk_zip(source, parent, root, directory, depth)
+            elif archive_format in ('tar', 'gzip', 'bzip2', 'xz'):
+                yield from self._walk_tar(source, archive_format, parent, root, directory, depth)
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, lzma.LZMAError) as e:
+            yield {'filepath': parent, 'error': f"Archive traversal failed: {str(e)}"}
+
+    def _walk_zip(self, source: BinaryIO, parent: str, root: str, directory: str,
+                  depth: int) -> Iterator[Dict[str, Any]]:
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                mode = info.external_attr >> 16 if info.create_system == 3 else None
+                member = _Member(info.filename, datetime.datetime(*info.date_time).isoformat(),
+                                 mode, info.compress_size)
+                try:
+                    stream = archive.open(info)
+                except (RuntimeError, NotImplementedError, zipfile.BadZipFile) as e:
+                    # Encrypted or unsupported compression
+                    yield self._member_error(member, parent, e)
+                    continue
+                with stream:
+                    yield from self._process(stream, member, parent, root, directory, depth)
+
+    def _walk_tar(self, source: BinaryIO, archive_format: str, parent: str, root: str,
+                  directory: str, depth: int) -> Iterator[Dict[str, Any]]:
+        try:
+            archive = tarfile.open(fileobj=source, mode='r:*')
+        except tarfile.ReadError:
+            if archive_format not in _STREAM_OPENERS:
+                raise
+            # Plain .gz/.bz2/.xz: one member named after the compressed file
+            source.seek(0)
+            name = PurePosixPath(parent.replace(MEMBER_SEPARATOR, '/')).stem
+            with _STREAM_OPENERS[archive_format](fileobj=source) as stream:
+                yield from self._process(stream, _Member(name), parent, root, directory, depth)
+            return
+
+        with archive:
+            # Iterating (not getmembers()) streams members as their headers are read
+            for info in archive:
+                if not info.isreg():
+                    continue
+                member = _Member(info.name, datetime.datetime.fromtimestamp(info.mtime).isoformat(),
+                                 info.mode)
+                stream = archive.extractfile(info)
+                if stream is None:
+                    continue
+                with stream:
+                    yield from self._process(stream, member, parent, root, directory, depth)
+
+    # Members --------------------------------------------------------------
+
+    def _process(self, stream: BinaryIO, member: _Member, parent: str, root: str,
+                 directory: str, depth: int) -> Iterator[Dict[str, Any]]:
+        """Hash, sniff and parse one member in a single pass over its stream"""
+        virtual_path = parent + MEMBER_SEPARATOR + member.name
+        timer = METRICS.start()
+        hashers = [hashlib.new(name) for name in self.hash_algorithms]
+        spool = None
+
+        try:
+            header = _read_full(stream, PARSE_HEADER_SIZE)
+            signature = sniff(header)
+            claimed = MetadataExtractor.get_file_type_category(member.name)
+            nested = (signature is not None and signature.format in ARCHIVE_FORMATS
+                      and depth < self.max_depth)
+            keep = nested or self.projection.runs_plugins and (
+                claimed in _PARSED_TYPES
+                or (signature is not None and signature.file_type in _PARSED_TYPES))
+
+            spool = tempfile.SpooledTemporaryFile(max_size=self.memory_limit) if keep else None
+            size = 0
+            chunk = header
+            while chunk:
+                size += len(chunk)
+                for h in hashers:
+                    h.update(chunk)
+                if spool is not None:
+                    if size > self.memory_limit and not nested:
+                        # Too big to parse from memory: keep hashing, drop the copy
+                        spool.close()
+                        spool = None
+                    else:
+                        spool.write(chunk)
+                chunk = stream.read(BUFFER_SIZE)
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, lzma.LZMAError) as e:
+            if spool is not None:
+                spool.close()
+            yield self._member_error(member, parent, e)
+            return
+        METRICS.stop(timer, 'archive_member', member.name, size)
+
+        try:
+            metadata = self._build_record(member, virtual_path, directory, size, hashers)
+            ext = MetadataExtractor.detect_file_type(metadata, header)
+            known = self.known_files is not None and self.known_files.tag(metadata)
+            if known == 'good':
+                nested = False
+            elif spool is not None and size <= self.memory_limit:
+                # Whole member in memory: parsers never need to open a file
+                spool.seek(0)
+                header = spool.read()
+            if self.projection.runs_plugins and known != 'good':
+                metadata.update(MetadataExtractor.extract_type_metadata(
+                    virtual_path, metadata['file_type'], ext, self.deep_media, header, size,
+                    self.projection.plugins))
+            metadata.update({
+                'parent_path': parent,
+                'archive_path': root,
+                'archive_member': member.name,
+                'archive_depth': depth,
+            })
+            yield metadata
+
+            if nested:
+                spool.seek(0)
+                yield from self._walk(spool, signature.format, virtual_path, root, directory,
+                                      depth + 1)
+        finally:
+            if spool is not None:
+                spool.close()
+
+    def _build_record(self, member: _Member, virtual_path: str, directory: str, size: int,
+                      hashers) -> Dict[str, Any]:
+        """Same leading keys as extract_stat_metadata + hashes, for a member"""
+        name = PurePosixPath(member.name).name
+        metadata = {
+            'filename': name,
+            'filepath': virtual_path,
+            'directory': directory,
+            'extension': PurePosixPath(name).suffix.lower(),
+            'file_type': MetadataExtractor.get_file_type_category(name),
+            'size_bytes': size,
+            'size_mb': round(size / (1024 * 1024), 2),
+            'created': '',
+            'modified': member.modified,
+            'accessed': '',
+            'permissions': oct(member.mode)[-3:] if member.mode else '',
+        }
+        for algorithm, h in zip(self.hash_algorithms, hashers):
+            metadata[f'{algorithm}_hash'] = h.hexdigest()
+        metadata['extraction_timestamp'] = datetime.datetime.now().isoformat()
+        if member.compressed_size is not None:
+            metadata['compressed_size_bytes'] = member.compressed_size
+        return metadata
+
+    @staticmethod
+    def _member_error(member: _Member, parent: str, error: Exception) -> Dict[str, Any]:
+        return {'filepath': parent + MEMBER_SEPARATOR + member.name,
+                'parent_path': parent, 'error': f"Member extraction failed: {str(error)}"}
+
+
+def _read_full(stream: BinaryIO, size: int) -> bytes:
+    """Read `size` bytes unless the stream ends first (short reads are retried)"""
+    data = stream.read(size)
+    if len(data) < size and data:
+        parts = [data]
+        remaining = size - len(data)
+        while remaining:
+            chunk = stream.read(remaining)
+            if not chunk:
+                break
+            parts.append(chunk)
+            remaining -= len(chunk)
+        data = b''.join(parts)
+    return data
@@ -0,0 +1,70 @@
+"""Optional third-party backends (Pillow, pymediainfo, NumPy), imported on first use
+
+Importing them eagerly costs more than a short batch job spends on actual
+extraction, so nothing here is imported until a file that needs it is
+seen. is_installed() answers "could it be imported" without importing.
+"""
+
+import importlib.util
+import threading
+from typing import Any, Optional, Tuple
+
+_lock = threading.Lock()
+_UNSET = object()
+_pillow = _UNSET
+_mediainfo = _UNSET
+_numpy = _UNSET
+
+
+def is_installed(module: str) -> bool:
+    """True if `module` can be imported (without importing it)"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load_pillow() -> Optional[Tuple[Any, Any]]:
+    """Return (PIL.Image, PIL.ExifTags.TAGS), or None if Pillow is missing"""
+    global _pillow
+    if _pillow is _UNSET:
+        with _lock:
+            if _pillow is _UNSET:
+                try:
+                    from PIL import Image
+                    from PIL.ExifTags import TAGS
+                    _pillow = (Image, TAGS)
+                except ImportError:
+                    _pillow = None
+                    print("Warning: PIL/Pillow not available. Only JPEG/TIFF headers will be parsed.")
+    return _pillow
+
+
+def load_mediainfo() -> Optional[Any]:
+    """Return the pymediainfo.MediaInfo class, or None if it is missing"""
+    global _mediainfo
+    if _mediainfo is _UNSET:
+        with _lock:
+            if _mediainfo is _UNSET:
+                try:
+                    from pymediainfo import MediaInfo
+                    _mediainfo = MediaInfo
+                except ImportError:
+                    _mediainfo = None
+                    print("Warning: pymediainfo not available. Only MP4/MOV, WAV and FLAC "
+                          "headers will be parsed.")
+    return _mediainfo
+
+
+def load_numpy() -> Optional[Any]:
+    """Return the numpy module, or None if it is missing (callers fall back to pure Python)"""
+    global _numpy
+    if _numpy is _UNSET:
+        with _lock:
+            if _numpy is _UNSET:
+                try:
+                    import numpy
+                    _numpy = numpy
+                except ImportError:
+                    _numpy = None
+    return _numpy
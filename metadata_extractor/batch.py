@@ -0,0 +1,237 @@
+"""Headless batch engine: recursive directory walking and parallel extraction"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import TYPE_CHECKING, Dict, List, Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+from .cache import ExtractionCache
+from .core import MetadataExtractor
+from .hashing import DEFAULT_ALGORITHMS, normalize_algorithms
+from .metrics import METRICS
+from .projection import FULL_PROJECTION, Projection
+
+if TYPE_CHECKING:
+    from .hashsets import KnownFiles
+
+
+def iter_files(paths: Iterable[str], recursive: bool = True,
+               follow_symlinks: bool = False,
+               on_error: Optional[Callable[[str, Exception], None]] = None,
+               exclude_names: Iterable[str] = ()) -> Iterator[str]:
+    """Yield files from a mix of file and directory paths using os.scandir"""
+    exclude = frozenset(exclude_names)
+    for path in paths:
+        if os.path.isdir(path):
+            for filepath in _walk_directory(path, recursive, follow_symlinks, on_error):
+                if os.path.basename(filepath) not in exclude:
+                    yield filepath
+        elif os.path.isfile(path):
+            yield path
+        elif on_error is not None:
+            on_error(path, FileNotFoundError(f"File not found: {path}"))
+
+
+def _walk_directory(root: str, recursive: bool, follow_symlinks: bool,
+                    on_error: Optional[Callable[[str, Exception], None]]) -> Iterator[str]:
+    """Depth-first walk with an explicit stack, in sorted (reproducible) order"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file(follow_symlinks=follow_symlinks):
+                            files.append(entry.path)
+                        elif recursive and entry.is_dir(follow_symlinks=follow_symlinks):
+                            subdirs.append(entry.path)
+                    except OSError as e:
+                        if on_error is not None:
+                            on_error(entry.path, e)
+        except OSError as e:
+            if on_error is not None:
+                on_error(directory, e)
+            continue
+
+        files.sort()
+        yield from files
+
+        # Reverse so the alphabetically first subdirectory is popped next
+        subdirs.sort(reverse=True)
+        stack.extend(subdirs)
+
+
+def _extract_chunk(paths: List[str], hash_algorithms: Sequence[str], deep_media: bool = False,
+                   projection: Projection = FULL_PROJECTION,
+                   known_files: Optional['KnownFiles'] = None) -> List[Dict[str, Any]]:
+    """Extract metadata for a chunk of files"""
+    results = []
+    for filepath in paths:
+        try:
+            results.append(MetadataExtractor.extract_all_metadata(filepath, hash_algorithms,
+                                                                  deep_media, projection,
+                                                                  known_files))
+        except Exception as e:
+            results.append({'filepath': filepath, 'error': f"Extraction failed: {str(e)}"})
+    return results
+
+
+def _extract_chunk_remote(paths: List[str], hash_algorithms: Sequence[str], deep_media: bool,
+                          projection: Projection, known_files: Optional['KnownFiles'],
+                          collect_metrics: bool) -> Tuple[List[Dict[str, Any]], Optional[Dict]]:
+    """Worker process entry point; also returns this chunk's stage metrics"""
+    if not collect_metrics:
+        METRICS.enabled = False
+        return _extract_chunk(paths, hash_algorithms, deep_media, projection, known_files), None
+    # Forked workers inherit the parent's samples: count only this chunk
+    METRICS.enabled = True
+    METRICS.reset()
+    results = _extract_chunk(paths, hash_algorithms, deep_media, projection, known_files)
+    return results, METRICS.export_state()
+
+
+def _chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Group an iterable into lists of at most `size` items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BatchExtractor:
+    """Fan metadata extraction out over a process pool"""
+
+    def __init__(self, workers: Optional[int] = None, ordered: bool = True,
+                 chunksize: int = 16, prefetch: int = 2,
+                 hash_algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+                 cache: Optional[ExtractionCache] = None, deep_media: bool = False,
+                 projection: Projection = FULL_PROJECTION,
+                 known_files: Optional['KnownFiles'] = None):
+        self.hash_algorithms = normalize_algorithms(hash_algorithms)
+        self.deep_media = deep_media
+        self.projection = projection
+        # Known-file indexes travel to the workers as paths and are mapped there
+        self.known_files = known_files
+        # Digests a record carries (none when the projection skips hashing)
+        self.record_algorithms = self.hash_algorithms if projection.hashes else ()
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.ordered = ordered
+        self.chunksize = max(1, chunksize)
+        # Chunks in flight per worker; bounds memory on multi-million file runs
+        self.prefetch = max(1, prefetch)
+        # Lookups and stores happen in this process only, so SQLite has one writer
+        self.cache = cache
+        self.cache_profile = ('deep' if deep_media else '') + projection.profile
+        if known_files is not None:
+            self.cache_profile += known_files.profile
+
+    def _split_cached(self, chunk: List[str]) -> Tuple[Dict[int, Dict[str, Any]], List[str], List[Any]]:
+        """Resolve cache hits for a chunk; return (hits by index, missed paths, their stats)"""
+        hits = {}
+        misses = []
+        stats = []
+        for index, filepath in enumerate(chunk):
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                misses.append(filepath)
+                stats.append(None)
+                continue
+            metadata = self.cache.lookup(filepath, self.record_algorithms, stat, self.cache_profile)
+            if metadata is not None:
+                hits[index] = metadata
+            else:
+                misses.append(filepath)
+                stats.append(stat)
+        return hits, misses, stats
+
+    def _merge(self, chunk: List[str], hits: Dict[int, Dict[str, Any]], misses: List[str],
+               stats: List[Any], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Store fresh results in the cache and restore the chunk's input order"""
+        for filepath, stat, metadata in zip(misses, stats, results):
+            if stat is not None:
+                self.cache.store(filepath, metadata, stat, self.cache_profile)
+        fresh = iter(results)
+        return [hits[index] if index in hits else next(fresh) for index in range(len(chunk))]
+
+    @staticmethod
+    def _collect(future) -> List[Dict[str, Any]]:
+        """Unpack a worker result, folding its stage metrics into ours"""
+        results, state = future.result()
+        if state:
+            METRICS.merge_state(state)
+        return results
+
+    def _submit(self, pool: ProcessPoolExecutor, chunk: List[str]):
+        """Submit the uncached part of a chunk; returns a deferred-result callable"""
+        if self.cache is None:
+            future = pool.submit(_extract_chunk_remote, chunk, self.hash_algorithms,
+                                 self.deep_media, self.projection, self.known_files,
+                                 METRICS.enabled)
+            return future, lambda: self._collect(future)
+
+        hits, misses, stats = self._split_cached(chunk)
+        if not misses:
+            return None, lambda: [hits[index] for index in range(len(chunk))]
+        future = pool.submit(_extract_chunk_remote, misses, self.hash_algorithms,
+                             self.deep_media, self.projection, self.known_files,
+                             METRICS.enabled)
+        return future, lambda: self._merge(chunk, hits, misses, stats, self._collect(future))
+
+    def run(self, files: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Yield one metadata dict per input file"""
+        chunks = _chunked(files, self.chunksize)
+
+        if self.workers <= 1:
+            for chunk in chunks:
+                if self.cache is None:
+                    yield from _extract_chunk(chunk, self.hash_algorithms, self.deep_media,
+                                              self.projection, self.known_files)
+                    continue
+                hits, misses, stats = self._split_cached(chunk)
+                results = _extract_chunk(misses, self.hash_algorithms, self.deep_media,
+                                         self.projection, self.known_files) if misses else []
+                yield from self._merge(chunk, hits, misses, stats, results)
+            return
+
+        max_pending = self.workers * self.prefetch
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            if self.ordered:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(self._submit(pool, chunk)[1])
+                    if len(pending) >= max_pending:
+                        yield from pending.popleft()()
+                while pending:
+                    yield from pending.popleft()()
+            else:
+                pending = {}
+                for chunk in chunks:
+                    future, result = self._submit(pool, chunk)
+                    if future is None:
+                        # Fully cached chunk: deliver immediately
+                        yield from result()
+                        continue
+                    pending[future] = result
+                    if len(pending) >= max_pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from pending.pop(future)()
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from pending.pop(future)()
+
+    def run_paths(self, paths: Iterable[str], recursive: bool = True,
+                  on_error: Optional[Callable[[str, Exception], None]] = None,
+                  exclude_names: Iterable[str] = ()) -> Iterator[Dict[str, Any]]:
+        """Walk files and directories, then extract everything found"""
+        return self.run(iter_files(paths, recursive=recursive, on_error=on_error,
+                                   exclude_names=exclude_names))
@@ -0,0 +1,262 @@
+"""Throughput benchmarks for extractors, sinks and batch engines
+
+Each phase reports files/sec, MB/sec, the peak RSS reached so far and
+per-call latency percentiles. Results are plain JSON so two runs (e.g.
+before and after a change) can be compared with compare_results().
+Timings are taken with a warm page cache: the corpus has just been
+generated or the hash phase has read it once.
+"""
+
+import datetime
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Any, Callable, List, Optional, Sequence
+
+from .batch import BatchExtractor, iter_files
+from .core import (
+    MetadataExtractor, CSVManager, PIL_AVAILABLE, MEDIAINFO_AVAILABLE,
+    IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, AUDIO_EXTENSIONS,
+)
+from .corpus import MANIFEST_NAME, load_manifest
+from .hashing import DEFAULT_ALGORITHMS, normalize_algorithms
+from .pipeline import StagedPipeline
+from .sinks import CSVWriterPool, JSONLinesSink
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Bump when the result layout changes
+RESULTS_VERSION = 1
+
+# Metrics where a higher value is better; used by compare_results()
+THROUGHPUT_METRICS = ('files_per_sec', 'mb_per_sec')
+
+MB = 1024 * 1024
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """Peak resident set size of this process (or its reaped children)"""
+    if RESOURCE_AVAILABLE:
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+        return round(peak / MB if sys.platform == 'darwin' else peak / 1024, 1)
+    if PSUTIL_AVAILABLE and not children:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / MB, 1)
+    return None
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p90/p99/max of latencies in seconds, reported in ms"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))]
+
+    return {
+        'p50_ms': round(rank(50) * 1000, 3),
+        'p90_ms': round(rank(90) * 1000, 3),
+        'p99_ms': round(rank(99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def _summary(files: int, size: int, elapsed: float, latencies: Sequence[float],
+             children: bool = False) -> Dict[str, Any]:
+    """Common result block for one phase"""
+    result = {
+        'files': files,
+        'bytes': size,
+        'seconds': round(elapsed, 4),
+        'files_per_sec': round(files / elapsed, 2) if elapsed > 0 else 0.0,
+        'mb_per_sec': round(size / MB / elapsed, 2) if elapsed > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'latency': percentiles(latencies),
+    }
+    if children:
+        result['peak_child_rss_mb'] = peak_rss_mb(children=True)
+    return result
+
+
+def _time_calls(files: Sequence[str], sizes: Dict[str, int],
+                func: Callable[[str], Any]) -> Dict[str, Any]:
+    """Call func once per file and time each call"""
+    latencies = []
+    clock = time.perf_counter
+    start = clock()
+    for filepath in files:
+        t = clock()
+        func(filepath)
+        latencies.append(clock() - t)
+    elapsed = clock() - start
+    return _summary(len(files), sum(sizes[f] for f in files), elapsed, latencies)
+
+
+def bench_extractors(files: Sequence[str], sizes: Dict[str, int],
+                     hash_algorithms: Sequence[str] = DEFAULT_ALGORITHMS) -> Dict[str, Any]:
+    """Time each MetadataExtractor step on the files it applies to"""
+    images = [f for f in files if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS]
+    media = [f for f in files if os.path.splitext(f)[1].lower() in VIDEO_EXTENSIONS | AUDIO_EXTENSIONS]
+
+    return {
+        'stat': _time_calls(files, sizes, MetadataExtractor.extract_stat_metadata),
+        'hash': _time_calls(files, sizes,
+                            lambda f: MetadataExtractor.calculate_file_hashes(f, hash_algorithms)),
+        'image': _time_calls(images, sizes, MetadataExtractor.extract_image_metadata),
+        'media': _time_calls(media, sizes, MetadataExtractor.extract_media_metadata),
+        'extract_all': _time_calls(files, sizes,
+                                   lambda f: MetadataExtractor.extract_all_metadata(f, hash_algorithms)),
+    }
+
+
+def _time_sink(records: Sequence[Dict[str, Any]], write: Callable[[Dict[str, Any]], Any],
+               close: Callable[[], Any], output: str) -> Dict[str, Any]:
+    """Time per-record writes plus the final close/flush of one sink"""
+    latencies = []
+    clock = time.perf_counter
+    start = clock()
+    for record in records:
+        t = clock()
+        write(record)
+        latencies.append(clock() - t)
+    t = clock()
+    close()
+    close_seconds = clock() - t
+    elapsed = clock() - start
+    result = _summary(len(records), os.path.getsize(output), elapsed, latencies)
+    result['close_seconds'] = round(close_seconds, 4)
+    return result
+
+
+def bench_sinks(records: Sequence[Dict[str, Any]], workdir: str) -> Dict[str, Any]:
+    """Time CSV and JSON sinks on the same record set; MB/sec is output size"""
+    results = {}
+
+    csv_path = os.path.join(workdir, 'pool.csv')
+    pool = CSVWriterPool()
+    results['csv_pool'] = _time_sink(records, lambda r: pool.write(csv_path, r), pool.close, csv_path)
+
+    # Legacy one-call-per-row API, kept for callers of CSVManager
+    row_path = os.path.join(workdir, 'rows.csv')
+    results['csv_row'] = _time_sink(records, lambda r: CSVManager.write_metadata_row(r, row_path),
+                                    lambda: None, row_path)
+
+    for name, filename in (('json_array', 'out.json'), ('jsonl_gzip', 'out.jsonl.gz')):
+        path = os.path.join(workdir, filename)
+        sink = JSONLinesSink(path)
+        results[name] = _time_sink(records, sink.write, sink.close, path)
+    return results
+
+
+def _time_engine(files: Sequence[str], sizes: Dict[str, int], run: Callable[[Sequence[str]], Any],
+                 children: bool = False) -> Dict[str, Any]:
+    """End-to-end throughput of an engine; latency is time between results"""
+    gaps = []
+    clock = time.perf_counter
+    start = last = clock()
+    count = 0
+    for _ in run(files):
+        now = clock()
+        gaps.append(now - last)
+        last = now
+        count += 1
+    elapsed = clock() - start
+    return _summary(count, sum(sizes[f] for f in files), elapsed, gaps, children)
+
+
+def bench_engines(files: Sequence[str], sizes: Dict[str, int],
+                  hash_algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+                  workers: Optional[int] = None) -> Dict[str, Any]:
+    """Compare the in-process, process-pool and staged pipeline engines"""
+    return {
+        'batch_serial': _time_engine(
+            files, sizes, BatchExtractor(workers=1, hash_algorithms=hash_algorithms).run),
+        'batch_pool': _time_engine(
+            files, sizes, BatchExtractor(workers=workers, hash_algorithms=hash_algorithms).run,
+            children=True),
+        'pipeline': _time_engine(
+            files, sizes, StagedPipeline(hash_algorithms=hash_algorithms).run),
+    }
+
+
+def run_benchmarks(corpus_dir: str, hash_algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+                   workers: Optional[int] = None) -> Dict[str, Any]:
+    """Run every phase on a generated corpus and return the results document"""
+    hash_algorithms = normalize_algorithms(hash_algorithms)
+    files = list(iter_files([corpus_dir], exclude_names=(MANIFEST_NAME,)))
+    sizes = {f: os.path.getsize(f) for f in files}
+
+    results = {
+        'version': RESULTS_VERSION,
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pil_available': PIL_AVAILABLE,
+            'mediainfo_available': MEDIAINFO_AVAILABLE,
+            'hash_algorithms': list(hash_algorithms),
+            'workers': workers,
+            'corpus': load_manifest(corpus_dir),
+        },
+        'extractors': bench_extractors(files, sizes, hash_algorithms),
+    }
+
+    records = [MetadataExtractor.extract_all_metadata(f, hash_algorithms) for f in files]
+    workdir = tempfile.mkdtemp(prefix='metadata_bench_')
+    try:
+        results['sinks'] = bench_sinks(records, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    del records
+
+    results['engines'] = bench_engines(files, sizes, hash_algorithms, workers)
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    tolerance: float = 10.0) -> List[str]:
+    """Return one line per throughput metric that dropped more than `tolerance` percent"""
+    regressions = []
+    for group in ('extractors', 'sinks', 'engines'):
+        for phase, result in current.get(group, {}).items():
+            old = baseline.get(group, {}).get(phase)
+            if not old:
+                continue
+            for metric in THROUGHPUT_METRICS:
+                before, after = old.get(metric) or 0, result.get(metric) or 0
+                if before > 0 and after < before * (1 - tolerance / 100.0):
+                    change = (after - before) / before * 100
+                    regressions.append(f"{group}.{phase}.{metric}: {before} -> {after} ({change:+.1f}%)")
+    return regressions
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """Human-readable table of a results document"""
+    lines = [f"{'phase':<24}{'files':>8}{'files/s':>12}{'MB/s':>10}{'p50 ms':>10}"
+             f"{'p99 ms':>10}{'RSS MB':>9}"]
+    for group in ('extractors', 'sinks', 'engines'):
+        for phase, r in results.get(group, {}).items():
+            latency = r.get('latency', {})
+            rss = r.get('peak_rss_mb')
+            lines.append(f"{group + '.' + phase:<24}{r['files']:>8}{r['files_per_sec']:>12.1f}"
+                         f"{r['mb_per_sec']:>10.1f}{latency.get('p50_ms', 0):>10.3f}"
+                         f"{latency.get('p99_ms', 0):>10.3f}{rss if rss is not None else '-':>9}")
+    return '\n'.join(lines)
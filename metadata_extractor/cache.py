@@ -0,0 +1,241 @@
+"""Persistent extraction cache keyed on file identity (SQLite)"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Any, Optional, Sequence, Tuple
+
+from .core import MetadataExtractor
+from .hashing import FileHasher
+from .metrics import METRICS
+from .record import STAT_KEYS
+
+DEFAULT_CACHE_NAME = 'metadata_cache.sqlite'
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Bump when the entries table changes; older caches are discarded, not migrated
+SCHEMA_VERSION = 2
+
+# Pending writes are committed in one transaction every this many stores
+COMMIT_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    profile TEXT NOT NULL,
+    record TEXT NOT NULL,
+    digests TEXT NOT NULL,
+    payload_bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (dev, ino)
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+def file_identity(stat: os.stat_result) -> Tuple[int, int, int, int]:
+    """Identity tuple used as the cache key: (st_dev, st_ino, st_size, st_mtime_ns)"""
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class ExtractionCache:
+    """SQLite cache of extracted records and digests, with size-based eviction
+
+    Only the expensive parts of a record (digests and image/media fields)
+    are reused; path and stat fields are always rebuilt from a fresh stat,
+    so renamed or moved files still report their current location.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = DEFAULT_MAX_BYTES, verify: bool = False):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.verify = verify
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        # Callers may use the cache from several threads, one at a time
+        # (StagedPipeline serializes access with a lock)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.conn.execute('DROP TABLE IF EXISTS entries')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def lookup(self, filepath: str, hash_algorithms: Sequence[str],
+               stat: Optional[os.stat_result] = None, profile: str = '') -> Optional[Dict[str, Any]]:
+        """Return a full metadata record for an unchanged file, or None on a miss
+
+        `profile` names the extraction options the record was built with
+        (e.g. deep media analysis); records from another profile are misses.
+        """
+        timer = METRICS.start()
+        try:
+            return self._lookup(filepath, hash_algorithms, stat, profile)
+        finally:
+            METRICS.stop(timer, 'cache_lookup', filepath)
+
+    def _lookup(self, filepath: str, hash_algorithms: Sequence[str],
+                stat: Optional[os.stat_result], profile: str) -> Optional[Dict[str, Any]]:
+        try:
+            if stat is None:
+                stat = os.stat(filepath)
+        except OSError:
+            return None
+
+        dev, ino, size, mtime_ns = file_identity(stat)
+        row = self.conn.execute(
+            'SELECT size, mtime_ns, profile, record, digests FROM entries WHERE dev = ? AND ino = ?',
+            (dev, ino)
+        ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns or row[2] != profile:
+            self.misses += 1
+            return None
+
+        extended = json.loads(row[3])
+        digests = json.loads(row[4])
+
+        if self.verify and digests and not self._verify_digests(filepath, digests):
+            self.conn.execute('DELETE FROM entries WHERE dev = ? AND ino = ?', (dev, ino))
+            self._note_write()
+            self.misses += 1
+            return None
+
+        missing = [name for name in hash_algorithms if name not in digests]
+        if missing:
+            try:
+                digests.update(FileHasher(missing).hash_file(filepath))
+            except OSError:
+                self.misses += 1
+                return None
+            self.conn.execute('UPDATE entries SET digests = ? WHERE dev = ? AND ino = ?',
+                              (json.dumps(digests), dev, ino))
+            self._note_write()
+
+        self.conn.execute('UPDATE entries SET last_used = ? WHERE dev = ? AND ino = ?',
+                          (time.time(), dev, ino))
+        self.hits += 1
+
+        # Same key order as MetadataExtractor.extract_all_metadata
+        metadata = MetadataExtractor.extract_stat_metadata(filepath, stat)
+        metadata.set_digests(hash_algorithms, [bytes.fromhex(digests[name])
+                                               for name in hash_algorithms])
+        metadata.mark_extracted()
+        metadata.update(extended)
+        return metadata
+
+    def store(self, filepath: str, metadata: Dict[str, Any], stat: os.stat_result,
+              profile: str = ''):
+        """Remember an extracted record under the identity of `stat`"""
+        if 'error' in metadata:
+            return
+        timer = METRICS.start()
+
+        claimed_type = MetadataExtractor.get_file_type_category(filepath)
+        digests = {}
+        extended = {}
+        # Keys first: stat fields are rebuilt on lookup, so they are never formatted here
+        for key in metadata:
+            if key == 'extraction_timestamp' or (key in STAT_KEYS and key != 'file_type'):
+                continue
+            value = metadata[key]
+            # file_type is kept when content sniffing overrode the extension
+            if key == 'file_type' and value == claimed_type:
+                continue
+            name = key[:-len('_hash')]
+            if key.endswith('_hash') and name in hashlib.algorithms_available:
+                if not str(value).startswith('Error:'):
+                    digests[name] = value
+                continue
+            extended[key] = value
+
+        record = json.dumps(extended, ensure_ascii=False, default=str)
+        digest_json = json.dumps(digests)
+        dev, ino, size, mtime_ns = file_identity(stat)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (dev, ino, size, mtime_ns, profile, record, digest_json,
+             len(record) + len(digest_json), time.time())
+        )
+        self._note_write()
+        METRICS.stop(timer, 'cache_store', filepath, len(record) + len(digest_json))
+
+    def verify_file(self, filepath: str) -> Optional[bool]:
+        """Re-hash a cached file; None if it is not cached or has changed"""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        dev, ino, size, mtime_ns = file_identity(stat)
+        row = self.conn.execute(
+            'SELECT size, mtime_ns, digests FROM entries WHERE dev = ? AND ino = ?',
+            (dev, ino)
+        ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        return self._verify_digests(filepath, json.loads(row[2]))
+
+    def _verify_digests(self, filepath: str, digests: Dict[str, str]) -> bool:
+        """Check cached digests against the file content"""
+        try:
+            current = FileHasher(list(digests)).hash_file(filepath)
+        except OSError:
+            return False
+        return current == digests
+
+    def _note_write(self):
+        """Commit in batches and evict once the cache grows past its budget"""
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Commit pending writes and enforce the size limit"""
+        self.evict()
+        self.conn.commit()
+        self._pending = 0
+
+    def total_bytes(self) -> int:
+        """Approximate payload size of all cached records"""
+        return self.conn.execute('SELECT COALESCE(SUM(payload_bytes), 0) FROM entries').fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least recently used entries until under max_bytes; return count removed"""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+
+        # Evict down to 90% of the budget so we do not evict on every commit
+        excess += self.max_bytes // 10
+        victims = []
+        freed = 0
+        for rowid, payload in self.conn.execute(
+                'SELECT rowid, payload_bytes FROM entries ORDER BY last_used'):
+            victims.append((rowid,))
+            freed += payload
+            if freed >= excess:
+                break
+        self.conn.executemany('DELETE FROM entries WHERE rowid = ?', victims)
+        return len(victims)
+
+    def close(self):
+        """Flush and close the database"""
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
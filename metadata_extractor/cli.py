@@ -0,0 +1,1085 @@
+"""Command line interface for headless metadata extraction"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import List, Optional
+
+from .archives import DEFAULT_MAX_DEPTH, DEFAULT_MEMORY_LIMIT, ArchiveExtractor
+from .batch import BatchExtractor, iter_files
+from .cache import ExtractionCache, DEFAULT_MAX_BYTES
+from .corpus import DEFAULT_SPARSE_MB, MANIFEST_NAME, generate_corpus
+from .dedup import (
+    DEFAULT_INDEX_NAME, PARTIAL_BLOCK_SIZE, DuplicateFinder, group_digests, summarize_groups,
+    write_duplicate_index,
+)
+from .hashing import normalize_algorithms
+from .hashsets import KNOWN_ACTIONS, HashSetIndex, KnownFiles, build_index
+from .iosched import DeviceScheduler
+from .jobs import DEFAULT_CHECKPOINT_FILES, ExtractionJob
+from .metrics import METRICS
+from .perceptual import ALGORITHMS as PERCEPTUAL_ALGORITHMS
+from .perceptual import DEFAULT_ALGORITHM, DEFAULT_MAX_DISTANCE
+from .perceptual import DEFAULT_INDEX_NAME as DEFAULT_SIMILAR_NAME
+from .perceptual import field_name, find_near_duplicates, parse_hash, write_similar_index
+from .pipeline import DEFAULT_QUEUE_SIZE, StagedPipeline
+from .projection import GROUPS, Projection, plan_projection
+from .shard import (
+    DEFAULT_MERGED_NAME, REPORT_NAME, STRATEGIES, claim_shard, merge_shards, next_shard,
+    plan_shards, run_shard, shard_status,
+)
+from .sinks import CSVWriterPool, JSONLinesSink, iter_result_records
+from .store import COLUMNS, DEFAULT_STORE_NAME, ResultStore, build_query, coerce_field_value
+from .timeline import DEFAULT_MEMORY_LIMIT as DEFAULT_TIMELINE_MEMORY
+from .timeline import DEFAULT_TIMELINE_NAME, EVENT_FIELDS, TimelineBuilder
+from .timeline import FORMATS as TIMELINE_FORMATS
+from .watch import (
+    DEFAULT_JOURNAL_NAME, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_SECONDS, FolderWatcher,
+)
+
+DEFAULT_CSV_NAME = 'metadata_output.csv'
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the argument parser with all subcommands"""
+    parser = argparse.ArgumentParser(
+        prog='metadata_extractor',
+        description='Headless metadata extractor (no GUI dependencies)'
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    extract = subparsers.add_parser('extract', help='Extract metadata from files and directories')
+    extract.add_argument('paths', nargs='+', help='Files or directories to process')
+    extract.add_argument('-w', '--workers', type=int, default=None,
+                         help='Worker processes (default: CPU count, 1 = in-process)')
+    extract.add_argument('--chunksize', type=int, default=16,
+                         help='Files per task sent to a worker (default: 16)')
+    extract.add_argument('--unordered', action='store_true',
+                         help='Deliver results as they complete instead of in walk order')
+    extract.add_argument('--pipeline', action='store_true',
+                         help='Use the threaded stat/hash/parse pipeline instead of '
+                              'worker processes (overlaps disk reads with parsing)')
+    extract.add_argument('--stat-workers', type=int, default=2,
+                         help='Pipeline threads for stat and cache lookups (default: 2)')
+    extract.add_argument('--hash-workers', type=int, default=4,
+                         help='Pipeline threads reading and hashing files (default: 4)')
+    extract.add_argument('--parse-workers', type=int, default=2,
+                         help='Pipeline threads parsing headers (default: 2)')
+    extract.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                         help=f'Capacity of each pipeline queue (default: {DEFAULT_QUEUE_SIZE})')
+    extract.add_argument('--adaptive-io', action='store_true',
+                         help='Schedule reads per device (implies --pipeline): inode order on hard '
+                              'disks and a concurrency limit per device, tuned from measured '
+                              'throughput up to --hash-workers reads in flight')
+    extract.add_argument('--io-max-mbps', type=float, default=None,
+                         help='With --adaptive-io: cap the read bandwidth of each device, in MiB/s')
+    extract.add_argument('--hash', dest='hash_algorithms', default='md5',
+                         help='Comma-separated digests computed in one pass, '
+                              'e.g. md5,sha1,sha256 (default: md5)')
+    extract.add_argument('--fields', default=None,
+                         help='Comma-separated field groups ({}) or columns such as exif_Model; '
+                              'only the reads and extractors they need run, e.g. "basic" for a '
+                              'stat-only triage (default: everything)'.format(', '.join(GROUPS)))
+    extract.add_argument('--perceptual', action='store_true',
+                         help='Also compute perceptual hashes of images (aHash, dHash, pHash; '
+                              'needs Pillow) for the similar command')
+    extract.add_argument('--deep-media', action='store_true',
+                         help='Analyse audio/video with pymediainfo instead of the '
+                              'built-in MP4/WAV/FLAC header parsers')
+    _add_known_arguments(extract)
+    extract.add_argument('--known-good-action', choices=KNOWN_ACTIONS, default='tag',
+                         help='tag: keep known-good files as stat + hash rows; skip: leave them '
+                              'out of every output (default: tag)')
+    extract.add_argument('--archives', action='store_true',
+                         help='Also extract every member of ZIP/TAR/gz/bz2/xz archives '
+                              '(streamed, nothing is unpacked to disk)')
+    extract.add_argument('--archive-depth', type=int, default=DEFAULT_MAX_DEPTH,
+                         help='Follow archives nested this many levels deep '
+                              f'(default: {DEFAULT_MAX_DEPTH})')
+    extract.add_argument('--archive-memory-mb', type=int, default=DEFAULT_MEMORY_LIMIT // (1024 * 1024),
+                         help='Members up to this size are parsed from memory; larger ones from '
+                              f'their header only (default: {DEFAULT_MEMORY_LIMIT // (1024 * 1024)})')
+    extract.add_argument('--cache', dest='cache_path', default=None,
+                         help='SQLite extraction cache; unchanged files are not re-read')
+    extract.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                         help='Evict least recently used cache entries beyond this size')
+    extract.add_argument('--verify-cache', action='store_true',
+                         help='Re-hash cache hits and discard entries whose digests changed')
+    extract.add_argument('--no-recursive', action='store_true',
+                         help='Do not descend into subdirectories')
+    extract.add_argument('--csv', dest='csv_path', default=None,
+                         help=f'Write all rows to one CSV (default: {DEFAULT_CSV_NAME} per folder)')
+    extract.add_argument('--no-csv', action='store_true', help='Do not write any CSV output')
+    extract.add_argument('--json', dest='json_path', default=None,
+                         help='Stream records to a .json array or .jsonl file '
+                              '(append .gz or .zst to compress)')
+    extract.add_argument('--store', dest='store_path', default=None,
+                         help='Also insert records into a queryable SQLite result store '
+                              f'(e.g. {DEFAULT_STORE_NAME}; see the query command)')
+    extract.add_argument('--duplicates', dest='duplicates_path', nargs='?', const='', default=None,
+                         help='Also write a duplicate-group index from the computed digests '
+                              f'(default: {DEFAULT_INDEX_NAME} next to --csv)')
+    extract.add_argument('--timeline', dest='timeline_path', default=None,
+                         help='Also write a chronological timeline CSV (one row per timestamp '
+                              'per file; sorted on disk, see the timeline command)')
+    extract.add_argument('--job', dest='job_dir', default=None,
+                         help='Checkpoint progress in this directory; running the same command '
+                              'again after a crash resumes without duplicating output')
+    extract.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_FILES,
+                         help='With --job: commit the journal every N files '
+                              f'(default: {DEFAULT_CHECKPOINT_FILES}, or every few seconds)')
+    extract.add_argument('--metrics', dest='metrics_path', default=None,
+                         help='Save per-stage timings (by file type and extension) as JSON')
+    extract.add_argument('--no-metrics', action='store_true',
+                         help='Disable stage timing instrumentation')
+    extract.add_argument('-q', '--quiet', action='store_true', help='Suppress progress output')
+    extract.set_defaults(func=cmd_extract)
+
+    watch = subparsers.add_parser('watch', help='Watch drop folders and extract files as they arrive')
+    watch.add_argument('paths', nargs='+', help='Directories to watch')
+    watch.add_argument('--journal', default=None,
+                       help=f'Processed-file journal (default: {DEFAULT_JOURNAL_NAME} in the first '
+                            'directory); files in it are not processed again after a restart')
+    watch.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                       help='Seconds a file must stop changing before it is processed '
+                            f'(default: {DEFAULT_SETTLE_SECONDS})')
+    watch.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                       help=f'Seconds between checks (default: {DEFAULT_POLL_INTERVAL})')
+    watch.add_argument('--polling', action='store_true',
+                       help='Rescan the tree instead of using inotify')
+    watch.add_argument('--hash', dest='hash_algorithms', default='md5',
+                       help='Comma-separated digests (default: md5)')
+    watch.add_argument('--fields', default=None,
+                       help='Comma-separated field groups or columns to extract (default: all)')
+    watch.add_argument('--perceptual', action='store_true',
+                       help='Also compute perceptual hashes of images (needs Pillow)')
+    watch.add_argument('--deep-media', action='store_true',
+                       help='Analyse audio/video with pymediainfo')
+    _add_known_arguments(watch)
+    watch.add_argument('--archives', action='store_true',
+                       help='Also extract the members of archives that arrive')
+    watch.add_argument('--no-recursive', action='store_true',
+                       help='Do not watch subdirectories')
+    watch.add_argument('--csv', dest='csv_path', default=None,
+                       help=f'Append all rows to one CSV (default: {DEFAULT_CSV_NAME} per folder)')
+    watch.add_argument('--store', dest='store_path', default=None,
+                       help='Also insert records into a SQLite result store')
+    watch.add_argument('-q', '--quiet', action='store_true', help='Only report errors')
+    watch.set_defaults(func=cmd_watch)
+
+    query = subparsers.add_parser('query', help='Query a result store written with --store')
+    query.add_argument('store', help='Result store (SQLite)')
+    query.add_argument('--type', dest='file_type', default=None,
+                       help='File type: image, video, audio, document or other')
+    query.add_argument('--ext', dest='extension', default=None, help='Extension, e.g. .jpg')
+    query.add_argument('--make', dest='camera_make', default=None, help='Camera make (EXIF Make)')
+    query.add_argument('--model', dest='camera_model', default=None,
+                       help='Camera model (EXIF Model), exact match')
+    query.add_argument('--from', dest='date_from', default=None,
+                       help='Earliest date, e.g. 2024-01-01 or 2024-01-01T08:00:00')
+    query.add_argument('--to', dest='date_to', default=None,
+                       help='Latest date; a date without a time includes the whole day')
+    query.add_argument('--date-field', default='date_taken',
+                       choices=('date_taken', 'modified', 'created', 'accessed'),
+                       help='Column --from/--to apply to (default: date_taken)')
+    query.add_argument('--min-size', type=int, default=None, help='Minimum size in bytes')
+    query.add_argument('--max-size', type=int, default=None, help='Maximum size in bytes')
+    query.add_argument('--path', dest='path_like', default=None,
+                       help="SQL LIKE pattern on the file path, e.g. '%%/DCIM/%%'")
+    query.add_argument('--mismatch', action='store_true',
+                       help='Only files whose content does not match their extension')
+    query.add_argument('--field', action='append', default=[], metavar='KEY=VALUE',
+                       help='Match any other key, e.g. md5_hash=<digest> or exif_ISOSpeedRatings=400 '
+                            '(repeatable)')
+    query.add_argument('--where', default=None, help='Extra SQL condition on the records table')
+    query.add_argument('--columns', default='filepath,file_type,size_bytes,modified,'
+                                            'camera_model,date_taken',
+                       help=f'Comma-separated columns for csv output; available: {", ".join(COLUMNS)}')
+    query.add_argument('--order-by', default=None, help='Sort column(s), e.g. date_taken')
+    query.add_argument('--limit', type=int, default=None, help='Return at most this many rows')
+    query.add_argument('--format', dest='output_format', default='csv', choices=('csv', 'jsonl'),
+                       help='csv (selected columns) or jsonl (full records); default: csv')
+    query.add_argument('--count', action='store_true', help='Only print the number of matches')
+    query.add_argument('-o', '--output', default=None, help='Write results here instead of stdout')
+    query.set_defaults(func=cmd_query)
+
+    shard = subparsers.add_parser('shard', help='Split a case across workstations that share a '
+                                                'directory, then merge the results')
+    shard_actions = shard.add_subparsers(dest='shard_command')
+    shard_actions.required = True
+
+    plan = shard_actions.add_parser('plan', help='Walk the evidence and write the shard manifest')
+    plan.add_argument('shard_dir', help='Shared shard directory (manifest, locks and results)')
+    plan.add_argument('paths', nargs='+', help='Files or directories to process')
+    plan.add_argument('-n', '--shards', type=int, required=True, help='Number of shards')
+    plan.add_argument('--strategy', choices=STRATEGIES, default='hash',
+                      help='hash: by path hash (stable); size: balance total bytes (default: hash)')
+    plan.add_argument('--no-recursive', action='store_true',
+                      help='Do not descend into subdirectories')
+    plan.set_defaults(func=cmd_shard_plan)
+
+    run = shard_actions.add_parser('run', help='Claim and extract shards')
+    run.add_argument('shard_dir', help='Shared shard directory')
+    run.add_argument('--index', type=int, default=None,
+                     help='Run this shard only (default: claim pending shards until none are left)')
+    run.add_argument('--force', action='store_true',
+                     help='With --index: take over a shard whose lock was left by a crashed run')
+    run.add_argument('-w', '--workers', type=int, default=None,
+                     help='Worker processes (default: CPU count, 1 = in-process)')
+    run.add_argument('--pipeline', action='store_true',
+                     help='Use the threaded stat/hash/parse pipeline instead of worker processes')
+    run.add_argument('--hash', dest='hash_algorithms', default='md5',
+                     help='Comma-separated digests (default: md5)')
+    run.add_argument('--fields', default=None,
+                     help='Comma-separated field groups or columns to extract (default: all)')
+    run.add_argument('--perceptual', action='store_true',
+                     help='Also compute perceptual hashes of images (needs Pillow)')
+    run.add_argument('--deep-media', action='store_true',
+                     help='Analyse audio/video with pymediainfo')
+    _add_known_arguments(run)
+    run.set_defaults(func=cmd_shard_run)
+
+    merge = shard_actions.add_parser('merge', help='Merge shard results and check coverage')
+    merge.add_argument('shard_dir', help='Shared shard directory')
+    merge.add_argument('--csv', dest='csv_path', default=None,
+                       help=f'Merged CSV (default: {DEFAULT_MERGED_NAME} in the shard directory)')
+    merge.add_argument('--json', dest='json_path', default=None,
+                       help='Also write the merged records as .json/.jsonl (.gz/.zst to compress)')
+    merge.set_defaults(func=cmd_shard_merge)
+
+    status = shard_actions.add_parser('status', help='Show which shards are pending, claimed or done')
+    status.add_argument('shard_dir', help='Shared shard directory')
+    status.set_defaults(func=cmd_shard_status)
+
+    timeline = subparsers.add_parser('timeline', help='Build one chronological timeline from '
+                                                      'extraction results (bounded memory)')
+    timeline.add_argument('inputs', nargs='+',
+                          help='Result files: CSV, .json/.jsonl (.gz/.zst) or a result store')
+    timeline.add_argument('-o', '--output', default=DEFAULT_TIMELINE_NAME,
+                          help=f'Timeline file, .gz/.zst to compress (default: {DEFAULT_TIMELINE_NAME})')
+    timeline.add_argument('--format', dest='output_format', choices=TIMELINE_FORMATS, default='csv',
+                          help='csv: one row per event; mactime: mactime CSV layout with MACB '
+                               'flags (default: csv)')
+    timeline.add_argument('--events', default=','.join(EVENT_FIELDS),
+                          help='Comma-separated timestamp fields that become events '
+                               '(default: %(default)s)')
+    timeline.add_argument('--memory-mb', type=int, default=DEFAULT_TIMELINE_MEMORY // (1024 * 1024),
+                          help='Events kept in memory before a sorted run is spilled to disk, in MiB '
+                               f'(default: {DEFAULT_TIMELINE_MEMORY // (1024 * 1024)})')
+    timeline.add_argument('--temp-dir', default=None,
+                          help='Directory for the spilled runs (default: next to the output)')
+    timeline.add_argument('-q', '--quiet', action='store_true', help='Suppress the summary')
+    timeline.set_defaults(func=cmd_timeline)
+
+    similar = subparsers.add_parser('similar', help='Group visually similar images by the perceptual '
+                                                    'hashes of an extraction run (--perceptual)')
+    similar.add_argument('inputs', nargs='+',
+                         help='Result files: CSV, .json/.jsonl (.gz/.zst) or a result store')
+    similar.add_argument('--algorithm', choices=PERCEPTUAL_ALGORITHMS, default=DEFAULT_ALGORITHM,
+                         help=f'Perceptual hash to compare (default: {DEFAULT_ALGORITHM})')
+    similar.add_argument('-d', '--distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                         help='Largest Hamming distance (differing bits of 64) between near '
+                              f'duplicates (default: {DEFAULT_MAX_DISTANCE})')
+    similar.add_argument('-o', '--output', default=DEFAULT_SIMILAR_NAME,
+                         help=f'Near-duplicate group CSV (default: {DEFAULT_SIMILAR_NAME})')
+    similar.add_argument('-q', '--quiet', action='store_true', help='Suppress the summary')
+    similar.set_defaults(func=cmd_similar)
+
+    hashset = subparsers.add_parser('hashset', help='Build and inspect known-file hash set indexes '
+                                                    '(NSRL-style lists)')
+    hashset_actions = hashset.add_subparsers(dest='hashset_command')
+    hashset_actions.required = True
+
+    build = hashset_actions.add_parser('build', help='Index hash lists for --known-good/--known-bad')
+    build.add_argument('sources', nargs='+',
+                       help='Hash lists: NSRL CSV, md5sum/hashdeep output or one digest per line '
+                            '(.gz/.zst allowed)')
+    build.add_argument('-o', '--output', required=True, help='Index file to write')
+    build.add_argument('--algorithm', default='md5',
+                       help='Digest to index, e.g. md5, sha1 or sha256 (default: md5)')
+    build.add_argument('--label', default=None,
+                       help='Set name written to tagged records (default: first list file name)')
+    build.add_argument('--memory-mb', type=int, default=DEFAULT_TIMELINE_MEMORY // (1024 * 1024),
+                       help='Digests sorted in memory before a run is spilled to disk, in MiB '
+                            f'(default: {DEFAULT_TIMELINE_MEMORY // (1024 * 1024)})')
+    build.add_argument('--temp-dir', default=None,
+                       help='Directory for the spilled runs (default: next to the output)')
+    build.add_argument('-q', '--quiet', action='store_true', help='Suppress the summary')
+    build.set_defaults(func=cmd_hashset_build)
+
+    info = hashset_actions.add_parser('info', help='Show the algorithm, label and size of indexes')
+    info.add_argument('indexes', nargs='+', help='Index files')
+    info.set_defaults(func=cmd_hashset_info)
+
+    dedup = subparsers.add_parser('dedup', help='Find duplicate files (size buckets, then partial '
+                                                'and full hashes only where needed)')
+    dedup.add_argument('paths', nargs='+', help='Files or directories to scan')
+    dedup.add_argument('-o', '--output', default=DEFAULT_INDEX_NAME,
+                       help=f'Duplicate-group index CSV (default: {DEFAULT_INDEX_NAME})')
+    dedup.add_argument('--hash', dest='hash_algorithm', default='md5',
+                       help='Digest used for the partial and full passes (default: md5)')
+    dedup.add_argument('--block-kb', type=int, default=PARTIAL_BLOCK_SIZE // 1024,
+                       help='Bytes hashed from each end of a file in the partial pass, in KiB '
+                            f'(default: {PARTIAL_BLOCK_SIZE // 1024})')
+    dedup.add_argument('--min-size', type=int, default=1,
+                       help='Ignore files smaller than this many bytes (default: 1, skips empty files)')
+    dedup.add_argument('--threads', type=int, default=4,
+                       help='Threads reading and hashing candidates (default: 4)')
+    dedup.add_argument('--no-recursive', action='store_true',
+                       help='Do not descend into subdirectories')
+    dedup.add_argument('-q', '--quiet', action='store_true', help='Suppress the summary')
+    dedup.set_defaults(func=cmd_dedup)
+
+    corpus = subparsers.add_parser('corpus', help='Generate a deterministic synthetic evidence corpus')
+    _add_corpus_arguments(corpus)
+    corpus.add_argument('dest', help='Directory to create the corpus in')
+    corpus.set_defaults(func=cmd_corpus)
+
+    bench = subparsers.add_parser('bench', help='Benchmark extractors, sinks and engines on a corpus')
+    bench.add_argument('corpus', help='Corpus directory (generated first if it has no manifest)')
+    _add_corpus_arguments(bench)
+    bench.add_argument('-o', '--output', default=None, help='Save results as JSON')
+    bench.add_argument('--hash', dest='hash_algorithms', default='md5',
+                       help='Comma-separated digests (default: md5)')
+    bench.add_argument('-w', '--workers', type=int, default=None,
+                       help='Worker processes for the process-pool engine (default: CPU count)')
+    bench.add_argument('--baseline', default=None,
+                       help='Earlier results JSON; exit with status 1 on throughput regressions')
+    bench.add_argument('--tolerance', type=float, default=10.0,
+                       help='Allowed throughput drop versus the baseline, in percent (default: 10)')
+    bench.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def _add_corpus_arguments(parser: argparse.ArgumentParser):
+    """Options shared by the corpus and bench subcommands"""
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplier for the number of files of each kind (default: 1.0)')
+    parser.add_argument('--sparse-mb', type=int, default=DEFAULT_SPARSE_MB,
+                        help=f'Size of each sparse binary (default: {DEFAULT_SPARSE_MB})')
+
+
+def _add_known_arguments(parser: argparse.ArgumentParser):
+    """Known-file hash set options shared by extract, watch and shard run"""
+    parser.add_argument('--known-good', action='append', default=[], metavar='INDEX',
+                        help='Hash set index of known-good files (see hashset build): tagged '
+                             'known_file=good and not parsed (repeatable)')
+    parser.add_argument('--known-bad', action='append', default=[], metavar='INDEX',
+                        help='Hash set index of known-bad files: tagged known_file=bad '
+                             '(repeatable)')
+
+
+def _open_known_files(args: argparse.Namespace, hash_algorithms,
+                      projection: Projection) -> Optional[KnownFiles]:
+    """KnownFiles for --known-good/--known-bad; raises ValueError if they can not be used"""
+    if not args.known_good and not args.known_bad:
+        return None
+    if not projection.hashes:
+        raise ValueError("--known-good/--known-bad need the 'hashes' field group")
+    try:
+        known_files = KnownFiles(args.known_good, args.known_bad)
+    except OSError as e:
+        raise ValueError(str(e))
+    missing = [name for name in known_files.algorithms if name not in hash_algorithms]
+    if missing:
+        raise ValueError(f"Hash set indexes use {', '.join(missing)}: add it to --hash")
+    return known_files
+
+
+def _plan_fields(args: argparse.Namespace) -> Projection:
+    """Projection for --fields and --perceptual; raises ValueError for unknown names"""
+    include = ('perceptual',) if getattr(args, 'perceptual', False) else ()
+    if not args.fields:
+        return plan_projection(include=include)
+    fields = args.fields.split(',')
+    if getattr(args, 'archives', False):
+        fields.append('type')  # archives are recognised by sniffing their content
+    return plan_projection(fields, include=include)
+
+
+def cmd_extract(args: argparse.Namespace) -> int:
+    """Run a batch extraction and write CSV output"""
+    def report_error(path: str, error: Exception):
+        print(f"Skipped: {path} ({error})", file=sys.stderr)
+
+    try:
+        hash_algorithms = normalize_algorithms(args.hash_algorithms.split(','))
+        projection = _plan_fields(args)
+        known_files = _open_known_files(args, hash_algorithms, projection)
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    skip_known = known_files is not None and args.known_good_action == 'skip'
+    if args.duplicates_path is not None and not projection.hashes:
+        print("Error: --duplicates needs the 'hashes' field group", file=sys.stderr)
+        return 2
+
+    cache = None
+    if args.cache_path:
+        cache = ExtractionCache(args.cache_path, max_bytes=args.cache_max_mb * 1024 * 1024,
+                                verify=args.verify_cache)
+
+    io_scheduler = None
+    if args.adaptive_io or args.io_max_mbps:
+        io_scheduler = DeviceScheduler(
+            max_concurrency=args.hash_workers,
+            max_bytes_per_second=args.io_max_mbps and args.io_max_mbps * 1024 * 1024)
+    if args.pipeline or io_scheduler is not None:
+        engine = StagedPipeline(stat_workers=args.stat_workers, hash_workers=args.hash_workers,
+                                parse_workers=args.parse_workers, queue_size=args.queue_size,
+                                ordered=not args.unordered, hash_algorithms=hash_algorithms,
+                                cache=cache, deep_media=args.deep_media, projection=projection,
+                                known_files=known_files, io_scheduler=io_scheduler)
+    else:
+        engine = BatchExtractor(workers=args.workers, ordered=not args.unordered,
+                                chunksize=args.chunksize, hash_algorithms=hash_algorithms,
+                                cache=cache, deep_media=args.deep_media, projection=projection,
+                                known_files=known_files)
+
+    METRICS.enabled = not args.no_metrics
+    METRICS.reset()
+
+    processed = 0
+    errors = 0
+    known = {'good': 0, 'bad': 0}
+    start = time.perf_counter()
+
+    # Never feed our own output back into the walk
+    exclude = {DEFAULT_CSV_NAME}
+    if args.csv_path:
+        exclude.add(os.path.basename(args.csv_path))
+    if args.cache_path:
+        name = os.path.basename(args.cache_path)
+        exclude.update((name, name + '-wal', name + '-shm'))
+
+    store = None
+    if args.store_path:
+        name = os.path.basename(args.store_path)
+        exclude.update((name, name + '-wal', name + '-shm'))
+        store = ResultStore(args.store_path)
+
+    duplicates = None
+    if args.duplicates_path is not None:
+        duplicates = []
+        if not args.duplicates_path:
+            directory = os.path.dirname(args.csv_path) if args.csv_path else ''
+            args.duplicates_path = os.path.join(directory, DEFAULT_INDEX_NAME)
+        exclude.add(os.path.basename(args.duplicates_path))
+    digest_key = f'{hash_algorithms[0]}_hash'
+
+    if args.json_path:
+        exclude.add(os.path.basename(args.json_path))
+
+    timeline = None
+    if args.timeline_path:
+        exclude.add(os.path.basename(args.timeline_path))
+        timeline = TimelineBuilder(temp_dir=os.path.dirname(os.path.abspath(args.timeline_path)))
+
+    job = None
+    if args.job_dir:
+        params = {
+            'paths': [os.path.abspath(path) for path in args.paths],
+            'recursive': not args.no_recursive,
+            'hash': list(hash_algorithms),
+            'deep_media': args.deep_media,
+            'fields': projection.profile,
+            'archives': args.archive_depth if args.archives else None,
+            'csv': None if args.no_csv else (os.path.abspath(args.csv_path) if args.csv_path
+                                             else DEFAULT_CSV_NAME),
+            'json': args.json_path and os.path.abspath(args.json_path),
+            'store': args.store_path and os.path.abspath(args.store_path),
+        }
+        if args.timeline_path:
+            params['timeline'] = os.path.abspath(args.timeline_path)
+        if known_files is not None:
+            params['known_files'] = [known_files.profile, args.known_good_action]
+        try:
+            job = ExtractionJob(args.job_dir, params, checkpoint_files=args.checkpoint_every)
+        except (ValueError, OSError) as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 2
+        if job.finished:
+            print(f"Job in {args.job_dir} already finished", file=sys.stderr)
+            job.close()
+            return 0
+        if job.resumed:
+            print(f"Resuming job in {args.job_dir}: {job.done_files} files already done",
+                  file=sys.stderr)
+        csv_pool = CSVWriterPool(before_finalize=job.before_csv, after_finalize=job.after_csv)
+    else:
+        csv_pool = CSVWriterPool()
+
+    json_sink = None
+    if args.json_path:
+        try:
+            json_sink = JSONLinesSink(args.json_path)
+        except Exception as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 2
+
+    def emit(metadata):
+        if not args.no_csv:
+            if args.csv_path:
+                csv_path = args.csv_path
+            else:
+                csv_path = os.path.join(metadata['directory'], DEFAULT_CSV_NAME)
+            csv_pool.write(csv_path, metadata)
+        if json_sink is not None:
+            json_sink.write(metadata)
+        if store is not None:
+            store.write(metadata)
+        if duplicates is not None:
+            duplicates.append((metadata['size_bytes'], metadata.get(digest_key), metadata['filepath']))
+        if timeline is not None:
+            timeline.add(metadata)
+
+    try:
+        if job is None or not job.extracted:
+            if job is None:
+                records = engine.run_paths(args.paths, recursive=not args.no_recursive,
+                                           on_error=report_error, exclude_names=exclude)
+            else:
+                records = engine.run(job.pending(iter_files(
+                    args.paths, recursive=not args.no_recursive, on_error=report_error,
+                    exclude_names=exclude)))
+            if args.archives:
+                archives = ArchiveExtractor(hash_algorithms, max_depth=args.archive_depth,
+                                            memory_limit=args.archive_memory_mb * 1024 * 1024,
+                                            deep_media=args.deep_media, projection=projection,
+                                            known_files=known_files)
+                records = archives.expand(records)
+
+            for metadata in records:
+                if 'error' in metadata:
+                    errors += 1
+                    print(f"Error processing {metadata.get('filepath', '?')}: {metadata['error']}",
+                          file=sys.stderr)
+                    continue
+
+                processed += 1
+                status = metadata.get('known_file')
+                if status is not None:
+                    known[status] += 1
+                    if skip_known and status == 'good':
+                        continue
+                if job is not None:
+                    job.write(metadata)
+                else:
+                    emit(metadata)
+
+                if not args.quiet and processed % 1000 == 0:
+                    print(f"Processed {processed} files...", file=sys.stderr)
+
+        if job is not None:
+            # Outputs are built from the journaled records only once everything is extracted
+            job.finish_extraction()
+            if job.skipped:
+                print(f"Skipped {job.skipped} files finished before the restart", file=sys.stderr)
+            for metadata in job.replay():
+                emit(metadata)
+    finally:
+        if job is not None and not job.extracted:
+            job.close()
+
+    exported = csv_pool.close()
+    if not exported:
+        errors += 1
+    if json_sink is not None:
+        json_sink.close()
+    if store is not None:
+        store.close()
+        print(f"Stored {store.count} records in {args.store_path}", file=sys.stderr)
+    if duplicates is not None:
+        groups = group_digests(duplicates)
+        write_duplicate_index(groups, args.duplicates_path, hash_algorithms[0])
+        summary = summarize_groups(groups)
+        print(f"Duplicates: {summary['groups']} groups, {summary['duplicate_files']} redundant "
+              f"copies written to {args.duplicates_path}", file=sys.stderr)
+    if timeline is not None:
+        try:
+            rows = timeline.write(args.timeline_path)
+        finally:
+            timeline.close()
+        print(f"Timeline: {rows} events written to {args.timeline_path}", file=sys.stderr)
+
+    if io_scheduler is not None and not args.quiet:
+        for device in io_scheduler.summary():
+            print(f"Device {device['device']} ({device['kind']}): {device['files']} files, "
+                  f"{device['bytes'] / (1024 * 1024):.1f} MiB at {device['mb_per_sec']} MiB/s, "
+                  f"{device['limit']} reads in flight (peak {device['peak_limit']})",
+                  file=sys.stderr)
+    if known_files is not None:
+        skipped = ' (left out of the outputs)' if skip_known else ''
+        print(f"Known files: {known['good']} known-good{skipped}, {known['bad']} known-bad",
+              file=sys.stderr)
+
+    if cache is not None:
+        cache.close()
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses", file=sys.stderr)
+    if job is not None:
+        # Extraction errors are reported, not retried; a failed CSV export is redone on rerun
+        if exported:
+            job.finish()
+        job.close()
+
+    if METRICS.enabled:
+        if not args.quiet:
+            print(METRICS.format_table(), file=sys.stderr)
+        if args.metrics_path:
+            with open(args.metrics_path, 'w', encoding='utf-8') as f:
+                json.dump(METRICS.summary(), f, indent=2)
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Completed processing {processed} files ({errors} errors) "
+          f"in {elapsed:.1f}s ({rate:.1f} files/sec)", file=sys.stderr)
+    return 0 if errors == 0 else 1
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    """Process files from drop folders as soon as they have settled"""
+    for path in args.paths:
+        if not os.path.isdir(path):
+            print(f"Error: not a directory: {path}", file=sys.stderr)
+            return 2
+    try:
+        hash_algorithms = normalize_algorithms(args.hash_algorithms.split(','))
+        projection = _plan_fields(args)
+        known_files = _open_known_files(args, hash_algorithms, projection)
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+
+    # Our own output lands in the watched tree; never treat it as evidence.
+    # CSV rewrites go through a temporary file that is renamed over the CSV
+    # before the watcher looks again, so it disappears before it can settle
+    exclude = {DEFAULT_CSV_NAME}
+    if args.csv_path:
+        exclude.add(os.path.basename(args.csv_path))
+    store = None
+    if args.store_path:
+        name = os.path.basename(args.store_path)
+        exclude.update((name, name + '-wal', name + '-shm'))
+        store = ResultStore(args.store_path)
+    journal_path = args.journal or os.path.join(args.paths[0], DEFAULT_JOURNAL_NAME)
+
+    watcher = FolderWatcher(args.paths, journal_path, settle_seconds=args.settle,
+                            poll_interval=args.interval, recursive=not args.no_recursive,
+                            exclude_names=exclude, use_inotify=not args.polling)
+    pipeline = StagedPipeline(hash_algorithms=hash_algorithms, deep_media=args.deep_media,
+                              projection=projection, known_files=known_files)
+    archives = None
+    if args.archives:
+        archives = ArchiveExtractor(hash_algorithms, deep_media=args.deep_media,
+                                    projection=projection, known_files=known_files)
+    if not args.quiet:
+        print(f"Watching {', '.join(args.paths)} ({watcher.mode}, {len(watcher.journal)} files "
+              f"already processed); press Ctrl+C to stop", file=sys.stderr)
+
+    try:
+        for batch in watcher.batches():
+            records = pipeline.run([filepath for filepath, _ in batch])
+            if archives is not None:
+                records = archives.expand(records)
+            csv_pool = CSVWriterPool()
+            processed = 0
+            for metadata in records:
+                if 'error' in metadata:
+                    print(f"Error processing {metadata.get('filepath', '?')}: {metadata['error']}",
+                          file=sys.stderr)
+                    continue
+                processed += 1
+                csv_pool.write(args.csv_path or os.path.join(metadata['directory'], DEFAULT_CSV_NAME),
+                               metadata)
+                if store is not None:
+                    store.write(metadata)
+            # Rows are on disk before the journal says so: a crash repeats a batch, never drops it
+            csv_pool.close()
+            if store is not None:
+                store.flush()
+            watcher.mark_processed(batch)
+            if not args.quiet:
+                print(f"Processed {processed} records from {len(batch)} new files", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if store is not None:
+            store.close()
+    return 0
+
+
+def cmd_query(args: argparse.Namespace) -> int:
+    """Print records from a result store that match the given filters"""
+    columns = [c.strip() for c in args.columns.split(',') if c.strip()]
+    fields = []
+    for item in args.field:
+        key, sep, value = item.partition('=')
+        if not sep:
+            print(f"Error: --field expects KEY=VALUE, got {item!r}", file=sys.stderr)
+            return 2
+        fields.append((key, coerce_field_value(value)))
+    try:
+        sql, params = build_query(
+            columns, file_type=args.file_type, extension=args.extension,
+            camera_make=args.camera_make, camera_model=args.camera_model,
+            date_from=args.date_from, date_to=args.date_to, date_column=args.date_field,
+            min_size=args.min_size, max_size=args.max_size, fields=fields,
+            path_like=args.path_like, mismatch_only=args.mismatch, where=args.where,
+            order_by=args.order_by, limit=args.limit, count=args.count)
+        store = ResultStore(args.store, readonly=True)
+    except (ValueError, OSError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    matched = 0
+    try:
+        rows = store.select(sql, params)
+        if args.count:
+            matched = next(rows)['count']
+            print(matched, file=out)
+        elif args.output_format == 'jsonl':
+            ids = []
+            for row in rows:
+                ids.append(row['id'])
+                if len(ids) >= 500:
+                    matched += _write_jsonl(store.records(ids), out)
+                    ids = []
+            matched += _write_jsonl(store.records(ids), out)
+        else:
+            writer = csv.writer(out)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(['' if row[c] is None else row[c] for c in columns])
+                matched += 1
+    except sqlite3.Error as e:
+        # e.g. a typo in --where or --order-by
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    finally:
+        store.close()
+        if args.output:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    if not args.count:
+        print(f"{matched} records in {elapsed * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+def _write_jsonl(records, out) -> int:
+    for metadata in records:
+        out.write(json.dumps(metadata, ensure_ascii=False, default=str) + '\n')
+    return len(records)
+
+
+def cmd_shard_plan(args: argparse.Namespace) -> int:
+    """Write the manifest and per-shard path lists"""
+    def report_error(path: str, error: Exception):
+        print(f"Skipped: {path} ({error})", file=sys.stderr)
+
+    try:
+        header = plan_shards(args.paths, args.shard_dir, args.shards, args.strategy,
+                             recursive=not args.no_recursive,
+                             exclude_names={DEFAULT_CSV_NAME}, on_error=report_error)
+    except (ValueError, OSError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    for shard in header['shards']:
+        print(f"Shard {shard['index']}: {shard['files']} files, "
+              f"{shard['bytes'] / (1024 * 1024):.1f} MiB", file=sys.stderr)
+    print(f"Planned {header['files']} files in {len(header['shards'])} shards "
+          f"({header['strategy']}) in {args.shard_dir}", file=sys.stderr)
+    return 0
+
+
+def cmd_shard_run(args: argparse.Namespace) -> int:
+    """Claim shards (one, or all that are pending) and extract them"""
+    try:
+        hash_algorithms = normalize_algorithms(args.hash_algorithms.split(','))
+        projection = _plan_fields(args)
+        known_files = _open_known_files(args, hash_algorithms, projection)
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    # Both engines keep input order, so shard outputs stay sorted by path
+    if args.pipeline:
+        engine = StagedPipeline(ordered=True, hash_algorithms=hash_algorithms,
+                                deep_media=args.deep_media, projection=projection,
+                                known_files=known_files)
+    else:
+        engine = BatchExtractor(workers=args.workers, ordered=True, hash_algorithms=hash_algorithms,
+                                deep_media=args.deep_media, projection=projection,
+                                known_files=known_files)
+
+    errors = 0
+    try:
+        if args.index is not None:
+            if not claim_shard(args.shard_dir, args.index, force=args.force):
+                print(f"Shard {args.index} is done or claimed by another run "
+                      f"(see 'shard status'; --force takes over a stale lock)", file=sys.stderr)
+                return 1
+            indexes = iter([args.index])
+        else:
+            indexes = iter(lambda: next_shard(args.shard_dir), None)
+        for index in indexes:
+            start = time.perf_counter()
+            counts = run_shard(args.shard_dir, index, engine)
+            errors += counts['errors']
+            print(f"Shard {index}: {counts['files']} files ({counts['errors']} errors) "
+                  f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    except OSError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    return 0 if errors == 0 else 1
+
+
+def cmd_shard_merge(args: argparse.Namespace) -> int:
+    """Merge every shard output into one result; fails unless coverage is exact"""
+    csv_path = args.csv_path or os.path.join(args.shard_dir, DEFAULT_MERGED_NAME)
+    try:
+        report = merge_shards(args.shard_dir, csv_path, args.json_path)
+    except (ValueError, OSError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    if report['missing_shards']:
+        print(f"Shards without output: {', '.join(map(str, report['missing_shards']))}",
+              file=sys.stderr)
+    print(f"Merged {report['written']} records ({report['errors']} extraction errors) into "
+          f"{csv_path}; missing {report['missing']}, duplicates {report['duplicates']}, "
+          f"not in manifest {report['unexpected']}, changed since planning {report['changed']}. "
+          f"Details in {os.path.join(args.shard_dir, REPORT_NAME)}", file=sys.stderr)
+    return 0 if report['complete'] else 1
+
+
+def cmd_shard_status(args: argparse.Namespace) -> int:
+    """Print the state of every shard"""
+    try:
+        status = shard_status(args.shard_dir)
+    except (ValueError, OSError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    for shard in status:
+        line = f"Shard {shard['index']}: {shard['state']} ({shard['files']} files)"
+        lock = shard.get('lock')
+        if lock:
+            line += f" by {lock.get('host')} pid {lock.get('pid')} since {lock.get('claimed')}"
+        print(line)
+    return 0
+
+
+def cmd_dedup(args: argparse.Namespace) -> int:
+    """Find duplicate files and write the duplicate-group index"""
+    errors = []
+
+    def report_error(path: str, error: Exception):
+        errors.append(path)
+        print(f"Skipped: {path} ({error})", file=sys.stderr)
+
+    try:
+        finder = DuplicateFinder(args.hash_algorithm, block_size=args.block_kb * 1024,
+                                 min_size=args.min_size, threads=args.threads)
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    finder.add_paths(args.paths, recursive=not args.no_recursive, on_error=report_error,
+                     exclude_names=(os.path.basename(args.output),))
+    groups = finder.find(on_error=report_error)
+    write_duplicate_index(groups, args.output, finder.algorithm)
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        stats = finder.stats
+        summary = summarize_groups(groups)
+        mb = 1024 * 1024
+        print(f"Scanned {stats['files']} files ({stats['bytes'] / mb:.1f} MB): "
+              f"{stats['candidates']} share a size, {stats['partial_hashed']} partial hashes, "
+              f"{stats['full_hashed']} full hashes, {stats['bytes_read'] / mb:.1f} MB read",
+              file=sys.stderr)
+        print(f"Found {summary['groups']} duplicate groups ({summary['duplicate_files']} redundant "
+              f"copies, {summary['wasted_bytes'] / mb:.1f} MB) in {elapsed:.1f}s; "
+              f"index written to {args.output}", file=sys.stderr)
+    return 0 if not errors else 1
+
+
+def _is_store(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(16) == b'SQLite format 3\x00'
+
+
+def _iter_inputs(path: str):
+    """Records of a result file or result store"""
+    if not _is_store(path):
+        yield from iter_result_records(path)
+        return
+    store = ResultStore(path, readonly=True)
+    try:
+        ids = [row['id'] for row in store.select('SELECT id FROM records ORDER BY id')]
+        for start in range(0, len(ids), 500):
+            yield from store.records(ids[start:start + 500])
+    finally:
+        store.close()
+
+
+def _iter_hashes(path: str, key: str):
+    """(filepath, perceptual hash text) from a result file or result store"""
+    if not _is_store(path):
+        for metadata in iter_result_records(path):
+            yield metadata.get('filepath'), metadata.get(key)
+        return
+    store = ResultStore(path, readonly=True)
+    try:
+        yield from ((row['filepath'], row['value']) for row in store.select(
+            'SELECT records.filepath, fields.value FROM fields '
+            'JOIN keys ON keys.id = fields.key JOIN records ON records.id = fields.record_id '
+            'WHERE keys.name = ?', (key,)))
+    finally:
+        store.close()
+
+
+def cmd_timeline(args: argparse.Namespace) -> int:
+    """Sort the timestamps of extraction results into one timeline"""
+    fields = [name.strip() for name in args.events.split(',') if name.strip()]
+    if not fields or args.memory_mb < 1:
+        print("Error: --events and --memory-mb must not be empty or zero", file=sys.stderr)
+        return 2
+    temp_dir = args.temp_dir or os.path.dirname(os.path.abspath(args.output))
+    start = time.perf_counter()
+    with TimelineBuilder(args.memory_mb * 1024 * 1024, temp_dir, fields) as timeline:
+        try:
+            for path in args.inputs:
+                timeline.add_many(_iter_inputs(path))
+            rows = timeline.write(args.output, args.output_format)
+        except (ValueError, OSError, RuntimeError, csv.Error, sqlite3.Error) as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 2
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        print(f"Timeline of {timeline.records} files: {timeline.events} events "
+              f"({timeline.spilled_runs} sorted runs spilled), {rows} rows written to "
+              f"{args.output} in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+def cmd_similar(args: argparse.Namespace) -> int:
+    """Group near-duplicate images and write the group index"""
+    if not 0 <= args.distance < 64:
+        print("Error: --distance must be between 0 and 63", file=sys.stderr)
+        return 2
+    key = field_name(args.algorithm)
+    entries = {}
+    try:
+        for path in args.inputs:
+            for filepath, text in _iter_hashes(path, key):
+                value = parse_hash(text)
+                if filepath and value is not None:
+                    entries[filepath] = value  # a file listed twice keeps its last hash
+    except (ValueError, OSError, RuntimeError, csv.Error, sqlite3.Error) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    if not entries:
+        print(f"Error: no {key} values found; extract with --perceptual first", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    groups = find_near_duplicates(entries.items(), args.distance)
+    write_similar_index(groups, args.output, args.algorithm)
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        print(f"Compared {len(entries)} images ({len(set(entries.values()))} distinct hashes): "
+              f"{len(groups)} near-duplicate groups with {sum(len(g.paths) for g in groups)} files "
+              f"within distance {args.distance} in {elapsed:.1f}s; index written to {args.output}",
+              file=sys.stderr)
+    return 0
+
+
+def cmd_hashset_build(args: argparse.Namespace) -> int:
+    """Sort and index the digests of hash lists"""
+    start = time.perf_counter()
+    try:
+        counts = build_index(args.sources, args.output, args.algorithm, label=args.label,
+                             memory_limit=args.memory_mb * 1024 * 1024, temp_dir=args.temp_dir)
+    except (ValueError, OSError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    if not args.quiet:
+        print(f"Hash set: {counts['digests']} {args.algorithm} digests from {counts['lines']} lines "
+              f"({counts['duplicates']} duplicates) written to {args.output} "
+              f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+def cmd_hashset_info(args: argparse.Namespace) -> int:
+    """Print the header of each index"""
+    for path in args.indexes:
+        try:
+            with HashSetIndex(path) as index:
+                info = index.info()
+        except (ValueError, OSError) as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 2
+        print(f"{path}: {info['label']} ({info['algorithm']}), {info['digests']} digests, "
+              f"{info['file_bytes'] / (1024 * 1024):.1f} MiB")
+    return 0
+
+
+def cmd_corpus(args: argparse.Namespace) -> int:
+    """Write a synthetic corpus and print its manifest"""
+    manifest = generate_corpus(args.dest, seed=args.seed, scale=args.scale, sparse_mb=args.sparse_mb)
+    print(f"Generated {manifest['files']} files ({manifest['bytes'] / (1024 * 1024):.1f} MB) "
+          f"in {args.dest}", file=sys.stderr)
+    return 0
+
+
+def cmd_bench(args: argparse.Namespace) -> int:
+    """Benchmark on a corpus, optionally comparing against a baseline"""
+    from .benchmark import compare_results, format_results, run_benchmarks
+
+    try:
+        hash_algorithms = normalize_algorithms(args.hash_algorithms.split(','))
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+
+    if not os.path.isfile(os.path.join(args.corpus, MANIFEST_NAME)):
+        cmd_corpus(argparse.Namespace(dest=args.corpus, seed=args.seed, scale=args.scale,
+                                      sparse_mb=args.sparse_mb))
+
+    results = run_benchmarks(args.corpus, hash_algorithms, args.workers)
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.tolerance)
+        for line in regressions:
+            print(f"Regression: {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance}% versus {args.baseline}", file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,455 @@
+"""Pure-Python header parsers for MP4/MOV, WAV and FLAC containers
+
+Produces the same general_*/video_*/audio_* keys as the pymediainfo path
+for the fields analysts need most (duration, codec, resolution, sample
+format, creation time) while reading only box/chunk headers: media data
+is always skipped by seeking.
+"""
+
+import datetime
+import math
+import os
+import struct
+from typing import Dict, Any, BinaryIO, Iterator, Optional, Tuple
+
+from .prefetch import PrefetchedFile
+from .record import prefixed_key
+
+# Bytes read up front to recognise the container
+HEADER_SIZE = 64
+
+# Boxes/chunks larger than this are never read into memory
+MAX_READ = 1024 * 1024
+
+NATIVE_MEDIA_EXTENSIONS = {'.mp4', '.mov', '.m4v', '.m4a', '.3gp', '.wav', '.flac'}
+
+_MP4_EPOCH = datetime.datetime(1904, 1, 1)
+
+# Containers whose children are boxes we may need
+_MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'udta', b'edts'}
+
+_MP4_CODECS = {
+    b'avc1': 'AVC', b'avc3': 'AVC', b'hvc1': 'HEVC', b'hev1': 'HEVC', b'av01': 'AV1',
+    b'vp08': 'VP8', b'vp09': 'VP9', b'mp4v': 'MPEG-4 Visual', b's263': 'H.263',
+    b'jpeg': 'JPEG', b'mjpa': 'JPEG', b'apch': 'ProRes', b'apcn': 'ProRes',
+    b'apcs': 'ProRes', b'apco': 'ProRes', b'ap4h': 'ProRes',
+    b'mp4a': 'AAC', b'ac-3': 'AC-3', b'ec-3': 'E-AC-3', b'alac': 'ALAC',
+    b'Opus': 'Opus', b'fLaC': 'FLAC', b'samr': 'AMR', b'sawb': 'AMR-WB',
+    b'lpcm': 'PCM', b'sowt': 'PCM', b'twos': 'PCM', b'ipcm': 'PCM', b'fpcm': 'PCM',
+    b'.mp3': 'MPEG Audio',
+}
+
+_WAVE_FORMATS = {
+    0x0001: 'PCM', 0x0003: 'PCM', 0x0006: 'A-Law', 0x0007: 'U-Law',
+    0x0002: 'ADPCM', 0x0011: 'ADPCM', 0x0055: 'MPEG Audio', 0x0050: 'MPEG Audio',
+    0x2000: 'AC-3', 0x0161: 'WMA',
+}
+
+_RIFF_INFO_KEYS = {
+    b'INAM': 'general_title', b'IART': 'general_performer',
+    b'ICRD': 'general_recorded_date', b'ISFT': 'general_encoded_application',
+    b'ICMT': 'general_comment',
+}
+
+_VORBIS_KEYS = {
+    'TITLE': 'general_title', 'ARTIST': 'general_performer',
+    'DATE': 'general_recorded_date', 'ENCODER': 'general_encoded_application',
+    'COMMENT': 'general_comment',
+}
+
+
+class ContainerParseError(ValueError):
+    """Raised when a file is not one of the natively supported containers"""
+
+
+def _mp4_date(seconds: int) -> Optional[str]:
+    """Format a QuickTime/MP4 timestamp (seconds since 1904) like MediaInfo"""
+    if not seconds:
+        return None
+    try:
+        return (_MP4_EPOCH + datetime.timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S UTC')
+    except OverflowError:
+        return None
+
+
+def _iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload offset, payload size) for boxes in [start, end)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header[:8])
+        header_len = 8
+        if size == 1:
+            if len(header) < 16:
+                return
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_len = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_len:
+            return
+        yield box_type, pos + header_len, size - header_len
+        pos += size
+
+
+def _read_payload(f: BinaryIO, offset: int, size: int, limit: int = MAX_READ) -> bytes:
+    f.seek(offset)
+    return f.read(min(size, limit))
+
+
+class _Mp4Track:
+    __slots__ = ('handler', 'track_id', 'timescale', 'duration', 'creation', 'language',
+                 'codec', 'width', 'height', 'channels', 'sample_size', 'sample_rate',
+                 'sample_count', 'rotation')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, None)
+
+
+def _parse_mp4_trak(f: BinaryIO, offset: int, size: int) -> _Mp4Track:
+    """Collect tkhd/mdhd/hdlr/stsd/stsz fields of one track"""
+    track = _Mp4Track()
+    stack = [(offset, offset + size)]
+    while stack:
+        start, end = stack.pop()
+        for box_type, payload, length in _iter_boxes(f, start, end):
+            if box_type in _MP4_CONTAINERS:
+                stack.append((payload, payload + length))
+            elif box_type == b'tkhd':
+                data = _read_payload(f, payload, length, 96)
+                version = data[0] if data else 0
+                base = 4 + (16 if version == 1 else 8)
+                if len(data) >= base + 4:
+                    track.track_id = struct.unpack('>I', data[base:base + 4])[0]
+                # Transformation matrix a, b start after duration/reserved/layer/volume
+                matrix_at = base + 4 + 4 + (8 if version == 1 else 4) + 8 + 2 + 2 + 2 + 2
+                if len(data) >= matrix_at + 8:
+                    a, b = struct.unpack('>ii', data[matrix_at:matrix_at + 8])
+                    angle = round(math.degrees(math.atan2(b, a))) % 360
+                    track.rotation = angle
+            elif box_type == b'mdhd':
+                data = _read_payload(f, payload, length, 64)
+                if data and data[0] == 1 and len(data) >= 36:
+                    track.creation, _, track.timescale, track.duration = struct.unpack('>QQIQ', data[4:32])
+                elif len(data) >= 24:
+                    track.creation, _, track.timescale, track.duration = struct.unpack('>IIII', data[4:20])
+            elif box_type == b'hdlr':
+                data = _read_payload(f, payload, length, 32)
+                if len(data) >= 12:
+                    track.handler = data[8:12]
+            elif box_type == b'stsd':
+                _parse_mp4_stsd(track, _read_payload(f, payload, length, 256))
+            elif box_type in (b'stsz', b'stz2'):
+                data = _read_payload(f, payload, length, 12)
+                if len(data) >= 12:
+                    track.sample_count = struct.unpack('>I', data[8:12])[0]
+    return track
+
+
+def _parse_mp4_stsd(track: _Mp4Track, data: bytes):
+    """Decode the first sample entry: codec plus picture or sound format"""
+    if len(data) < 16:
+        return
+    entry = data[8:]
+    fourcc = entry[4:8]
+    track.codec = fourcc
+    if track.handler == b'vide' and len(entry) >= 36:
+        track.width, track.height = struct.unpack('>HH', entry[32:36])
+    elif track.handler == b'soun' and len(entry) >= 36:
+        version = struct.unpack('>H', entry[16:18])[0]
+        if version < 2:
+            track.channels, track.sample_size = struct.unpack('>HH', entry[24:28])
+            track.sample_rate = struct.unpack('>I', entry[32:36])[0] >> 16
+
+
+def _parse_mp4(f: BinaryIO, file_size: int) -> Dict[str, Any]:
+    """Parse ISO-BMFF / QuickTime: ftyp, moov/mvhd, tracks and udta"""
+    brand = None
+    compatible = []
+    moov = None
+    for box_type, payload, length in _iter_boxes(f, 0, file_size):
+        if box_type == b'ftyp':
+            data = _read_payload(f, payload, length, 256)
+            brand = data[:4]
+            compatible = [data[i:i + 4] for i in range(8, len(data) - 3, 4)]
+        elif box_type == b'moov':
+            moov = (payload, length)
+            break
+    if moov is None:
+        raise ContainerParseError("No moov box found")
+
+    metadata = {'general_track_type': 'General'}
+    if brand is not None:
+        metadata['general_format'] = 'QuickTime' if brand == b'qt  ' else 'MPEG-4'
+        brand_text = brand.decode('latin-1').strip()
+        brands = '/'.join(b.decode('latin-1').strip() for b in compatible if b.strip(b'\x00 '))
+        metadata['general_codec_id'] = f"{brand_text} ({brands})" if brands else brand_text
+    else:
+        metadata['general_format'] = 'QuickTime'
+    metadata['general_file_size'] = file_size
+
+    tracks = []
+    movie_duration_ms = None
+    for box_type, payload, length in _iter_boxes(f, moov[0], moov[0] + moov[1]):
+        if box_type == b'mvhd':
+            data = _read_payload(f, payload, length, 64)
+            if data and data[0] == 1 and len(data) >= 32:
+                created, modified, timescale, duration = struct.unpack('>QQIQ', data[4:32])
+            elif len(data) >= 20:
+                created, modified, timescale, duration = struct.unpack('>IIII', data[4:20])
+            else:
+                continue
+            if timescale:
+                movie_duration_ms = int(duration * 1000 / timescale)
+            encoded = _mp4_date(created)
+            if encoded:
+                metadata['general_encoded_date'] = encoded
+            tagged = _mp4_date(modified)
+            if tagged:
+                metadata['general_tagged_date'] = tagged
+        elif box_type == b'trak':
+            tracks.append(_parse_mp4_trak(f, payload, length))
+        elif box_type == b'udta':
+            _parse_mp4_udta(f, payload, length, metadata)
+
+    if movie_duration_ms is not None:
+        metadata['general_duration'] = movie_duration_ms
+        if movie_duration_ms:
+            metadata['general_overall_bit_rate'] = int(file_size * 8 * 1000 / movie_duration_ms)
+
+    video = next((t for t in tracks if t.handler == b'vide'), None)
+    audio = next((t for t in tracks if t.handler == b'soun'), None)
+    if video is not None:
+        metadata.update(_mp4_track_fields('video', video))
+    if audio is not None:
+        metadata.update(_mp4_track_fields('audio', audio))
+    return metadata
+
+
+def _mp4_track_fields(prefix: str, track: _Mp4Track) -> Dict[str, Any]:
+    """Render one MP4 track with MediaInfo-style key names"""
+    fields = {prefixed_key(prefix, 'track_type'): prefix.capitalize()}
+    if track.track_id is not None:
+        fields[prefixed_key(prefix, 'track_id')] = track.track_id
+    if track.codec:
+        fields[prefixed_key(prefix, 'format')] = _MP4_CODECS.get(track.codec,
+                                                                 track.codec.decode('latin-1'))
+        fields[prefixed_key(prefix, 'codec_id')] = track.codec.decode('latin-1')
+    duration_s = None
+    if track.timescale and track.duration is not None:
+        duration_s = track.duration / track.timescale
+        fields[prefixed_key(prefix, 'duration')] = int(duration_s * 1000)
+    encoded = _mp4_date(track.creation or 0)
+    if encoded:
+        fields[prefixed_key(prefix, 'encoded_date')] = encoded
+
+    if prefix == 'video':
+        if track.width:
+            fields['video_width'] = track.width
+            fields['video_height'] = track.height
+        if track.sample_count and duration_s:
+            fields['video_frame_rate'] = round(track.sample_count / duration_s, 3)
+            fields['video_frame_count'] = track.sample_count
+        if track.rotation:
+            fields['video_rotation'] = f'{track.rotation:.3f}'
+    else:
+        if track.channels:
+            fields['audio_channel_s'] = track.channels
+        rate = track.sample_rate or track.timescale
+        if rate:
+            fields['audio_sampling_rate'] = rate
+        if track.sample_size and fields.get('audio_format') == 'PCM':
+            fields['audio_bit_depth'] = track.sample_size
+    return fields
+
+
+def _parse_mp4_udta(f: BinaryIO, offset: int, size: int, metadata: Dict[str, Any]):
+    """QuickTime user data: recording date and ISO 6709 location"""
+    for box_type, payload, length in _iter_boxes(f, offset, offset + size):
+        if box_type not in (b'\xa9day', b'\xa9xyz') or length > 1024:
+            continue
+        data = _read_payload(f, payload, length)
+        # Classic QuickTime text atom: 2-byte length, 2-byte language, text
+        if len(data) >= 4:
+            text_len = struct.unpack('>H', data[:2])[0]
+            text = data[4:4 + text_len].decode('utf-8', 'replace')
+            key = 'general_recorded_date' if box_type == b'\xa9day' else 'general_xyz'
+            metadata[key] = text
+
+
+def _iter_riff_chunks(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (id, payload offset, payload size) for RIFF chunks in [start, end)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        chunk_id, size = struct.unpack('<4sI', header)
+        yield chunk_id, pos + 8, size
+        pos += 8 + size + (size & 1)
+
+
+def _parse_wave(f: BinaryIO, file_size: int) -> Dict[str, Any]:
+    """Parse RIFF/WAVE: fmt, data size, LIST/INFO and bext chunks"""
+    metadata = {'general_track_type': 'General', 'general_format': 'Wave',
+                'general_file_size': file_size}
+    fmt = None
+    data_size = None
+    for chunk_id, payload, size in _iter_riff_chunks(f, 12, file_size):
+        if chunk_id == b'fmt ':
+            fmt = _read_payload(f, payload, size, 40)
+        elif chunk_id == b'data':
+            data_size = min(size, file_size - payload)
+        elif chunk_id == b'LIST' and size <= MAX_READ:
+            data = _read_payload(f, payload, size)
+            if data[:4] == b'INFO':
+                pos = 4
+                while pos + 8 <= len(data):
+                    sub_id, sub_size = struct.unpack('<4sI', data[pos:pos + 8])
+                    key = _RIFF_INFO_KEYS.get(sub_id)
+                    if key:
+                        value = data[pos + 8:pos + 8 + sub_size].split(b'\x00', 1)[0]
+                        metadata[key] = value.decode('latin-1').strip()
+                    pos += 8 + sub_size + (sub_size & 1)
+        elif chunk_id == b'bext' and size >= 338:
+            data = _read_payload(f, payload, 338)
+            date = data[320:330].decode('latin-1').strip('\x00 ')
+            time_ = data[330:338].decode('latin-1').strip('\x00 ')
+            if date:
+                metadata['general_encoded_date'] = f"{date} {time_}".strip()
+
+    if fmt is None or len(fmt) < 16:
+        raise ContainerParseError("WAVE file without fmt chunk")
+
+    format_tag, channels, rate, byte_rate, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == 0xFFFE and len(fmt) >= 26:
+        format_tag = struct.unpack('<H', fmt[24:26])[0]  # WAVE_FORMAT_EXTENSIBLE subformat
+
+    metadata.update({
+        'audio_track_type': 'Audio',
+        'audio_format': _WAVE_FORMATS.get(format_tag, f'0x{format_tag:04X}'),
+        'audio_codec_id': str(format_tag),
+        'audio_channel_s': channels,
+        'audio_sampling_rate': rate,
+        'audio_bit_rate': byte_rate * 8,
+    })
+    if bits:
+        metadata['audio_bit_depth'] = bits
+    if data_size is not None and byte_rate:
+        duration_ms = int(data_size * 1000 / byte_rate)
+        metadata['general_duration'] = duration_ms
+        metadata['audio_duration'] = duration_ms
+        if duration_ms:
+            metadata['general_overall_bit_rate'] = int(file_size * 8 * 1000 / duration_ms)
+    return metadata
+
+
+def _parse_flac(f: BinaryIO, file_size: int, start: int) -> Dict[str, Any]:
+    """Parse FLAC STREAMINFO and VORBIS_COMMENT metadata blocks"""
+    metadata = {'general_track_type': 'General', 'general_format': 'FLAC',
+                'general_file_size': file_size}
+    pos = start + 4
+    streaminfo = None
+    while pos + 4 <= file_size:
+        f.seek(pos)
+        header = f.read(4)
+        if len(header) < 4:
+            break
+        last = header[0] & 0x80
+        block_type = header[0] & 0x7F
+        length = int.from_bytes(header[1:4], 'big')
+        if block_type == 0:
+            streaminfo = f.read(min(length, 34))
+        elif block_type == 4 and length <= MAX_READ:
+            _parse_vorbis_comment(f.read(length), metadata)
+        pos += 4 + length
+        if last:
+            break
+
+    if streaminfo is None or len(streaminfo) < 18:
+        raise ContainerParseError("FLAC file without STREAMINFO")
+
+    packed = int.from_bytes(streaminfo[10:18], 'big')
+    rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    bits = ((packed >> 36) & 0x1F) + 1
+    total_samples = packed & 0xFFFFFFFFF
+
+    metadata.update({
+        'audio_track_type': 'Audio',
+        'audio_format': 'FLAC',
+        'audio_codec_id': 'fLaC',
+        'audio_channel_s': channels,
+        'audio_sampling_rate': rate,
+        'audio_bit_depth': bits,
+    })
+    if rate and total_samples:
+        duration_ms = int(total_samples * 1000 / rate)
+        metadata['general_duration'] = duration_ms
+        metadata['audio_duration'] = duration_ms
+        if duration_ms:
+            metadata['general_overall_bit_rate'] = int(file_size * 8 * 1000 / duration_ms)
+    return metadata
+
+
+def _parse_vorbis_comment(data: bytes, metadata: Dict[str, Any]):
+    """Copy well-known Vorbis comment fields (little-endian length-prefixed)"""
+    try:
+        vendor_len = struct.unpack('<I', data[:4])[0]
+        pos = 4 + vendor_len
+        count = struct.unpack('<I', data[pos:pos + 4])[0]
+        pos += 4
+        for _ in range(min(count, 1024)):
+            length = struct.unpack('<I', data[pos:pos + 4])[0]
+            comment = data[pos + 4:pos + 4 + length].decode('utf-8', 'replace')
+            pos += 4 + length
+            name, _, value = comment.partition('=')
+            key = _VORBIS_KEYS.get(name.upper())
+            if key and key not in metadata:
+                metadata[key] = value
+    except struct.error:
+        pass
+
+
+def _id3v2_size(header: bytes) -> int:
+    """Total size of a leading ID3v2 tag (header + syncsafe body + footer)"""
+    if header[:3] != b'ID3' or len(header) < 10:
+        return 0
+    body = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + body + footer
+
+
+def parse_container(filepath: str, header: Optional[bytes] = None,
+                    size: Optional[int] = None) -> Dict[str, Any]:
+    """Extract media metadata from MP4/MOV, WAV or FLAC headers
+
+    With a prefetched `header` (and the file `size`), boxes and chunks that
+    lie inside it are parsed without opening the file again. Raises
+    ContainerParseError for other formats or corrupt headers.
+    """
+    source = open(filepath, 'rb') if header is None else PrefetchedFile(filepath, header, size)
+    with source as f:
+        file_size = os.fstat(f.fileno()).st_size if header is None else f.size
+        if header is None or (len(header) < HEADER_SIZE and len(header) < file_size):
+            header = f.read(HEADER_SIZE)
+        try:
+            if header[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip'):
+                return _parse_mp4(f, file_size)
+            if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+                return _parse_wave(f, file_size)
+            flac_start = _id3v2_size(header)
+            if flac_start:
+                f.seek(flac_start)
+                if f.read(4) == b'fLaC':
+                    return _parse_flac(f, file_size, flac_start)
+            elif header[:4] == b'fLaC':
+                return _parse_flac(f, file_size, 0)
+        except (struct.error, IndexError) as e:
+            raise ContainerParseError(f"Corrupt container header: {str(e)}")
+    raise ContainerParseError("Not an MP4/MOV, WAV or FLAC file")
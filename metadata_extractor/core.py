@@ -0,0 +1,375 @@
+"""Core metadata extraction and export, usable without any GUI dependency"""
+
+import io
+import os
+from typing import TYPE_CHECKING, Dict, Any, Iterable, Optional, Sequence
+from pathlib import Path
+
+from .backends import is_installed, load_mediainfo, load_pillow
+from .containers import HEADER_SIZE as CONTAINER_HEADER_SIZE
+from .containers import ContainerParseError, parse_container
+from .exif import HEADER_SIZE as EXIF_HEADER_SIZE
+from .exif import GPS_IFD_POINTER, NATIVE_EXIF_EXTENSIONS, ExifParseError, gps_fields
+from .exif import parse_image_header
+from .hashing import FileHasher, DEFAULT_ALGORITHMS
+from .metrics import METRICS
+from .perceptual import perceptual_fields
+from .plugins import REGISTRY
+from .projection import FULL_PROJECTION, Projection
+from .record import FileRecord, prefixed_key
+from .signatures import SIGNATURE_EXTENSIONS, sniff
+
+if TYPE_CHECKING:
+    # hashsets pulls in the sort/spill machinery; batch workers import core
+    from .hashsets import KnownFiles
+
+# Optional backends are imported on first use (see backends.py); these
+# only say whether they are installed
+PIL_AVAILABLE = is_installed('PIL')
+MEDIAINFO_AVAILABLE = is_installed('pymediainfo')
+
+# Supported file extensions
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.tiff', '.tif', '.png', '.bmp', '.gif', '.webp'}
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.m4v', '.webm'}
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a'}
+DOCUMENT_EXTENSIONS = {'.pdf', '.doc', '.docx', '.txt', '.rtf'}
+
+# Bytes kept from the hashing pass: enough for type sniffing and the header parsers
+PARSE_HEADER_SIZE = max(EXIF_HEADER_SIZE, CONTAINER_HEADER_SIZE)
+
+# Signature formats the native EXIF parser handles
+NATIVE_EXIF_FORMATS = {'jpeg', 'tiff'}
+
+class MetadataExtractor:
+    """Enhanced metadata extraction with error handling and performance optimization"""
+    
+    @staticmethod
+    def calculate_file_hash(filepath: str, algorithm: str = 'md5') -> str:
+        """Calculate file hash for integrity verification"""
+        digests = MetadataExtractor.calculate_file_hashes(filepath, (algorithm,))
+        return next(iter(digests.values()))
+    
+    @staticmethod
+    def calculate_file_hashes(filepath: str, algorithms: Sequence[str] = DEFAULT_ALGORITHMS) -> Dict[str, str]:
+        """Calculate several file hashes in a single read pass"""
+        try:
+            return FileHasher(algorithms).hash_file(filepath)
+        except Exception as e:
+            return {name: f"Error: {str(e)}" for name in algorithms}
+    
+    @staticmethod
+    def get_file_type_category(filepath: str) -> str:
+        """Determine file category based on extension"""
+        ext = Path(filepath).suffix.lower()
+        if ext in IMAGE_EXTENSIONS:
+            return 'image'
+        elif ext in VIDEO_EXTENSIONS:
+            return 'video'
+        elif ext in AUDIO_EXTENSIONS:
+            return 'audio'
+        elif ext in DOCUMENT_EXTENSIONS:
+            return 'document'
+        else:
+            return 'other'
+    
+    @staticmethod
+    def detect_file_type(metadata: Dict[str, Any], header: Optional[bytes]) -> str:
+        """Sniff the header and record detected vs claimed type
+        
+        `file_type` follows the content when the extension disagrees with
+        it or is unknown. Returns the extension extractors should be
+        chosen by (the detected format's own one for renamed files).
+        """
+        claimed = metadata['file_type']
+        ext = metadata['extension']
+        signature = sniff(header) if header else None
+        
+        metadata['claimed_type'] = claimed
+        metadata['detected_type'] = signature.file_type if signature else ''
+        metadata['detected_format'] = signature.format if signature else ''
+        if signature is None:
+            # Content matches nothing although the extension promises a known format
+            metadata['type_mismatch'] = bool(header) and ext in SIGNATURE_EXTENSIONS
+            return ext
+        metadata['type_mismatch'] = ext not in signature.extensions
+        if metadata['type_mismatch'] or claimed == 'other':
+            metadata['file_type'] = signature.file_type
+            return signature.extension
+        return ext
+    
+    @staticmethod
+    def extract_stat_metadata(filepath: str, stat: Optional[os.stat_result] = None) -> FileRecord:
+        """Extract path and os.stat fields (no file content is read)
+        
+        The record keeps raw stat values; timestamps, size_mb and
+        permissions are formatted when a sink reads them.
+        """
+        if stat is None:
+            timer = METRICS.start()
+            stat = os.stat(filepath)
+            METRICS.stop(timer, 'stat', filepath)
+        path_obj = Path(filepath)
+        
+        return FileRecord(str(path_obj.absolute()), str(path_obj.parent), path_obj.suffix.lower(),
+                          MetadataExtractor.get_file_type_category(filepath), stat)
+    
+    @staticmethod
+    def extract_basic_metadata(filepath: str,
+                               hash_algorithms: Sequence[str] = DEFAULT_ALGORITHMS) -> Dict[str, Any]:
+        """Extract basic file system metadata"""
+        return MetadataExtractor._extract_basic(filepath, hash_algorithms)[0]
+    
+    @staticmethod
+    def _extract_basic(filepath: str, hash_algorithms: Sequence[str],
+                       projection: Projection = FULL_PROJECTION):
+        """Basic metadata plus the file header kept from the hashing pass
+        
+        Returns (metadata, header, dispatch extension); the header is None
+        if the file could not be read or the projection needs no content.
+        """
+        try:
+            metadata = MetadataExtractor.extract_stat_metadata(filepath)
+            
+            header = None
+            if projection.hashes:
+                hasher = FileHasher(hash_algorithms)
+                try:
+                    digests, header = hasher.hash_file_header(filepath, PARSE_HEADER_SIZE, binary=True)
+                except Exception as e:
+                    digests = {name: f"Error: {str(e)}" for name in hasher.algorithms}
+                metadata.set_digests(hasher.algorithms, tuple(digests.values()))
+            elif projection.detect_type:
+                # No hashes wanted: the header is all that is read
+                header = read_header(filepath)
+            metadata.mark_extracted()
+            if not projection.detect_type:
+                return metadata, None, metadata['extension']
+            ext = MetadataExtractor.detect_file_type(metadata, header)
+            return metadata, header, ext
+        except Exception as e:
+            return {'error': f"Failed to extract basic metadata: {str(e)}"}, None, ''
+    
+    @staticmethod
+    def extract_image_metadata(filepath: str, header: Optional[bytes] = None,
+                               size: Optional[int] = None) -> Dict[str, Any]:
+        """Extract EXIF data from images"""
+        # JPEG/TIFF: header-only native parser; Pillow remains the fallback
+        if header is not None:
+            signature = sniff(header)
+            native = signature is not None and signature.format in NATIVE_EXIF_FORMATS
+        else:
+            native = Path(filepath).suffix.lower() in NATIVE_EXIF_EXTENSIONS
+        if native:
+            timer = METRICS.start()
+            try:
+                return parse_image_header(filepath, header, size)
+            except (ExifParseError, OSError):
+                pass
+            finally:
+                METRICS.stop(timer, 'image_native', filepath)
+        
+        pillow = load_pillow()
+        if pillow is None:
+            return {'error': 'PIL/Pillow not available'}
+        Image, TAGS = pillow
+        
+        metadata = {}
+        timer = METRICS.start()
+        try:
+            # A header holding the whole file (e.g. an archive member) is read from memory
+            source = io.BytesIO(header) if _is_complete(header, size) else filepath
+            with Image.open(source) as img:
+                # Basic image info
+                metadata.update({
+                    'image_width': img.width,
+                    'image_height': img.height,
+                    'image_mode': img.mode,
+                    'image_format': img.format,
+                    'has_transparency': img.mode in ('RGBA', 'LA') or 'transparency' in img.info
+                })
+                
+                # EXIF data
+                exif_data = img._getexif()
+                if exif_data:
+                    for tag_id, value in exif_data.items():
+                        if tag_id == GPS_IFD_POINTER and isinstance(value, dict):
+                            # Flat exif_GPS* fields, as the native parser writes them
+                            metadata.update(gps_fields(value))
+                            continue
+                        # Convert complex objects to strings
+                        if isinstance(value, (bytes, tuple)):
+                            value = str(value)
+                        tag = TAGS.get(tag_id) or f"Unknown_{tag_id}"
+                        metadata[prefixed_key('exif', tag)] = value
+                else:
+                    metadata['exif_status'] = 'No EXIF data found'
+                    
+        except Exception as e:
+            metadata['image_error'] = str(e)
+        METRICS.stop(timer, 'image_pillow', filepath)
+        
+        return metadata
+    
+    @staticmethod
+    def extract_media_metadata(filepath: str, deep: bool = False, header: Optional[bytes] = None,
+                               size: Optional[int] = None) -> Dict[str, Any]:
+        """Extract metadata from video/audio files
+        
+        MP4/MOV, WAV and FLAC headers are parsed natively; pymediainfo is
+        used for other containers, or for everything when `deep` is set.
+        """
+        MediaInfo = load_mediainfo() if deep else None
+        if MediaInfo is None:
+            timer = METRICS.start()
+            try:
+                return parse_container(filepath, header, size)
+            except (ContainerParseError, OSError) as e:
+                native_error = str(e)
+            finally:
+                METRICS.stop(timer, 'media_native', filepath)
+            # Native parser could not handle it: fall back to MediaInfo
+            MediaInfo = load_mediainfo()
+        
+        if MediaInfo is None:
+            # Keep the basic record: mediainfo is optional, not a hard failure
+            return {'media_error': f'pymediainfo not available ({native_error})'}
+        
+        metadata = {}
+        timer = METRICS.start()
+        try:
+            source = io.BytesIO(header) if _is_complete(header, size) else filepath
+            media_info = MediaInfo.parse(source)
+            
+            for track in media_info.tracks:
+                track_type = track.track_type.lower()
+                track_data = track.to_data()
+                
+                # Add track-specific prefix
+                for attr, val in track_data.items():
+                    if val is not None and val != '':
+                        metadata[prefixed_key(track_type, attr)] = val
+                        
+        except Exception as e:
+            metadata['media_error'] = str(e)
+        METRICS.stop(timer, 'mediainfo', filepath)
+        
+        return metadata
+    
+    @staticmethod
+    def extract_all_metadata(filepath: str,
+                             hash_algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+                             deep_media: bool = False,
+                             projection: Projection = FULL_PROJECTION,
+                             known_files: Optional['KnownFiles'] = None) -> Dict[str, Any]:
+        """Extract comprehensive metadata from a file
+        
+        `projection` (see plan_projection) limits the work to the fields
+        the caller needs, e.g. stat fields only for a timestamp triage.
+        Files found in a known-good set of `known_files` (KnownFiles) are
+        tagged and skip the type extractors.
+        """
+        if not os.path.isfile(filepath):
+            return {'error': f'File not found: {filepath}'}
+        
+        # Start with basic metadata; the header read while hashing feeds the parsers
+        metadata, header, ext = MetadataExtractor._extract_basic(filepath, hash_algorithms,
+                                                                 projection)
+        
+        if 'error' in metadata:
+            return metadata
+        if known_files is not None and known_files.tag(metadata) == 'good':
+            return metadata
+        if not projection.runs_plugins:
+            return metadata
+        
+        metadata.update(MetadataExtractor.extract_type_metadata(
+            filepath, metadata['file_type'], ext, deep_media, header, metadata['size_bytes'],
+            projection.plugins))
+        return metadata
+    
+    @staticmethod
+    def extract_type_metadata(filepath: str, file_type: str, ext: str, deep_media: bool = False,
+                              header: Optional[bytes] = None, size: Optional[int] = None,
+                              plugins: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run the registered extractor plugins for this type; `header` is reused if already read
+        
+        `plugins` (Projection.plugins) limits which plugins run and which
+        of their fields are kept.
+        """
+        return REGISTRY.extract(filepath, file_type, ext, only=plugins, header=header, size=size,
+                                deep_media=deep_media)
+
+class CSVManager:
+    """Enhanced CSV management with better error handling"""
+    
+    @staticmethod
+    def write_metadata_row(metadata: Dict[str, Any], csv_file_path: str) -> bool:
+        """Write metadata to CSV file with improved error handling
+        
+        Convenience wrapper for a single row; use CSVWriterPool for batches.
+        """
+        from .sinks import CSVWriterPool  # imported on demand to keep core imports light
+        try:
+            pool = CSVWriterPool()
+            pool.write(csv_file_path, metadata)
+            return pool.close()
+        except Exception as e:
+            print(f"Error writing to CSV: {str(e)}")
+            return False
+    
+    @staticmethod
+    def export_to_json(metadata_list: Iterable[Dict], json_file_path: str) -> bool:
+        """Export metadata to JSON format
+        
+        Records are streamed one at a time; the file name picks the layout
+        ('.json' array or '.jsonl' lines, optional '.gz'/'.zst').
+        """
+        from .sinks import JSONLinesSink
+        try:
+            with JSONLinesSink(json_file_path) as sink:
+                sink.write_many(metadata_list)
+            return True
+        except Exception as e:
+            print(f"Error writing to JSON: {str(e)}")
+            return False
+
+
+def read_header(filepath: str) -> Optional[bytes]:
+    """First PARSE_HEADER_SIZE bytes of a file, or None if it cannot be read"""
+    timer = METRICS.start()
+    try:
+        with open(filepath, 'rb') as f:
+            header = f.read(PARSE_HEADER_SIZE)
+    except OSError:
+        return None
+    METRICS.stop(timer, 'read_header', filepath, len(header))
+    return header
+
+
+def _is_complete(header: Optional[bytes], size: Optional[int]) -> bool:
+    """True if `header` is the entire file content"""
+    return header is not None and size is not None and len(header) >= size
+
+
+def _image_plugin(filepath: str, header: Optional[bytes] = None, size: Optional[int] = None,
+                  deep_media: bool = False) -> Dict[str, Any]:
+    """Built-in image extractor: native JPEG/TIFF parser, Pillow for the rest"""
+    return MetadataExtractor.extract_image_metadata(filepath, header, size)
+
+
+def _media_plugin(filepath: str, header: Optional[bytes] = None, size: Optional[int] = None,
+                  deep_media: bool = False) -> Dict[str, Any]:
+    """Built-in audio/video extractor: native MP4/WAV/FLAC parser, MediaInfo for the rest"""
+    return MetadataExtractor.extract_media_metadata(filepath, deep_media, header, size)
+
+
+def _perceptual_plugin(filepath: str, header: Optional[bytes] = None, size: Optional[int] = None,
+                       deep_media: bool = False) -> Dict[str, Any]:
+    """Opt-in image extractor: aHash/dHash/pHash for near-duplicate search (needs Pillow)"""
+    source = io.BytesIO(header) if _is_complete(header, size) else None
+    return perceptual_fields(filepath, source)
+
+
+REGISTRY.register('image', ('image',), _image_plugin, IMAGE_EXTENSIONS)
+REGISTRY.register('media', ('video', 'audio'), _media_plugin, VIDEO_EXTENSIONS | AUDIO_EXTENSIONS)
+REGISTRY.register('perceptual', ('image',), _perceptual_plugin, IMAGE_EXTENSIONS, default=False)
@@ -0,0 +1,384 @@
+"""Deterministic synthetic evidence corpus for benchmarks
+
+Every file is built from a seeded random generator with fixed timestamps,
+so the same seed and scale always produce byte-identical trees. Nothing is
+downloaded and no third-party encoder is needed: JPEG/TIFF/WAV/FLAC/MP4
+files carry just enough structure for the header parsers (and Pillow or
+MediaInfo) to read their metadata.
+"""
+
+import json
+import math
+import os
+import random
+import struct
+import time
+from typing import Dict, Any, List, Tuple
+
+MANIFEST_NAME = 'corpus_manifest.json'
+
+# Files per kind at scale 1.0
+DEFAULT_COUNTS = {
+    'jpeg_exif': 200,
+    'jpeg_plain': 20,
+    'tiff': 40,
+    'wav': 40,
+    'flac': 40,
+    'mp4': 40,
+    'document': 40,
+    'sparse': 2,
+}
+
+DEFAULT_SPARSE_MB = 256
+
+# 2024-01-01 00:00:00 UTC; file N gets BASE_TIME + N minutes
+BASE_TIME = 1704067200
+
+# Seconds between 1904-01-01 (QuickTime epoch) and 1970-01-01
+_MAC_EPOCH_OFFSET = 2082844800
+
+_CAMERAS = [
+    ('Canon', 'Canon EOS 5D Mark IV'),
+    ('NIKON CORPORATION', 'NIKON D750'),
+    ('SONY', 'ILCE-7M3'),
+    ('FUJIFILM', 'X-T4'),
+    ('Apple', 'iPhone 13 Pro'),
+    ('samsung', 'SM-G991B'),
+]
+
+# TIFF field types
+_BYTE, _ASCII, _SHORT, _LONG, _RATIONAL, _UNDEFINED = 1, 2, 3, 4, 5, 7
+
+
+def _random_bytes(rng: random.Random, size: int) -> bytes:
+    """Seeded filler bytes (random.randbytes needs Python 3.9)"""
+    if size <= 0:
+        return b''
+    return rng.getrandbits(size * 8).to_bytes(size, 'little')
+
+
+# TIFF / EXIF -------------------------------------------------------------
+
+def _entry(order: str, tag: int, typ: int, values) -> Tuple[int, int, int, bytes]:
+    """One IFD entry as (tag, type, count, payload)"""
+    if typ == _ASCII:
+        payload = values.encode('ascii') + b'\0'
+        return tag, typ, len(payload), payload
+    if typ in (_BYTE, _UNDEFINED):
+        return tag, typ, len(values), bytes(values)
+    if typ == _RATIONAL:
+        flat = [n for pair in values for n in pair]
+        return tag, typ, len(values), struct.pack(f'{order}{len(flat)}I', *flat)
+    fmt = 'H' if typ == _SHORT else 'I'
+    return tag, typ, len(values), struct.pack(f'{order}{len(values)}{fmt}', *values)
+
+
+def _ifd(entries: List[Tuple[int, int, int, bytes]], order: str, start: int) -> bytes:
+    """Serialize an IFD located at offset `start`, with its out-of-line values"""
+    entries = sorted(entries)
+    data_offset = start + 2 + 12 * len(entries) + 4
+    out = [struct.pack(order + 'H', len(entries))]
+    data = bytearray()
+    for tag, typ, count, payload in entries:
+        if len(payload) <= 4:
+            out.append(struct.pack(order + 'HHI', tag, typ, count) + payload.ljust(4, b'\0'))
+        else:
+            out.append(struct.pack(order + 'HHII', tag, typ, count, data_offset + len(data)))
+            data += payload
+            if len(data) % 2:
+                data += b'\0'
+    out.append(struct.pack(order + 'I', 0))
+    return b''.join(out) + bytes(data)
+
+
+def _dms(degrees: float) -> List[Tuple[int, int]]:
+    """Decimal degrees -> EXIF degrees/minutes/seconds rationals"""
+    minutes, seconds = divmod(degrees * 3600, 60)
+    whole, minutes = divmod(minutes, 60)
+    return [(int(whole), 1), (int(minutes), 1), (int(seconds * 100), 100)]
+
+
+def _exif_timestamp(index: int) -> str:
+    """EXIF 'YYYY:MM:DD HH:MM:SS' for file number `index`"""
+    return time.strftime('%Y:%m:%d %H:%M:%S', time.gmtime(BASE_TIME + index * 60))
+
+
+def build_exif_tiff(rng: random.Random, index: int, width: int, height: int,
+                    order: str = '<') -> bytes:
+    """TIFF structure with IFD0, an Exif IFD and a GPS IFD (the APP1 payload)"""
+    make, model = rng.choice(_CAMERAS)
+    orientation = rng.choice((1, 1, 1, 6, 8, 3))
+    taken = _exif_timestamp(index)
+
+    def ifd0(exif_offset, gps_offset):
+        return _ifd([
+            _entry(order, 0x010F, _ASCII, make),
+            _entry(order, 0x0110, _ASCII, model),
+            _entry(order, 0x0112, _SHORT, [orientation]),
+            _entry(order, 0x0132, _ASCII, taken),
+            _entry(order, 0x8769, _LONG, [exif_offset]),
+            _entry(order, 0x8825, _LONG, [gps_offset]),
+        ], order, 8)
+
+    exif_offset = 8 + len(ifd0(0, 0))
+    exif = _ifd([
+        _entry(order, 0x829A, _RATIONAL, [(1, rng.choice((30, 60, 125, 250, 1000)))]),
+        _entry(order, 0x829D, _RATIONAL, [(rng.choice((14, 18, 28, 40, 56, 80)), 10)]),
+        _entry(order, 0x8827, _SHORT, [rng.choice((100, 200, 400, 800, 1600, 3200))]),
+        _entry(order, 0x9003, _ASCII, taken),
+        _entry(order, 0x9004, _ASCII, taken),
+        _entry(order, 0x920A, _RATIONAL, [(rng.randint(18, 200), 1)]),
+        _entry(order, 0xA002, _LONG, [width]),
+        _entry(order, 0xA003, _LONG, [height]),
+    ], order, exif_offset)
+
+    gps_offset = exif_offset + len(exif)
+    lat = rng.uniform(-80.0, 80.0)
+    lon = rng.uniform(-179.0, 179.0)
+    gps = _ifd([
+        _entry(order, 0x0000, _BYTE, [2, 3, 0, 0]),
+        _entry(order, 0x0001, _ASCII, 'N' if lat >= 0 else 'S'),
+        _entry(order, 0x0002, _RATIONAL, _dms(abs(lat))),
+        _entry(order, 0x0003, _ASCII, 'E' if lon >= 0 else 'W'),
+        _entry(order, 0x0004, _RATIONAL, _dms(abs(lon))),
+    ], order, gps_offset)
+
+    magic = b'II*\0' if order == '<' else b'MM\0*'
+    return magic + struct.pack(order + 'I', 8) + ifd0(exif_offset, gps_offset) + exif + gps
+
+
+def _segment(marker: int, payload: bytes) -> bytes:
+    """JPEG marker segment (length includes the two length bytes)"""
+    return struct.pack('>BBH', 0xFF, marker, len(payload) + 2) + payload
+
+
+def build_jpeg(rng: random.Random, index: int, with_exif: bool = True) -> bytes:
+    """Baseline JPEG skeleton: JFIF, optional Exif APP1, SOF0, SOS, filler scan"""
+    width, height = rng.choice(((640, 480), (1920, 1080), (4032, 3024), (6000, 4000)))
+    parts = [b'\xff\xd8', _segment(0xE0, b'JFIF\0\x01\x01\0\0\x01\0\x01\0\0')]
+    if with_exif:
+        order = rng.choice(('<', '>'))
+        parts.append(_segment(0xE1, b'Exif\0\0' + build_exif_tiff(rng, index, width, height, order)))
+    parts.append(_segment(0xC0, struct.pack('>BHHB', 8, height, width, 3) +
+                          b'\x01\x22\x00\x02\x11\x01\x03\x11\x01'))
+    parts.append(_segment(0xDA, b'\x03\x01\x00\x02\x11\x03\x11\x00\x3f\x00'))
+    # Entropy-coded data never contains a bare 0xFF
+    scan = _random_bytes(rng, rng.randint(20 * 1024, 400 * 1024)).replace(b'\xff', b'\x00')
+    parts.append(scan)
+    parts.append(b'\xff\xd9')
+    return b''.join(parts)
+
+
+def build_tiff(rng: random.Random, index: int) -> bytes:
+    """Uncompressed RGB TIFF with a single strip"""
+    order = rng.choice(('<', '>'))
+    width, height = rng.choice(((64, 64), (256, 192), (512, 384)))
+    make, model = rng.choice(_CAMERAS)
+    strip = width * height * 3
+    entries = [
+        _entry(order, 0x0100, _LONG, [width]),
+        _entry(order, 0x0101, _LONG, [height]),
+        _entry(order, 0x0102, _SHORT, [8, 8, 8]),
+        _entry(order, 0x0103, _SHORT, [1]),
+        _entry(order, 0x0106, _SHORT, [2]),
+        _entry(order, 0x010F, _ASCII, make),
+        _entry(order, 0x0110, _ASCII, model),
+        _entry(order, 0x0115, _SHORT, [3]),
+        _entry(order, 0x0116, _LONG, [height]),
+        _entry(order, 0x0117, _LONG, [strip]),
+        _entry(order, 0x0132, _ASCII, _exif_timestamp(index)),
+    ]
+    # Pixel data follows the IFD; its offset depends on the IFD size
+    ifd_size = len(_ifd(entries + [_entry(order, 0x0111, _LONG, [0])], order, 8))
+    entries.append(_entry(order, 0x0111, _LONG, [8 + ifd_size]))
+    magic = b'II*\0' if order == '<' else b'MM\0*'
+    return magic + struct.pack(order + 'I', 8) + _ifd(entries, order, 8) + _random_bytes(rng, strip)
+
+
+# Audio / video ------------------------------------------------------------
+
+def build_wav(rng: random.Random, index: int) -> bytes:
+    """PCM WAV with a LIST/INFO creation date and silent samples"""
+    rate = rng.choice((22050, 44100, 48000))
+    channels = rng.choice((1, 2))
+    bits = rng.choice((16, 24))
+    block = channels * bits // 8
+    data_size = rng.randint(1, 4) * rate * block
+    fmt = struct.pack('<HHIIHH', 1, channels, rate, rate * block, block, bits)
+    date = _exif_timestamp(index)[:10].replace(':', '-').encode() + b'\0'
+    info = b'INFO' + b'ICRD' + struct.pack('<I', len(date)) + date
+    if len(info) % 2:
+        info += b'\0'
+    body = (b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt +
+            b'LIST' + struct.pack('<I', len(info)) + info +
+            b'data' + struct.pack('<I', data_size) + bytes(data_size))
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def build_flac(rng: random.Random, index: int) -> bytes:
+    """FLAC STREAMINFO + VORBIS_COMMENT, followed by filler frames"""
+    rate = rng.choice((44100, 48000, 96000))
+    channels = rng.choice((1, 2))
+    bits = rng.choice((16, 24))
+    total = rng.randint(1, 30) * rate
+    packed = (rate << 44) | ((channels - 1) << 41) | ((bits - 1) << 36) | total
+    streaminfo = struct.pack('>HH', 4096, 4096) + bytes(6) + packed.to_bytes(8, 'big') + _random_bytes(rng, 16)
+    vendor = b'reference libFLAC 1.4.3'
+    comments = [f'DATE={_exif_timestamp(index)[:10].replace(":", "-")}'.encode(),
+                f'TITLE=Recording {index}'.encode()]
+    vorbis = struct.pack('<I', len(vendor)) + vendor + struct.pack('<I', len(comments))
+    for comment in comments:
+        vorbis += struct.pack('<I', len(comment)) + comment
+    frames = b'\xff\xf8' + _random_bytes(rng, rng.randint(16 * 1024, 256 * 1024))
+    return (b'fLaC' + b'\x00' + len(streaminfo).to_bytes(3, 'big') + streaminfo +
+            b'\x84' + len(vorbis).to_bytes(3, 'big') + vorbis + frames)
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I', 8 + len(payload)) + kind + payload
+
+
+def _full_box(kind: bytes, payload: bytes, version: int = 0) -> bytes:
+    return _box(kind, bytes((version, 0, 0, 0)) + payload)
+
+
+def build_mp4(rng: random.Random, index: int) -> bytes:
+    """Minimal MP4 with one H.264 video and one AAC audio track"""
+    width, height = rng.choice(((1280, 720), (1920, 1080), (3840, 2160)))
+    fps = rng.choice((24, 25, 30, 60))
+    seconds = rng.randint(2, 120)
+    rotation = rng.choice((0, 0, 90, 180, 270))
+    created = BASE_TIME + index * 60 + _MAC_EPOCH_OFFSET
+    scale = 1000
+
+    cos = int(round(math.cos(math.radians(rotation)))) * 0x10000
+    sin = int(round(math.sin(math.radians(rotation)))) * 0x10000
+    matrix = struct.pack('>9i', cos, sin, 0, -sin, cos, 0, 0, 0, 0x40000000)
+
+    def tkhd(track_id, w=0, h=0):
+        return _full_box(b'tkhd', struct.pack('>IIIII', created, created, track_id, 0, seconds * scale) +
+                         bytes(8) + struct.pack('>hhhh', 0, 0, 0, 0) + matrix +
+                         struct.pack('>II', w << 16, h << 16))
+
+    def mdhd(timescale):
+        return _full_box(b'mdhd', struct.pack('>IIII', created, created, timescale, seconds * timescale) +
+                         b'\x55\xc4\x00\x00')
+
+    def hdlr(kind, name):
+        return _full_box(b'hdlr', bytes(4) + kind + bytes(12) + name + b'\0')
+
+    avc1 = _box(b'avc1', bytes(6) + struct.pack('>H', 1) + bytes(16) +
+                struct.pack('>HH', width, height) + bytes(50))
+    video = _box(b'trak', tkhd(1, width, height) + _box(b'mdia', mdhd(scale) + hdlr(b'vide', b'VideoHandler') +
+                 _box(b'minf', _box(b'stbl', _full_box(b'stsd', struct.pack('>I', 1) + avc1) +
+                                    _full_box(b'stsz', struct.pack('>II', 0, seconds * fps))))))
+
+    mp4a = _box(b'mp4a', bytes(6) + struct.pack('>H', 1) + bytes(8) +
+                struct.pack('>HHHHI', 2, 16, 0, 0, 48000 << 16))
+    audio = _box(b'trak', tkhd(2) + _box(b'mdia', mdhd(48000) + hdlr(b'soun', b'SoundHandler') +
+                 _box(b'minf', _box(b'stbl', _full_box(b'stsd', struct.pack('>I', 1) + mp4a)))))
+
+    lat = rng.uniform(-80.0, 80.0)
+    lon = rng.uniform(-179.0, 179.0)
+    xyz = f'{lat:+08.4f}{lon:+09.4f}/'.encode()
+    udta = _box(b'udta', _box(b'\xa9xyz', struct.pack('>HH', len(xyz), 0x15C7) + xyz))
+
+    mvhd = _full_box(b'mvhd', struct.pack('>IIII', created, created, scale, seconds * scale) + bytes(80))
+    moov = _box(b'moov', mvhd + video + audio + udta)
+    ftyp = _box(b'ftyp', b'isom' + struct.pack('>I', 512) + b'isomiso2avc1mp41')
+    mdat = _box(b'mdat', _random_bytes(rng, rng.randint(64 * 1024, 1024 * 1024)))
+    # Camera files put moov last, streaming-optimised files put it first
+    return ftyp + (mdat + moov if rng.random() < 0.5 else moov + mdat)
+
+
+# Other files --------------------------------------------------------------
+
+_WORDS = ('evidence', 'report', 'device', 'image', 'timeline', 'hash', 'custody',
+          'acquisition', 'volume', 'partition', 'artifact', 'registry', 'log')
+
+
+def build_document(rng: random.Random, index: int) -> Tuple[str, bytes]:
+    """Plain text or PDF-looking document; returns (extension, content)"""
+    text = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(200, 4000))).encode()
+    if index % 2:
+        return '.pdf', b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n' + text + b'\n%%EOF\n'
+    return '.txt', text
+
+
+def _write_sparse(path: str, size: int, rng: random.Random):
+    """Large file with a small random head and a hole for the rest"""
+    with open(path, 'wb') as f:
+        f.write(_random_bytes(rng, min(size, 4096)))
+        if size > 4096:
+            f.truncate(size)
+
+
+# Corpus -----------------------------------------------------------------
+
+def generate_corpus(dest: str, seed: int = 0, scale: float = 1.0,
+                    sparse_mb: int = DEFAULT_SPARSE_MB) -> Dict[str, Any]:
+    """Write a reproducible corpus under `dest` and return its manifest
+
+    Files are spread over nested folders so directory walking is exercised
+    too. The manifest (also saved as corpus_manifest.json) records the
+    parameters and per-kind file counts and sizes.
+    """
+    rng = random.Random(seed)
+    counts = {kind: max(1, int(round(count * scale))) for kind, count in DEFAULT_COUNTS.items()}
+    by_kind = {}
+    index = 0
+
+    for kind, count in counts.items():
+        total_bytes = 0
+        for n in range(count):
+            folder = os.path.join(dest, f'case_{n % 4}', kind if n % 3 else os.path.join(kind, 'nested'))
+            os.makedirs(folder, exist_ok=True)
+            stem = os.path.join(folder, f'{kind}_{n:05d}')
+
+            if kind == 'sparse':
+                path = stem + '.bin'
+                size = sparse_mb * 1024 * 1024
+                _write_sparse(path, size, rng)
+            else:
+                if kind == 'jpeg_exif':
+                    path, data = stem + '.jpg', build_jpeg(rng, index)
+                elif kind == 'jpeg_plain':
+                    path, data = stem + '.jpeg', build_jpeg(rng, index, with_exif=False)
+                elif kind == 'tiff':
+                    path, data = stem + '.tif', build_tiff(rng, index)
+                elif kind == 'wav':
+                    path, data = stem + '.wav', build_wav(rng, index)
+                elif kind == 'flac':
+                    path, data = stem + '.flac', build_flac(rng, index)
+                elif kind == 'mp4':
+                    path, data = stem + rng.choice(('.mp4', '.mov')), build_mp4(rng, index)
+                else:
+                    ext, data = build_document(rng, index)
+                    path = stem + ext
+                with open(path, 'wb') as f:
+                    f.write(data)
+                size = len(data)
+
+            timestamp = BASE_TIME + index * 60
+            os.utime(path, (timestamp, timestamp))
+            total_bytes += size
+            index += 1
+        by_kind[kind] = {'files': count, 'bytes': total_bytes}
+
+    manifest = {
+        'seed': seed,
+        'scale': scale,
+        'sparse_mb': sparse_mb,
+        'files': sum(k['files'] for k in by_kind.values()),
+        'bytes': sum(k['bytes'] for k in by_kind.values()),
+        'by_kind': by_kind,
+    }
+    with open(os.path.join(dest, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_manifest(corpus_dir: str) -> Dict[str, Any]:
+    """Read the manifest of a generated corpus; raises OSError if absent"""
+    with open(os.path.join(corpus_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,277 @@
+"""Duplicate file detection with size bucketing and partial hashing
+
+Files can only be identical if their sizes match, so candidates are first
+grouped by st_size from a plain stat. Within a size bucket the first and
+last block of each file are hashed; only files whose partial digests
+collide are read in full. On typical shares most sizes are unique and
+most of the data is never read. The resulting groups are written as a
+CSV index (one row per file) that can be loaded again later.
+"""
+
+import csv
+import hashlib
+import os
+from collections import deque
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from .batch import iter_files
+from .hashing import FileHasher, normalize_algorithms
+from .metrics import METRICS
+
+# Bytes hashed from each end of a file in the partial pass
+PARTIAL_BLOCK_SIZE = 64 * 1024
+
+DEFAULT_INDEX_NAME = 'duplicate_groups.csv'
+
+
+class DuplicateGroup:
+    """Files with the same size and digest
+
+    `inodes` holds a 'dev:ino' identity per path when known; hard links to
+    one inode are listed but are a single copy on disk.
+    """
+
+    __slots__ = ('size', 'digest', 'paths', 'inodes')
+
+    def __init__(self, size: int, digest: str, paths: List[str],
+                 inodes: Optional[List[Optional[str]]] = None):
+        self.size = size
+        self.digest = digest
+        self.paths = paths
+        self.inodes = inodes
+
+    @property
+    def copies(self) -> int:
+        """Distinct copies on disk (paths whose inode is unknown count separately)"""
+        if self.inodes is None:
+            return len(self.paths)
+        return len({inode if inode is not None else (path,)
+                    for path, inode in zip(self.paths, self.inodes)})
+
+    @property
+    def wasted_bytes(self) -> int:
+        """Space taken by every copy but one"""
+        return self.size * (self.copies - 1)
+
+
+def _inode_id(identity: Tuple[int, int]) -> str:
+    return f'{identity[0]}:{identity[1]}'
+
+
+def group_digests(entries: Iterable[Tuple[int, str, str]],
+                  inodes: Optional[Dict[str, str]] = None) -> List[DuplicateGroup]:
+    """Group (size, digest, filepath) entries; largest waste first
+
+    Used on digests that are already known, e.g. from an extraction run,
+    so no file is read. Digests reporting an error are ignored. With
+    `inodes` (filepath -> 'dev:ino'), groups that are only hard links to
+    one file are left out.
+    """
+    groups = {}
+    for size, digest, filepath in entries:
+        if not digest or digest.startswith('Error:'):
+            continue
+        groups.setdefault((size, digest), []).append(filepath)
+    result = []
+    for (size, digest), paths in groups.items():
+        if len(paths) < 2:
+            continue
+        paths.sort()
+        group = DuplicateGroup(size, digest, paths,
+                               [inodes.get(p) for p in paths] if inodes is not None else None)
+        if group.copies > 1:
+            result.append(group)
+    result.sort(key=lambda g: (-g.wasted_bytes, g.digest))
+    return result
+
+
+def _bounded_map(pool, func: Callable, items: Iterable, window: int) -> Iterator:
+    """pool.map that keeps at most `window` tasks queued (pool.map submits all at once)"""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class DuplicateFinder:
+    """Find identical files, reading as little of them as possible
+
+    Call add() or add_paths() for every file, then find(). `stats`
+    counts files at each stage and the bytes actually read.
+    """
+
+    def __init__(self, algorithm: str = 'md5', block_size: int = PARTIAL_BLOCK_SIZE,
+                 min_size: int = 1, threads: int = 4):
+        self.algorithm = normalize_algorithms((algorithm,))[0]
+        self.block_size = max(1, block_size)
+        self.min_size = max(0, min_size)
+        self.threads = max(1, threads)
+        self._by_size = {}
+        self.stats = {
+            'files': 0,
+            'bytes': 0,
+            'candidates': 0,
+            'partial_hashed': 0,
+            'full_hashed': 0,
+            'bytes_read': 0,
+        }
+
+    def add(self, filepath: str, stat: Optional[os.stat_result] = None):
+        """Bucket one file by size (stat is taken if not given)"""
+        if stat is None:
+            timer = METRICS.start()
+            stat = os.stat(filepath)
+            METRICS.stop(timer, 'stat', filepath)
+        self.stats['files'] += 1
+        self.stats['bytes'] += stat.st_size
+        if stat.st_size < self.min_size:
+            return
+        self._by_size.setdefault(stat.st_size, []).append(
+            (os.path.abspath(filepath), (stat.st_dev, stat.st_ino)))
+
+    def add_paths(self, paths: Iterable[str], recursive: bool = True,
+                  on_error: Optional[Callable[[str, Exception], None]] = None,
+                  exclude_names: Iterable[str] = ()):
+        """Walk files and directories and bucket every file found"""
+        for filepath in iter_files(paths, recursive=recursive, on_error=on_error,
+                                   exclude_names=exclude_names):
+            try:
+                self.add(filepath)
+            except OSError as e:
+                if on_error is not None:
+                    on_error(filepath, e)
+
+    def _partial_digest(self, filepath: str, size: int) -> str:
+        """Digest of the first and last block (the whole file if that is smaller)"""
+        h = hashlib.new(self.algorithm)
+        timer = METRICS.start()
+        with open(filepath, 'rb', buffering=0) as f:
+            h.update(f.read(self.block_size))
+            if size > self.block_size:
+                f.seek(max(self.block_size, size - self.block_size))
+                h.update(f.read(self.block_size))
+        METRICS.stop(timer, 'dedup_partial', filepath, min(size, 2 * self.block_size))
+        return h.hexdigest()
+
+    def _digest_all(self, inodes: List[Tuple[int, List[str]]], digest: Callable[[str, int], str],
+                    mapper: Callable,
+                    on_error: Optional[Callable[[str, Exception], None]]) -> Iterator[Tuple[int, List[str], str]]:
+        """Yield (size, paths, digest) per inode; hard links are read once"""
+        def task(entry):
+            size, paths = entry
+            try:
+                return size, paths, digest(paths[0], size)
+            except OSError as e:
+                if on_error is not None:
+                    on_error(paths[0], e)
+                return size, paths, None
+
+        for size, paths, value in mapper(task, inodes):
+            if value is not None:
+                yield size, paths, value
+
+    def find(self, on_error: Optional[Callable[[str, Exception], None]] = None) -> List[DuplicateGroup]:
+        """Return groups of identical files, largest waste first"""
+        hasher = FileHasher((self.algorithm,))
+
+        def full_digest(filepath, size):
+            return hasher.hash_file(filepath)[self.algorithm]
+
+        # Size buckets with more than one inode, as (size, [paths sharing an inode]);
+        # a bucket of hard links to one file holds no duplicate
+        inodes = []
+        inode_of = {}
+        for size, files in self._by_size.items():
+            if len(files) < 2:
+                continue
+            by_inode = {}
+            for filepath, identity in files:
+                by_inode.setdefault(identity, []).append(filepath)
+            if len(by_inode) < 2:
+                continue
+            self.stats['candidates'] += len(files)
+            for identity, paths in by_inode.items():
+                inodes.append((size, paths))
+                inode_of.update((filepath, _inode_id(identity)) for filepath in paths)
+
+        pool = None
+        mapper = map
+        if self.threads > 1 and len(inodes) > 1:
+            # Imported lazily like FileHasher.hash_files
+            from concurrent.futures import ThreadPoolExecutor
+            pool = ThreadPoolExecutor(max_workers=self.threads)
+
+            def mapper(func, items):
+                return _bounded_map(pool, func, items, self.threads * 2)
+        try:
+            entries = []
+            partial = {}
+            for size, paths, digest in self._digest_all(inodes, self._partial_digest, mapper, on_error):
+                self.stats['partial_hashed'] += len(paths)
+                self.stats['bytes_read'] += min(size, 2 * self.block_size)
+                if size <= 2 * self.block_size:
+                    # The partial read already covered the whole file
+                    entries.extend((size, digest, filepath) for filepath in paths)
+                else:
+                    partial.setdefault((size, digest), []).append((size, paths))
+
+            # Only distinct inodes with the same partial digest need a full read
+            collided = [entry for group in partial.values() if len(group) > 1 for entry in group]
+            for size, paths, digest in self._digest_all(collided, full_digest, mapper, on_error):
+                self.stats['full_hashed'] += len(paths)
+                self.stats['bytes_read'] += size
+                entries.extend((size, digest, filepath) for filepath in paths)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return group_digests(entries, inode_of)
+
+
+def write_duplicate_index(groups: Iterable[DuplicateGroup], path: str,
+                          algorithm: str = 'md5') -> int:
+    """Write groups as CSV (one row per file); returns the number of groups"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['group_id', 'size_bytes', f'{algorithm}_hash', 'copies',
+                         'wasted_bytes', 'filepath', 'inode'])
+        for count, group in enumerate(groups, 1):
+            inodes = group.inodes or [None] * len(group.paths)
+            for filepath, inode in zip(group.paths, inodes):
+                writer.writerow([count, group.size, group.digest, group.copies,
+                                 group.wasted_bytes, filepath, inode or ''])
+    os.replace(tmp_path, path)
+    return count
+
+
+def load_duplicate_index(path: str) -> List[DuplicateGroup]:
+    """Read an index written by write_duplicate_index"""
+    groups = {}
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            group_id, size, digest, _, _, filepath = row[:6]
+            group = groups.get(group_id)
+            if group is None:
+                group = groups[group_id] = DuplicateGroup(int(size), digest, [], [])
+            group.paths.append(filepath)
+            # Indexes written before the inode column count every path as a copy
+            inode = row[6] if len(row) > 6 else ''
+            group.inodes.append(inode or None)
+    return list(groups.values())
+
+
+def summarize_groups(groups: List[DuplicateGroup]) -> Dict[str, Any]:
+    """Totals for a report line"""
+    return {
+        'groups': len(groups),
+        'duplicate_files': sum(g.copies - 1 for g in groups),
+        'wasted_bytes': sum(g.wasted_bytes for g in groups),
+    }
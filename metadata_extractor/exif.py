@@ -0,0 +1,480 @@
+"""Native header-only EXIF/TIFF parser for JPEG and TIFF files
+
+Only the bytes that hold metadata are read: for JPEG the marker chain up
+to the first SOF/SOS (skipping over non-EXIF segments by seeking), and for
+TIFF the IFD chain and the values it points to. Pillow is not needed.
+"""
+
+import numbers
+import struct
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from .prefetch import PrefetchedFile
+from .record import prefixed_key
+
+# Bytes read up front; covers APP0/APP1 and the SOF of almost every JPEG
+HEADER_SIZE = 64 * 1024
+
+# Values larger than this are summarised instead of read (thumbnails, XMP, ICC)
+MAX_VALUE_BYTES = 64 * 1024
+
+# Numeric arrays longer than this are summarised (strip/tile offsets)
+MAX_VALUE_COUNT = 256
+
+# Sanity bounds for corrupt or hostile files
+MAX_IFD_ENTRIES = 1024
+
+NATIVE_EXIF_EXTENSIONS = {'.jpg', '.jpeg', '.tif', '.tiff'}
+
+# Tag names follow PIL.ExifTags.TAGS so both backends produce the same keys
+TAGS = {
+    0x00FE: 'NewSubfileType', 0x00FF: 'SubfileType', 0x0100: 'ImageWidth',
+    0x0101: 'ImageLength', 0x0102: 'BitsPerSample', 0x0103: 'Compression',
+    0x0106: 'PhotometricInterpretation', 0x0107: 'Thresholding', 0x010A: 'FillOrder',
+    0x010D: 'DocumentName', 0x010E: 'ImageDescription', 0x010F: 'Make', 0x0110: 'Model',
+    0x0111: 'StripOffsets', 0x0112: 'Orientation', 0x0115: 'SamplesPerPixel',
+    0x0116: 'RowsPerStrip', 0x0117: 'StripByteCounts', 0x011A: 'XResolution',
+    0x011B: 'YResolution', 0x011C: 'PlanarConfiguration', 0x011D: 'PageName',
+    0x0128: 'ResolutionUnit', 0x012D: 'TransferFunction', 0x0131: 'Software',
+    0x0132: 'DateTime', 0x013B: 'Artist', 0x013C: 'HostComputer', 0x013D: 'Predictor',
+    0x013E: 'WhitePoint', 0x013F: 'PrimaryChromaticities', 0x0140: 'ColorMap',
+    0x0142: 'TileWidth', 0x0143: 'TileLength', 0x0144: 'TileOffsets',
+    0x0145: 'TileByteCounts', 0x014A: 'SubIFDs', 0x0152: 'ExtraSamples',
+    0x0153: 'SampleFormat', 0x0201: 'JpegIFOffset', 0x0202: 'JpegIFByteCount',
+    0x0211: 'YCbCrCoefficients', 0x0212: 'YCbCrSubSampling', 0x0213: 'YCbCrPositioning',
+    0x0214: 'ReferenceBlackWhite', 0x02BC: 'XMLPacket', 0x4746: 'Rating',
+    0x4749: 'RatingPercent', 0x8298: 'Copyright', 0x829A: 'ExposureTime',
+    0x829D: 'FNumber', 0x83BB: 'IptcNAA', 0x8649: 'ImageResources', 0x8769: 'ExifOffset',
+    0x8773: 'InterColorProfile', 0x8822: 'ExposureProgram', 0x8824: 'SpectralSensitivity',
+    0x8825: 'GPSInfo', 0x8827: 'ISOSpeedRatings', 0x8828: 'OECF',
+    0x8830: 'SensitivityType', 0x8831: 'StandardOutputSensitivity',
+    0x8832: 'RecommendedExposureIndex', 0x8833: 'ISOSpeed', 0x9000: 'ExifVersion',
+    0x9003: 'DateTimeOriginal', 0x9004: 'DateTimeDigitized', 0x9010: 'OffsetTime',
+    0x9011: 'OffsetTimeOriginal', 0x9012: 'OffsetTimeDigitized',
+    0x9101: 'ComponentsConfiguration', 0x9102: 'CompressedBitsPerPixel',
+    0x9201: 'ShutterSpeedValue', 0x9202: 'ApertureValue', 0x9203: 'BrightnessValue',
+    0x9204: 'ExposureBiasValue', 0x9205: 'MaxApertureValue', 0x9206: 'SubjectDistance',
+    0x9207: 'MeteringMode', 0x9208: 'LightSource', 0x9209: 'Flash', 0x920A: 'FocalLength',
+    0x9214: 'SubjectArea', 0x927C: 'MakerNote', 0x9286: 'UserComment',
+    0x9290: 'SubsecTime', 0x9291: 'SubsecTimeOriginal', 0x9292: 'SubsecTimeDigitized',
+    0x9C9B: 'XPTitle', 0x9C9C: 'XPComment', 0x9C9D: 'XPAuthor', 0x9C9E: 'XPKeywords',
+    0x9C9F: 'XPSubject', 0xA000: 'FlashPixVersion', 0xA001: 'ColorSpace',
+    0xA002: 'ExifImageWidth', 0xA003: 'ExifImageHeight', 0xA004: 'RelatedSoundFile',
+    0xA005: 'ExifInteroperabilityOffset', 0xA20B: 'FlashEnergy',
+    0xA20C: 'SpatialFrequencyResponse', 0xA20E: 'FocalPlaneXResolution',
+    0xA20F: 'FocalPlaneYResolution', 0xA210: 'FocalPlaneResolutionUnit',
+    0xA214: 'SubjectLocation', 0xA215: 'ExposureIndex', 0xA217: 'SensingMethod',
+    0xA300: 'FileSource', 0xA301: 'SceneType', 0xA302: 'CFAPattern',
+    0xA401: 'CustomRendered', 0xA402: 'ExposureMode', 0xA403: 'WhiteBalance',
+    0xA404: 'DigitalZoomRatio', 0xA405: 'FocalLengthIn35mmFilm',
+    0xA406: 'SceneCaptureType', 0xA407: 'GainControl', 0xA408: 'Contrast',
+    0xA409: 'Saturation', 0xA40A: 'Sharpness', 0xA40B: 'DeviceSettingDescription',
+    0xA40C: 'SubjectDistanceRange', 0xA420: 'ImageUniqueID', 0xA430: 'CameraOwnerName',
+    0xA431: 'BodySerialNumber', 0xA432: 'LensSpecification', 0xA433: 'LensMake',
+    0xA434: 'LensModel', 0xA435: 'LensSerialNumber', 0xA460: 'CompositeImage',
+    0xA500: 'Gamma', 0xC4A5: 'PrintImageMatching',
+}
+
+GPS_TAGS = {
+    0: 'GPSVersionID', 1: 'GPSLatitudeRef', 2: 'GPSLatitude', 3: 'GPSLongitudeRef',
+    4: 'GPSLongitude', 5: 'GPSAltitudeRef', 6: 'GPSAltitude', 7: 'GPSTimeStamp',
+    8: 'GPSSatellites', 9: 'GPSStatus', 10: 'GPSMeasureMode', 11: 'GPSDOP',
+    12: 'GPSSpeedRef', 13: 'GPSSpeed', 14: 'GPSTrackRef', 15: 'GPSTrack',
+    16: 'GPSImgDirectionRef', 17: 'GPSImgDirection', 18: 'GPSMapDatum',
+    19: 'GPSDestLatitudeRef', 20: 'GPSDestLatitude', 21: 'GPSDestLongitudeRef',
+    22: 'GPSDestLongitude', 23: 'GPSDestBearingRef', 24: 'GPSDestBearing',
+    25: 'GPSDestDistanceRef', 26: 'GPSDestDistance', 27: 'GPSProcessingMethod',
+    28: 'GPSAreaInformation', 29: 'GPSDateStamp', 30: 'GPSDifferential',
+    31: 'GPSHPositioningError',
+}
+
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+MAKERNOTE_TAG = 0x927C
+
+# TIFF field type -> (bytes per value, struct code); RATIONALs are two codes
+_TYPE_FORMATS = {
+    1: (1, 'B'), 2: (1, 's'), 3: (2, 'H'), 4: (4, 'I'), 5: (8, 'II'), 6: (1, 'b'),
+    7: (1, 's'), 8: (2, 'h'), 9: (4, 'i'), 10: (8, 'ii'), 11: (4, 'f'), 12: (8, 'd'),
+    13: (4, 'I'),
+}
+
+# Precompiled per byte order: IFD entry, entry count and offset readers
+_STRUCTS = {
+    order: {
+        'entry': struct.Struct(order + 'HHI4s'),
+        'u16': struct.Struct(order + 'H'),
+        'u32': struct.Struct(order + 'I'),
+    }
+    for order in ('<', '>')
+}
+
+# (prefix, IFD offset inside the note, offsets relative to 'note' or 'tiff', vendor)
+_MAKERNOTE_LAYOUTS = (
+    (b'Nikon\x00\x02', 10, 'embedded', 'Nikon'),
+    (b'Nikon\x00\x01', 8, 'tiff', 'Nikon'),
+    (b'OLYMPUS\x00', 12, 'note', 'Olympus'),
+    (b'OLYMP\x00', 8, 'tiff', 'Olympus'),
+    (b'FUJIFILM', None, 'note', 'Fujifilm'),
+    (b'Panasonic\x00\x00\x00', 12, 'tiff', 'Panasonic'),
+    (b'SONY DSC \x00\x00\x00', 12, 'tiff', 'Sony'),
+    (b'SONY CAM \x00\x00\x00', 12, 'tiff', 'Sony'),
+    (b'Apple iOS\x00', 14, 'note', 'Apple'),
+)
+
+
+class ExifParseError(ValueError):
+    """Raised when a file is not a parseable JPEG/TIFF"""
+
+
+class _TiffView:
+    """Random access to a TIFF structure backed by bytes or a file"""
+
+    def __init__(self, read: Callable[[int, int], bytes], order: str, base: int = 0):
+        self._read = read
+        self.order = order
+        self.base = base
+        self.structs = _STRUCTS[order]
+
+    def read(self, offset: int, size: int) -> bytes:
+        return self._read(self.base + offset, size)
+
+    def rebased(self, base: int, order: Optional[str] = None) -> '_TiffView':
+        return _TiffView(self._read, order or self.order, base)
+
+
+def _bytes_reader(data: bytes) -> Callable[[int, int], bytes]:
+    def read(offset, size):
+        if offset < 0:
+            return b''
+        return data[offset:offset + size]
+    return read
+
+
+def _file_reader(f, header: bytes) -> Callable[[int, int], bytes]:
+    """Serve ranges from the header buffer, seeking only past its end"""
+    def read(offset, size):
+        if offset < 0:
+            return b''
+        if offset + size <= len(header):
+            return header[offset:offset + size]
+        f.seek(offset)
+        return f.read(size)
+    return read
+
+
+def _decode_ascii(raw: bytes) -> str:
+    raw = raw.split(b'\x00', 1)[0]
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('latin-1')
+
+
+def _decode_value(view: _TiffView, field_type: int, count: int, inline: bytes):
+    """Decode one IFD entry value; returns None for unsupported types"""
+    fmt = _TYPE_FORMATS.get(field_type)
+    if fmt is None or count <= 0:
+        return None
+    size, code = fmt
+    total = size * count
+
+    if total > MAX_VALUE_BYTES or (field_type not in (1, 2, 7) and count > MAX_VALUE_COUNT):
+        return f"<{count} values, {total} bytes>"
+
+    if total <= 4:
+        raw = inline[:total]
+    else:
+        offset = view.structs['u32'].unpack(inline)[0]
+        raw = view.read(offset, total)
+        if len(raw) < total:
+            return None
+
+    if field_type == 2:
+        return _decode_ascii(raw)
+    if field_type in (1, 7):
+        if field_type == 1 and count == 1:
+            return raw[0]
+        return raw
+
+    values = struct.unpack(f'{view.order}{count * len(code)}{code[0]}', raw)
+    if field_type in (5, 10):
+        values = tuple(
+            (num / den) if den else float('nan')
+            for num, den in zip(values[0::2], values[1::2])
+        )
+    return values[0] if count == 1 else values
+
+
+def _read_ifd(view: _TiffView, offset: int, entries: Dict[int, Any]) -> int:
+    """Decode one IFD into `entries`; returns the next IFD offset (0 at the end)"""
+    structs = view.structs
+    count_raw = view.read(offset, 2)
+    if len(count_raw) < 2:
+        return 0
+    count = structs['u16'].unpack(count_raw)[0]
+    if count > MAX_IFD_ENTRIES:
+        raise ExifParseError(f"Implausible IFD entry count {count}")
+
+    table = view.read(offset + 2, count * 12 + 4)
+    entry_struct = structs['entry']
+    for index in range(min(count, len(table) // 12)):
+        tag, field_type, value_count, inline = entry_struct.unpack_from(table, index * 12)
+        if tag == MAKERNOTE_TAG:
+            # Keep the location; the vendor IFD is decoded separately
+            entries[tag] = (field_type, value_count, inline)
+            continue
+        value = _decode_value(view, field_type, value_count, inline)
+        if value is not None:
+            entries[tag] = value
+
+    tail = table[count * 12:count * 12 + 4]
+    return structs['u32'].unpack(tail)[0] if len(tail) == 4 else 0
+
+
+def _parse_makernote(view: _TiffView, make: str, field_type: int, count: int,
+                     inline: bytes) -> Dict[str, Any]:
+    """Decode vendor MakerNote IFDs (string entries only) with a summary"""
+    metadata = {}
+    if count <= 4:
+        return metadata
+    note_offset = view.structs['u32'].unpack(inline)[0]
+    prefix = view.read(note_offset, 16)
+
+    vendor = None
+    entries = {}
+    for magic, ifd_offset, relative, name in _MAKERNOTE_LAYOUTS:
+        if prefix.startswith(magic):
+            vendor = name
+            break
+    else:
+        if make.lower().startswith('canon'):
+            vendor, ifd_offset, relative = 'Canon', 0, 'tiff'
+
+    try:
+        if vendor == 'Fujifilm':
+            sub = view.rebased(view.base + note_offset, '<')
+            _read_ifd(sub, sub.structs['u32'].unpack(prefix[8:12])[0], entries)
+        elif vendor is not None and relative == 'embedded':
+            header = view.read(note_offset + ifd_offset, 8)
+            order = '<' if header[:2] == b'II' else '>'
+            sub = view.rebased(view.base + note_offset + ifd_offset, order)
+            _read_ifd(sub, sub.structs['u32'].unpack(header[4:8])[0], entries)
+        elif vendor is not None and relative == 'note':
+            order = '>' if vendor == 'Apple' else view.order
+            if vendor == 'Olympus' and prefix[8:10] in (b'II', b'MM'):
+                order = '<' if prefix[8:10] == b'II' else '>'
+            sub = view.rebased(view.base + note_offset, order)
+            _read_ifd(sub, ifd_offset, entries)
+        elif vendor is not None:
+            _read_ifd(view, note_offset + ifd_offset, entries)
+    except (ExifParseError, struct.error, IndexError):
+        entries = {}
+
+    label = vendor or 'unknown'
+    metadata['exif_MakerNote'] = f"<{count} bytes, {label} maker note, {len(entries)} entries>"
+    for tag, value in entries.items():
+        if isinstance(value, str) and value:
+            metadata[prefixed_key('exif_MakerNote', f'0x{tag:04X}')] = value
+    return metadata
+
+
+def _parse_tiff(view: _TiffView, first_ifd: int) -> Tuple[Dict[int, Any], Dict[str, Any]]:
+    """Walk IFD0 (plus Exif/GPS/MakerNote sub-IFDs); returns (ifd0+exif tags, extra fields)"""
+    tags = {}
+    extra = {}
+    # IFD1+ hold thumbnails or extra pages; only IFD0 describes the image
+    _read_ifd(view, first_ifd, tags)
+    seen = {first_ifd}
+
+    exif_offset = tags.get(EXIF_IFD_POINTER)
+    if isinstance(exif_offset, int) and exif_offset not in seen:
+        seen.add(exif_offset)
+        exif_entries = {}
+        _read_ifd(view, exif_offset, exif_entries)
+        tags.update(exif_entries)
+
+    gps_offset = tags.pop(GPS_IFD_POINTER, None)
+    if isinstance(gps_offset, int) and gps_offset not in seen:
+        seen.add(gps_offset)
+        gps_entries = {}
+        _read_ifd(view, gps_offset, gps_entries)
+        extra.update(gps_fields(gps_entries))
+
+    makernote = tags.pop(MAKERNOTE_TAG, None)
+    if makernote is not None:
+        make = tags.get(0x010F, '')
+        extra.update(_parse_makernote(view, make if isinstance(make, str) else '', *makernote))
+
+    return tags, extra
+
+
+def _as_float(value):
+    """Pillow's IFDRational as the float this parser decodes rationals to"""
+    if isinstance(value, numbers.Rational) and not isinstance(value, int):
+        return float(value)
+    return value
+
+
+def gps_fields(entries: Dict[int, Any]) -> Dict[str, Any]:
+    """Flatten a GPS IFD ({tag: value}) into exif_GPS* fields
+
+    Used for this parser's GPS IFD and for Pillow's GPSInfo dict, so both
+    backends produce the same columns and values.
+    """
+    fields = {}
+    for tag, value in entries.items():
+        if isinstance(value, tuple):
+            value = str(tuple(_as_float(v) for v in value))
+        elif isinstance(value, bytes):
+            value = str(value)
+        else:
+            value = _as_float(value)
+        fields[prefixed_key('exif', GPS_TAGS.get(tag) or f'GPSUnknown_{tag}')] = value
+    return fields
+
+
+def _tiff_header(view_bytes: bytes) -> Tuple[str, int]:
+    """Return (struct byte order, first IFD offset) from an 8-byte TIFF header"""
+    if view_bytes[:4] == b'II*\x00':
+        order = '<'
+    elif view_bytes[:4] == b'MM\x00*':
+        order = '>'
+    else:
+        raise ExifParseError("Not a TIFF header")
+    return order, _STRUCTS[order]['u32'].unpack(view_bytes[4:8])[0]
+
+
+def _format_tags(tags: Dict[int, Any], metadata: Dict[str, Any]):
+    """Name tags like PIL.ExifTags and stringify bytes/tuples like the Pillow path"""
+    for tag_id, value in tags.items():
+        if isinstance(value, (bytes, tuple)):
+            value = str(value)
+        metadata[prefixed_key('exif', TAGS.get(tag_id) or f"Unknown_{tag_id}")] = value
+
+
+def _parse_jpeg(f, header: bytes) -> Dict[str, Any]:
+    """Walk JPEG markers to the first SOF; decode the APP1 Exif segment"""
+    if header[:2] != b'\xff\xd8':
+        raise ExifParseError("Not a JPEG file")
+
+    read = _file_reader(f, header)
+    image = {}
+    exif = None
+    pos = 2
+    while True:
+        marker = read(pos, 4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            break
+        code = marker[1]
+        if code == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            pos += 2
+            continue
+        length = (marker[2] << 8) | marker[3]
+        if code == 0xE1 and exif is None:
+            segment = read(pos + 4, length - 2)
+            if segment[:6] == b'Exif\x00\x00':
+                exif = segment[6:]
+        elif code in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB,
+                      0xCD, 0xCE, 0xCF):
+            sof = read(pos + 4, 6)
+            if len(sof) == 6:
+                image['image_width'] = (sof[3] << 8) | sof[4]
+                image['image_height'] = (sof[1] << 8) | sof[2]
+                image['image_mode'] = {1: 'L', 3: 'RGB', 4: 'CMYK'}.get(sof[5], 'RGB')
+            break
+        elif code == 0xDA:  # start of scan: no SOF before image data
+            break
+        pos += 2 + length
+
+    # Same leading keys, in the same order, as the Pillow backend
+    metadata = dict(image)
+    metadata['image_format'] = 'JPEG'
+    metadata['has_transparency'] = False
+
+    if exif is None:
+        metadata['exif_status'] = 'No EXIF data found'
+        return metadata
+
+    order, first_ifd = _tiff_header(exif[:8])
+    tags, extra = _parse_tiff(_TiffView(_bytes_reader(exif), order), first_ifd)
+    _format_tags(tags, metadata)
+    metadata.update(extra)
+    return metadata
+
+
+def _int_tag(tags: Dict[int, Any], tag: int, default: Optional[int] = None) -> Optional[int]:
+    """An image-structure tag as one integer (the first of several values)"""
+    value = tags.get(tag, default)
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if value is not None and not isinstance(value, int):
+        raise ExifParseError(f"Tag 0x{tag:04x} is not an integer")
+    return value
+
+
+def _parse_tiff_file(f, header: bytes) -> Dict[str, Any]:
+    """Decode IFD0 of a TIFF file and derive image dimensions from it"""
+    order, first_ifd = _tiff_header(header[:8])
+    tags, extra = _parse_tiff(_TiffView(_file_reader(f, header), order), first_ifd)
+
+    width = _int_tag(tags, 0x0100)
+    height = _int_tag(tags, 0x0101)
+    samples = _int_tag(tags, 0x0115, 1)
+    photometric = _int_tag(tags, 0x0106)
+    bits = _int_tag(tags, 0x0102, 1)
+    has_alpha = 0x0152 in tags
+
+    if samples == 1:
+        mode = '1' if bits == 1 else 'L'
+    elif photometric == 5:
+        mode = 'CMYK'
+    elif samples >= 4 and has_alpha:
+        mode = 'RGBA'
+    else:
+        mode = 'RGB'
+
+    metadata = {
+        'image_width': width,
+        'image_height': height,
+        'image_mode': mode,
+        'image_format': 'TIFF',
+        'has_transparency': has_alpha,
+    }
+    # Image-structure tags are already summarised above; keep the rest as EXIF
+    for tag in (0x0100, 0x0101):
+        tags.pop(tag, None)
+    if tags:
+        _format_tags(tags, metadata)
+    else:
+        metadata['exif_status'] = 'No EXIF data found'
+    metadata.update(extra)
+    return metadata
+
+
+def parse_image_header(filepath: str, header: Optional[bytes] = None,
+                       size: Optional[int] = None) -> Dict[str, Any]:
+    """Extract image dimensions and EXIF from a JPEG or TIFF without Pillow
+
+    `header` may carry the first bytes of the file if the caller already
+    read them (`size` is then the file size); the file is only opened if
+    the EXIF block extends past it. Raises ExifParseError for other
+    formats or corrupt files.
+    """
+    source = open(filepath, 'rb') if header is None else PrefetchedFile(filepath, header, size)
+    with source as f:
+        if header is None or (len(header) < HEADER_SIZE and len(header) < f.size):
+            header = f.read(HEADER_SIZE)
+        try:
+            if header[:2] == b'\xff\xd8':
+                return _parse_jpeg(f, header)
+            if header[:4] in (b'II*\x00', b'MM\x00*'):
+                return _parse_tiff_file(f, header)
+        except ExifParseError:
+            raise
+        except (struct.error, IndexError, TypeError, ValueError) as e:
+            raise ExifParseError(f"Corrupt image header: {str(e)}")
+    raise ExifParseError("Not a JPEG or TIFF file")
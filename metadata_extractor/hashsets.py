@@ -0,0 +1,348 @@
+"""Known-file hash sets: compact on-disk digest indexes and record tagging
+
+Hash sets such as the NSRL RDS list hundreds of millions of known
+files. Held as a Python set of hex strings that is tens of GB; as a
+sorted array of binary digests it is 16 bytes per MD5. build_index()
+turns hash lists (NSRL-style CSV, md5sum/hashdeep output, one digest per
+line; .gz/.zst allowed) into one index file:
+
+    header | fanout table | sorted digests | Bloom filter
+
+- the digests are sorted with timeline.ExternalSorter, so building needs
+  bounded memory however long the lists are, and de-duplicated
+- the fanout table holds, for each value of the first two digest bytes,
+  how many digests sort at or below it (as in git pack indexes), so a
+  lookup binary-searches only ~count/65536 entries
+- the Bloom filter (BLOOM_BITS_PER_ENTRY bits per digest, BLOOM_HASHES
+  probes, under 1% false positives) answers most misses - the common
+  case for case files - without touching the digest array
+
+HashSetIndex memory-maps the file, so opening is instant and the
+operating system pages in only what lookups touch; a lookup costs a few
+microseconds. KnownFiles checks a record's digests against known-good
+and known-bad indexes and tags it, so the engines can skip the EXIF and
+media extractors for known-good files.
+"""
+
+import binascii
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+from .backends import is_installed, load_numpy
+from .hashing import normalize_algorithms
+from .metrics import METRICS
+from .record import FileRecord
+from .sinks import open_compressed_reader, _strip_compression_suffix
+from .timeline import DEFAULT_MEMORY_LIMIT, ExternalSorter
+
+NUMPY_AVAILABLE = is_installed('numpy')
+
+MAGIC = b'MEHSIDX1'
+# magic, algorithm, label, digest size, Bloom probes, digest count, Bloom filter bytes
+HEADER_FORMAT = '<8s16s64sIIQQ'
+HEADER_SIZE = 128
+FANOUT_ENTRIES = 1 << 16
+FANOUT_OFFSET = HEADER_SIZE
+DIGESTS_OFFSET = FANOUT_OFFSET + FANOUT_ENTRIES * 8
+
+BLOOM_BITS_PER_ENTRY = 10
+BLOOM_HASHES = 7
+
+# Bloom probes come from the first 16 digest bytes (double hashing)
+MIN_DIGEST_SIZE = 16
+
+KNOWN_STATUSES = ('good', 'bad')
+KNOWN_ACTIONS = ('tag', 'skip')
+
+# Estimated bytes of a buffered digest besides its length (bytes object, list slot)
+DIGEST_OVERHEAD = 41
+
+# Digests written, and Bloom positions computed, per batch
+BATCH_SIZE = 1 << 16
+
+_MASK64 = (1 << 64) - 1
+
+
+def digest_size(algorithm: str) -> int:
+    return hashlib.new(algorithm).digest_size
+
+
+def _bloom_positions(digest: bytes, bits: int, probes: int) -> Iterable[int]:
+    """Bit positions of a digest: (h1 + i * h2) mod bits, i < probes"""
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:16], 'little') | 1
+    return (((h1 + i * h2) & _MASK64) % bits for i in range(probes))
+
+
+def _fill_bloom_numpy(np, mm: mmap.mmap, count: int, size: int, bloom_offset: int,
+                      bloom_bytes: int, probes: int):
+    """Set every digest's Bloom bits, BATCH_SIZE digests at a time"""
+    bits = np.uint64(bloom_bytes * 8)
+    bloom = np.frombuffer(mm, dtype=np.uint8, count=bloom_bytes, offset=bloom_offset)
+    digests = np.frombuffer(mm, dtype=np.uint8, count=count * size,
+                            offset=DIGESTS_OFFSET).reshape(count, size)
+    for start in range(0, count, BATCH_SIZE):
+        rows = digests[start:start + BATCH_SIZE]
+        h1 = np.ascontiguousarray(rows[:, :8]).view('<u8').ravel()
+        h2 = np.ascontiguousarray(rows[:, 8:16]).view('<u8').ravel() | np.uint64(1)
+        for i in range(probes):
+            # uint64 arithmetic wraps like the & _MASK64 of the lookup side
+            positions = (h1 + h2 * np.uint64(i)) % bits
+            masks = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+            np.bitwise_or.at(bloom, (positions >> np.uint64(3)).astype(np.intp), masks)
+
+
+def _fill_bloom(mm: mmap.mmap, count: int, size: int, bloom_offset: int, bloom_bytes: int,
+                probes: int):
+    bits = bloom_bytes * 8
+    for n in range(count):
+        start = DIGESTS_OFFSET + n * size
+        for position in _bloom_positions(mm[start:start + size], bits, probes):
+            index = bloom_offset + (position >> 3)
+            mm[index] |= 1 << (position & 7)
+
+
+def _default_label(path: str) -> str:
+    name = os.path.basename(_strip_compression_suffix(path))
+    return os.path.splitext(name)[0]
+
+
+def build_index(sources: Sequence[str], path: str, algorithm: str = 'md5',
+                label: Optional[str] = None, memory_limit: int = DEFAULT_MEMORY_LIMIT,
+                temp_dir: Optional[str] = None) -> Dict[str, int]:
+    """Build an index of the `algorithm` digests listed in `sources`
+
+    The first hex string of the digest's exact length on each line is
+    taken (in an NSRL CSV line, the MD5 or SHA-1 column); lines without
+    one, such as headers, are skipped. `label` names the set in tagged
+    records (default: the first source's file name). Returns counts of
+    lines read, digests indexed and duplicates dropped.
+    """
+    algorithm = normalize_algorithms([algorithm])[0]
+    size = digest_size(algorithm)
+    if size < MIN_DIGEST_SIZE:
+        raise ValueError(f"{algorithm} digests are too short for a hash set index")
+    if label is None:
+        label = _default_label(sources[0]) if sources else algorithm
+    label_bytes = label.encode('utf-8')[:64]
+    pattern = re.compile(rb'(?<![0-9A-Fa-f])[0-9A-Fa-f]{%d}(?![0-9A-Fa-f])' % (size * 2))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, '.tmp-' + os.path.basename(path))
+    counts = {'lines': 0, 'digests': 0, 'duplicates': 0}
+    timer = METRICS.start()
+    try:
+        with ExternalSorter(memory_limit, temp_dir or directory,
+                            size_of=lambda digest: DIGEST_OVERHEAD + len(digest),
+                            prefix='metadata_hashset_') as sorter:
+            for source in sources:
+                with open_compressed_reader(source) as f:
+                    for line in f:
+                        counts['lines'] += 1
+                        match = pattern.search(line)
+                        if match is not None:
+                            sorter.add(binascii.unhexlify(match.group()))
+
+            fanout = [0] * FANOUT_ENTRIES
+            with open(tmp_path, 'w+b') as f:
+                f.write(bytes(DIGESTS_OFFSET))  # header and fanout are filled in last
+                last = None
+                batch: List[bytes] = []
+                for digest in sorter.sorted():
+                    if digest == last:
+                        counts['duplicates'] += 1
+                        continue
+                    last = digest
+                    fanout[digest[0] << 8 | digest[1]] += 1
+                    batch.append(digest)
+                    if len(batch) >= BATCH_SIZE:
+                        f.write(b''.join(batch))
+                        batch = []
+                f.write(b''.join(batch))
+                count = counts['digests'] = sum(fanout)
+
+                bloom_bytes = max(8, (count * BLOOM_BITS_PER_ENTRY + 63) // 64 * 8)
+                bloom_offset = DIGESTS_OFFSET + count * size
+                f.truncate(bloom_offset + bloom_bytes)
+                f.flush()
+                with mmap.mmap(f.fileno(), 0) as mm:
+                    np = load_numpy()
+                    if np is not None:
+                        _fill_bloom_numpy(np, mm, count, size, bloom_offset, bloom_bytes,
+                                          BLOOM_HASHES)
+                    else:
+                        _fill_bloom(mm, count, size, bloom_offset, bloom_bytes, BLOOM_HASHES)
+                    total = 0
+                    for prefix, n in enumerate(fanout):
+                        total += n
+                        fanout[prefix] = total
+                    struct.pack_into(f'<{FANOUT_ENTRIES}Q', mm, FANOUT_OFFSET, *fanout)
+                    # The header goes in last: an index with a valid magic is complete
+                    struct.pack_into(HEADER_FORMAT, mm, 0, MAGIC, algorithm.encode('ascii'),
+                                     label_bytes, size, BLOOM_HASHES, count, bloom_bytes)
+                    mm.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        METRICS.stop(timer, 'hashset_build', path)
+    return counts
+
+
+class HashSetIndex:
+    """Read-only, memory-mapped view of an index written by build_index()"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+                raise ValueError(f"Not a hash set index: {path}")
+            (_, algorithm, label, self.digest_size, self.bloom_hashes, self.count,
+             self.bloom_bytes) = struct.unpack_from(HEADER_FORMAT, header)
+            self.algorithm = algorithm.rstrip(b'\0').decode('ascii')
+            self.label = label.rstrip(b'\0').decode('utf-8', 'replace')
+            self._bloom_offset = DIGESTS_OFFSET + self.count * self.digest_size
+            expected = self._bloom_offset + self.bloom_bytes
+            if os.fstat(f.fileno()).st_size != expected:
+                raise ValueError(f"Truncated or damaged hash set index: {path}")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._bits = self.bloom_bytes * 8
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def might_contain(self, digest: bytes) -> bool:
+        """Bloom filter check: False means certainly absent"""
+        # _bloom_positions() inlined: this runs once per hashed file
+        mm = self._mm
+        offset = self._bloom_offset
+        bits = self._bits
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        for i in range(self.bloom_hashes):
+            position = ((h1 + i * h2) & _MASK64) % bits
+            if not mm[offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __contains__(self, digest: bytes) -> bool:
+        size = self.digest_size
+        if len(digest) != size or not self.might_contain(digest):
+            return False
+        mm = self._mm
+        prefix = digest[0] << 8 | digest[1]
+        lo = struct.unpack_from('<Q', mm, FANOUT_OFFSET + (prefix - 1) * 8)[0] if prefix else 0
+        hi = struct.unpack_from('<Q', mm, FANOUT_OFFSET + prefix * 8)[0]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = DIGESTS_OFFSET + mid * size
+            value = mm[start:start + size]
+            if value < digest:
+                lo = mid + 1
+            elif value > digest:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def contains_hex(self, digest: str) -> bool:
+        try:
+            return bytes.fromhex(digest) in self
+        except ValueError:
+            return False
+
+    def info(self) -> Dict[str, Any]:
+        return {'path': self.path, 'algorithm': self.algorithm, 'label': self.label,
+                'digests': self.count, 'bloom_bytes': self.bloom_bytes,
+                'bloom_hashes': self.bloom_hashes, 'file_bytes': len(self._mm)}
+
+    def close(self):
+        self._mm.close()
+
+
+# Indexes mapped by this process, shared by every KnownFiles instance (and
+# inherited by forked workers)
+_open_indexes: Dict[str, HashSetIndex] = {}
+_open_lock = threading.Lock()
+
+
+def open_index(path: str) -> HashSetIndex:
+    """The process-wide mapping of an index file, opened on first use"""
+    index = _open_indexes.get(path)
+    if index is None:
+        with _open_lock:
+            index = _open_indexes.get(path)
+            if index is None:
+                index = _open_indexes[path] = HashSetIndex(path)
+    return index
+
+
+def _record_digest(metadata: Dict[str, Any], algorithm: str) -> Optional[bytes]:
+    """Binary digest of a record (FileRecord or dict with hex digests); None if absent"""
+    if isinstance(metadata, FileRecord):
+        return metadata.digest(algorithm)
+    value = metadata.get(f'{algorithm}_hash')
+    if not isinstance(value, str):
+        return None
+    try:
+        return bytes.fromhex(value)
+    except ValueError:
+        return None  # 'Error: ...' from a failed read
+
+
+class KnownFiles:
+    """Known-good and known-bad hash set indexes that records are checked against
+
+    Only the index paths are kept, so an instance pickles cheaply into
+    worker processes, where each index is mapped on first use. A file in
+    both kinds of set counts as known-bad. Raises ValueError if an index
+    is unreadable.
+    """
+
+    def __init__(self, good: Sequence[str] = (), bad: Sequence[str] = ()):
+        self.good = tuple(os.path.abspath(path) for path in good)
+        self.bad = tuple(os.path.abspath(path) for path in bad)
+        stamps = []
+        algorithms = []
+        for path in self.bad + self.good:
+            index = open_index(path)
+            stat = os.stat(path)
+            stamps.append(f'{path}:{stat.st_size}:{stat.st_mtime_ns}')
+            if index.algorithm not in algorithms:
+                algorithms.append(index.algorithm)
+        self.algorithms = tuple(algorithms)
+        digest = hashlib.md5('|'.join(stamps).encode('utf-8', 'surrogateescape')).hexdigest()
+        # Cached records were tagged against these exact index files
+        self.profile = f'known:{len(self.bad)}:{len(self.good)}:{digest}'
+
+    def classify(self, metadata: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """('bad' or 'good', set label) for a record found in a set, else None"""
+        for status, paths in (('bad', self.bad), ('good', self.good)):
+            for path in paths:
+                index = open_index(path)
+                digest = _record_digest(metadata, index.algorithm)
+                if digest is not None and digest in index:
+                    return status, index.label
+        return None
+
+    def tag(self, metadata: Dict[str, Any]) -> Optional[str]:
+        """Add known_file and known_set to a record found in a set; returns its status"""
+        match = self.classify(metadata)
+        if match is None:
+            return None
+        metadata['known_file'], metadata['known_set'] = match
+        return match[0]
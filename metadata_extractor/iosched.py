@@ -0,0 +1,341 @@
+"""Per-device I/O scheduling for the pipeline's read/hash stage
+
+A case assembled from several sources mixes very different media: an
+NVMe drive wants many reads in flight, a USB hard disk behind a write
+blocker loses most of its throughput to seeks as soon as two reads
+compete, and a network share sits somewhere in between. One fixed
+number of reader threads is wrong for all of them.
+
+DeviceScheduler takes the place of the queue in front of the hash stage
+and keeps one queue per device (st_dev):
+
+- a reader thread only takes a file from a device that is below its
+  concurrency limit, so a slow disk never ties up threads that another
+  device could use, and every device is read at the same time
+- files on rotational disks are read in inode order (on common file
+  systems a good proxy for on-disk placement) instead of walk order
+- each limit adapts by hill climbing on measured throughput: every
+  ADAPT_INTERVAL seconds a device that had work queued compares its
+  bytes/s with the previous window. One more read in flight is kept
+  only if throughput rose by ADAPT_THRESHOLD; otherwise the step is
+  undone and the next probe waits twice as long. Rising latency without
+  a throughput gain steps down.
+- an optional per-device bandwidth cap (a token bucket charged for every
+  chunk read) keeps shared storage from being saturated
+
+Devices start from what the OS reports (/sys/dev/block on Linux): one
+read in flight for rotational disks, four for solid-state, two when
+unknown (network mounts, other platforms).
+"""
+
+import heapq
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Any, Callable, Optional
+
+ROTATIONAL = 'rotational'
+SOLID_STATE = 'solid-state'
+UNKNOWN = 'unknown'
+
+INITIAL_LIMITS = {ROTATIONAL: 1, SOLID_STATE: 4, UNKNOWN: 2}
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Seconds of completions per throughput measurement, and the fewest files
+# that make a measurement
+ADAPT_INTERVAL = 0.5
+MIN_WINDOW_FILES = 4
+
+# Relative throughput change that counts as real rather than noise
+ADAPT_THRESHOLD = 0.1
+
+# Mean latency growth (with flat throughput) that makes a device step down
+LATENCY_BACKOFF = 2.0
+
+# Steady windows before probing one more read in flight; doubled after
+# every failed probe, up to MAX_PROBE_WINDOWS
+PROBE_WINDOWS = 4
+MAX_PROBE_WINDOWS = 64
+
+# A bandwidth cap allows bursts of this many seconds of its rate
+BURST_SECONDS = 0.25
+
+
+def device_kind(dev: int) -> str:
+    """ROTATIONAL, SOLID_STATE or UNKNOWN for an st_dev value"""
+    try:
+        base = os.path.realpath(f'/sys/dev/block/{os.major(dev)}:{os.minor(dev)}')
+    except (AttributeError, ValueError, OverflowError):
+        return UNKNOWN  # no os.major on Windows
+    # Partitions have no queue of their own; their parent disk does
+    for directory in (base, os.path.dirname(base)):
+        try:
+            with open(os.path.join(directory, 'queue', 'rotational'), 'r') as f:
+                return ROTATIONAL if f.read().strip() == '1' else SOLID_STATE
+        except OSError:
+            continue
+    return UNKNOWN
+
+
+class TokenBucket:
+    """Bytes-per-second limit shared by the threads reading one device"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = burst if burst is not None else max(1.0, self.rate * BURST_SECONDS)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, nbytes: int):
+        """Charge `nbytes`, sleeping while the bucket is in debt"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= nbytes
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class _Device:
+    """Queue, concurrency limit and throughput controller of one st_dev"""
+
+    def __init__(self, dev: int, kind: str, max_limit: int, bucket: Optional[TokenBucket]):
+        self.dev = dev
+        self.kind = kind
+        self.max_limit = max_limit
+        self.limit = min(INITIAL_LIMITS[kind], max_limit)
+        self.peak_limit = self.limit
+        self.in_flight = 0
+        self.bucket = bucket
+        # Rotational: heap of (inode, seq, item); otherwise FIFO of items
+        self._heap: List[Any] = []
+        self._fifo = deque()
+        self._started: Dict[int, float] = {}
+
+        self.files = 0
+        self.bytes = 0
+        self.busy_seconds = 0.0
+        self.first_start: Optional[float] = None
+        self.last_done: Optional[float] = None
+
+        self._window_start: Optional[float] = None
+        self._window_bytes = 0
+        self._window_files = 0
+        self._window_latency = 0.0
+        self._backlogged = False
+        self._prev_rate: Optional[float] = None
+        self._prev_latency: Optional[float] = None
+        self._direction = 0  # +1 after a step up, -1 after a step down, 0 steady
+        self._steady = 0
+        self._probe_after = PROBE_WINDOWS
+
+    def __len__(self) -> int:
+        return len(self._heap) + len(self._fifo)
+
+    def push(self, item, seq: int):
+        if self.kind == ROTATIONAL:
+            heapq.heappush(self._heap, (item.stat.st_ino, seq, item))
+        else:
+            self._fifo.append(item)
+
+    def clear(self):
+        self._heap = []
+        self._fifo.clear()
+        self._started.clear()
+        self.in_flight = 0
+
+    def pop(self, now: float):
+        item = heapq.heappop(self._heap)[2] if self._heap else self._fifo.popleft()
+        self.in_flight += 1
+        self._started[id(item)] = now
+        if self.first_start is None:
+            self.first_start = now
+        if self._window_start is None:
+            self._window_start = now
+        return item
+
+    def complete(self, item, nbytes: int, now: float, adaptive: bool):
+        started = self._started.pop(id(item), now)
+        self.in_flight -= 1
+        self.files += 1
+        self.bytes += nbytes
+        self.busy_seconds += now - started
+        self.last_done = now
+        self._window_bytes += nbytes
+        self._window_files += 1
+        self._window_latency += now - started
+        # Only a device with work waiting is limited by its own concurrency
+        if len(self):
+            self._backlogged = True
+        if adaptive:
+            self._adapt(now)
+
+    def _adapt(self, now: float):
+        elapsed = now - self._window_start
+        if elapsed < ADAPT_INTERVAL or self._window_files < MIN_WINDOW_FILES:
+            return
+        rate = self._window_bytes / elapsed
+        latency = self._window_latency / self._window_files
+        if self._backlogged:
+            self._step(rate, latency)
+            self._prev_rate = rate
+            self._prev_latency = latency
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_files = 0
+        self._window_latency = 0.0
+        self._backlogged = False
+
+    def _step(self, rate: float, latency: float):
+        """Hill climbing on throughput: keep a step only if it paid off"""
+        prev = self._prev_rate
+        if prev is None:
+            # First measurement: solid-state media usually gain from more reads
+            if self.kind != ROTATIONAL:
+                self._set_limit(self.limit + 1, +1)
+            return
+        if self._direction > 0:
+            if rate >= prev * (1 + ADAPT_THRESHOLD):
+                self._set_limit(self.limit + 1, +1)
+            else:
+                self._probe_after = min(self._probe_after * 2, MAX_PROBE_WINDOWS)
+                self._set_limit(self.limit - 1, 0)
+        elif self._direction < 0:
+            if rate < prev * (1 - ADAPT_THRESHOLD):
+                self._set_limit(self.limit + 1, 0)  # fewer reads cost throughput
+            else:
+                self._direction = 0
+        elif (latency > self._prev_latency * LATENCY_BACKOFF
+              and rate < prev * (1 + ADAPT_THRESHOLD) and self.limit > 1):
+            self._set_limit(self.limit - 1, -1)
+        else:
+            self._steady += 1
+            if self._steady >= self._probe_after and self.limit < self.max_limit:
+                self._set_limit(self.limit + 1, +1)
+
+    def _set_limit(self, limit: int, direction: int):
+        limit = max(1, min(self.max_limit, limit))
+        self._direction = direction if limit != self.limit else 0
+        self.limit = limit
+        self.peak_limit = max(self.peak_limit, limit)
+        self._steady = 0
+
+    def summary(self) -> Dict[str, Any]:
+        wall = (self.last_done - self.first_start) if self.files else 0.0
+        return {
+            'device': self.dev,
+            'kind': self.kind,
+            'files': self.files,
+            'bytes': self.bytes,
+            'seconds': round(wall, 3),
+            'mb_per_sec': round(self.bytes / wall / (1024 * 1024), 2) if wall > 0 else 0.0,
+            'limit': self.limit,
+            'peak_limit': self.peak_limit,
+        }
+
+
+class DeviceScheduler:
+    """Queue between the stat and hash stages that schedules reads per device
+
+    Implements the put()/get() calls the pipeline makes on its queues.
+    Items carry their os.stat result in `.stat`; items without one, or
+    already finished (`.record` set), need no I/O and are handed out
+    first. put() never blocks: the pipeline's in-flight limit already
+    bounds what can be queued. End-of-input markers are only handed out
+    once every device queue is empty. Readers call done() when an item's
+    read is over and may pass throttle(item) to the hasher.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 max_bytes_per_second: Optional[float] = None, adaptive: bool = True,
+                 kind_of: Callable[[int], str] = device_kind):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_bytes_per_second = max_bytes_per_second
+        self.adaptive = adaptive
+        self._kind_of = kind_of
+        self._cond = threading.Condition()
+        self._devices: Dict[int, _Device] = {}
+        self._ready = deque()
+        self._markers: List[Any] = []
+        self._seq = 0
+
+    def _device(self, dev: int) -> _Device:
+        device = self._devices.get(dev)
+        if device is None:
+            bucket = None
+            if self.max_bytes_per_second:
+                bucket = TokenBucket(self.max_bytes_per_second)
+            device = self._devices[dev] = _Device(dev, self._kind_of(dev), self.max_concurrency,
+                                                  bucket)
+        return device
+
+    # Queue interface ----------------------------------------------------
+
+    def put(self, item, block: bool = True, timeout: Optional[float] = None):
+        with self._cond:
+            if not hasattr(item, 'stat'):
+                self._markers.append(item)
+            elif item.stat is None or item.record is not None:
+                self._ready.append(item)
+            else:
+                self._seq += 1
+                self._device(item.stat.st_dev).push(item, self._seq)
+            self._cond.notify_all()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._ready:
+                    return self._ready.popleft()
+                item = self._take()
+                if item is not None:
+                    return item
+                if self._markers and not any(len(d) for d in self._devices.values()):
+                    return self._markers.pop()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    raise queue.Empty
+                self._cond.wait(remaining)
+
+    def _take(self):
+        """Next item from the least loaded device that is below its limit"""
+        best = None
+        for device in self._devices.values():
+            if len(device) and device.in_flight < device.limit:
+                if best is None or device.in_flight * best.limit < best.in_flight * device.limit:
+                    best = device
+        return best.pop(time.monotonic()) if best is not None else None
+
+    # Reader side ----------------------------------------------------------
+
+    def throttle(self, item) -> Optional[Callable[[int], None]]:
+        """Per-chunk bandwidth limiter for an item's device, or None without a cap"""
+        device = self._devices.get(item.stat.st_dev)
+        return device.bucket.take if device is not None and device.bucket is not None else None
+
+    def done(self, item, nbytes: int):
+        """An item handed out by get() has been read"""
+        with self._cond:
+            device = self._devices[item.stat.st_dev]
+            device.complete(item, nbytes, time.monotonic(), self.adaptive)
+            self._cond.notify_all()
+
+    def clear(self):
+        """Drop leftovers of a cancelled run; learned limits are kept"""
+        with self._cond:
+            self._ready.clear()
+            self._markers = []
+            for device in self._devices.values():
+                device.clear()
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per-device files, bytes, throughput and concurrency limits"""
+        with self._cond:
+            return [device.summary() for device in self._devices.values()]
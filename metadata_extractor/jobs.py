@@ -0,0 +1,357 @@
+"""Checkpointed extraction jobs that resume where a crash stopped them
+
+A job lives in its own directory with two files:
+
+- records.spool: extracted records, pickled one batch at a time
+- journal: one JSON line per event; the first line holds the job's
+  parameters, then one line per committed batch listing the files it
+  completed (path, size, mtime_ns) and the spool offset it ends at
+
+A batch is committed every `checkpoint_files` files or
+`checkpoint_seconds` seconds: the spool is fsynced first, then the
+journal line is appended and fsynced, so a journaled batch is always
+fully on disk. On reopen, a torn journal tail is dropped and the spool
+is truncated back to the last committed offset; files journaled with an
+unchanged size and mtime are skipped, everything else is extracted
+again.
+
+Outputs (CSV, JSON, result store) are only produced once extraction is
+complete, by replaying the spool. The JSON file and the store are
+rewritten from scratch on every replay; CSVs are appended to, so the
+journal records each CSV's size and inode before it is written and
+whether it finished. After a crash during export a half-appended CSV is
+truncated back, and a CSV that was already written is skipped, so no
+row is ever written twice.
+"""
+
+import datetime
+import json
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+from .sinks import WRITE_BUFFER_SIZE
+
+JOURNAL_NAME = 'journal'
+SPOOL_NAME = 'records.spool'
+
+# Bump when the journal or spool layout changes
+JOB_VERSION = 1
+
+DEFAULT_CHECKPOINT_FILES = 500
+DEFAULT_CHECKPOINT_SECONDS = 5.0
+
+# Where the GUI keeps its jobs
+DEFAULT_JOBS_DIR = os.path.join(os.path.expanduser('~'), '.metadata_extractor', 'jobs')
+
+# A group is one input file's record followed by its archive members, if any
+Group = Tuple[str, List[Dict[str, Any]]]
+
+
+def _fsync_dir(path: str):
+    """Make a rename or creation inside `path` durable (no-op where unsupported)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class ExtractionJob:
+    """Journal and record spool of one resumable extraction run
+
+    Opening a directory that already holds a journal resumes that job;
+    `params` must then match the ones it was started with (pass None to
+    accept the stored ones, available as `job.params`).
+    """
+
+    def __init__(self, job_dir: str, params: Optional[Dict[str, Any]] = None,
+                 checkpoint_files: int = DEFAULT_CHECKPOINT_FILES,
+                 checkpoint_seconds: float = DEFAULT_CHECKPOINT_SECONDS):
+        self.job_dir = job_dir
+        self.checkpoint_files = max(1, checkpoint_files)
+        self.checkpoint_seconds = checkpoint_seconds
+        self.journal_path = os.path.join(job_dir, JOURNAL_NAME)
+        self.spool_path = os.path.join(job_dir, SPOOL_NAME)
+
+        self.params: Dict[str, Any] = {}
+        self.resumed = False
+        self.extracted = False
+        self.finished = False
+        self.skipped = 0  # files skipped by pending() because they were done
+        # path -> (size, mtime_ns, last batch that holds its record)
+        self._done: Dict[str, Tuple[int, int, int]] = {}
+        self._batches = 0
+        self._committed = 0  # spool offset covered by the journal
+        self._csv_started: Dict[str, Tuple[int, int]] = {}
+        self._csv_done = set()
+
+        self._groups: List[Group] = []  # complete groups not yet committed
+        self._current: Optional[Group] = None
+        self._last_commit = time.monotonic()
+
+        os.makedirs(job_dir, exist_ok=True)
+        if os.path.exists(self.journal_path):
+            self._load(params)
+        else:
+            if params is None:
+                raise FileNotFoundError(f"No job journal in {job_dir}")
+            self.params = params
+            header = {'job': JOB_VERSION, 'created': datetime.datetime.now().isoformat(),
+                      'params': params}
+            with open(self.journal_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(header, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            _fsync_dir(job_dir)
+
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._spool = None
+        if not self.finished:
+            self._spool = open(self.spool_path, 'ab', buffering=WRITE_BUFFER_SIZE)
+
+    # Loading ----------------------------------------------------------------
+
+    def _load(self, params: Optional[Dict[str, Any]]):
+        """Replay the journal, drop a torn tail and truncate the spool to match"""
+        valid = 0
+        with open(self.journal_path, 'rb') as f:
+            header_line = f.readline()
+            try:
+                header = json.loads(header_line)
+            except ValueError:
+                raise ValueError(f"Unreadable job journal: {self.journal_path}")
+            if header.get('job') != JOB_VERSION:
+                raise ValueError(f"Unsupported job version in {self.journal_path}")
+            valid = len(header_line)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # torn write: the process died mid-line
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    break
+                valid += len(line)
+
+        stored = header['params']
+        if params is not None and params != stored:
+            changed = sorted(key for key in set(params) | set(stored)
+                             if params.get(key) != stored.get(key))
+            raise ValueError(f"Job in {self.job_dir} was started with different options: "
+                             f"{', '.join(changed)}")
+        self.params = stored
+        self.resumed = True
+
+        if os.path.getsize(self.journal_path) > valid:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid)
+        if os.path.exists(self.spool_path) and os.path.getsize(self.spool_path) > self._committed:
+            with open(self.spool_path, 'r+b') as f:
+                f.truncate(self._committed)
+
+    def _apply(self, event: Dict[str, Any]):
+        """Apply one journal line to the in-memory state"""
+        if 'batch' in event:
+            batch = event['batch']
+            for path, size, mtime_ns in event['files']:
+                self._done[path] = (size, mtime_ns, batch)
+            self._batches = batch + 1
+            self._committed = event['end']
+        elif 'extracted' in event:
+            self.extracted = True
+            self._committed = event['extracted']
+        elif 'csv' in event:
+            self._csv_started[event['csv']] = (event['size'], event['ino'])
+        elif 'csv_done' in event:
+            self._csv_done.add(event['csv_done'])
+        elif 'finished' in event:
+            self.finished = True
+        else:
+            raise KeyError('unknown journal event')
+
+    # Extraction -------------------------------------------------------------
+
+    @property
+    def done_files(self) -> int:
+        return len(self._done)
+
+    def pending(self, files: Iterable[str]) -> Iterator[str]:
+        """Filter out files already extracted by this job and unchanged since"""
+        own_dir = os.path.abspath(self.job_dir) + os.sep
+        for filepath in files:
+            path = str(Path(filepath).absolute())
+            if path.startswith(own_dir):
+                continue  # never extract the job's own journal and spool
+            done = self._done.get(path)
+            if done is not None:
+                try:
+                    stat = os.stat(filepath)
+                except OSError:
+                    stat = None
+                if stat is not None and (stat.st_size, stat.st_mtime_ns) == done[:2]:
+                    self.skipped += 1
+                    continue
+            yield filepath
+
+    def write(self, metadata: Dict[str, Any]):
+        """Add one successful record; archive members follow their archive"""
+        if 'parent_path' in metadata and self._current is not None:
+            self._current[1].append(metadata)
+            return
+        if self._current is not None:
+            self._groups.append(self._current)
+        self._current = (metadata['filepath'], [metadata])
+        if (len(self._groups) >= self.checkpoint_files
+                or time.monotonic() - self._last_commit >= self.checkpoint_seconds):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Commit every complete group: spool first, then the journal line"""
+        self._last_commit = time.monotonic()
+        if not self._groups:
+            return
+        files = []
+        for path, records in self._groups:
+            head = records[0]
+            mtime_ns = getattr(head, 'mtime_ns', None)
+            if mtime_ns is None:
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    mtime_ns = -1
+            files.append((path, head['size_bytes'], mtime_ns))
+
+        pickle.dump(self._groups, self._spool, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spool.flush()
+        os.fsync(self._spool.fileno())
+        end = self._spool.tell()
+
+        batch = self._batches
+        self._log({'batch': batch, 'end': end, 'files': files})
+        for path, size, mtime_ns in files:
+            self._done[path] = (size, mtime_ns, batch)
+        self._batches = batch + 1
+        self._committed = end
+        self._groups = []
+
+    def finish_extraction(self):
+        """Commit the last group and mark extraction complete"""
+        if self._current is not None:
+            self._groups.append(self._current)
+            self._current = None
+        self.checkpoint()
+        if not self.extracted:
+            self._spool.flush()
+            self._log({'extracted': self._spool.tell()})
+            self.extracted = True
+
+    def _log(self, event: Dict[str, Any]):
+        self._journal.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    # Export -----------------------------------------------------------------
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """Every committed record in extraction order, latest version of each file only"""
+        self._spool.flush()
+        with open(self.spool_path, 'rb') as f:
+            batch = 0
+            while f.tell() < self._committed:
+                for path, records in pickle.load(f):
+                    done = self._done.get(path)
+                    # A file re-extracted after it changed is replayed from its last batch
+                    if done is None or done[2] == batch:
+                        yield from records
+                batch += 1
+
+    def before_csv(self, csv_path: str) -> bool:
+        """CSVWriterPool hook: False if this CSV was already written by the job"""
+        if csv_path in self._csv_done:
+            return False
+        try:
+            stat = os.stat(csv_path)
+        except FileNotFoundError:
+            stat = None
+
+        started = self._csv_started.get(csv_path)
+        if started is not None:
+            size, ino = started
+            # A rewrite replaces the file (new inode), so only an append can be half done
+            if stat is not None and (size < 0 or stat.st_ino != ino):
+                self.after_csv(csv_path)
+                return False
+            if stat is not None and stat.st_size > size:
+                with open(csv_path, 'r+b') as f:
+                    f.truncate(size)
+                stat = os.stat(csv_path)
+
+        if stat is None:
+            self._log({'csv': csv_path, 'size': -1, 'ino': -1})
+            self._csv_started[csv_path] = (-1, -1)
+        else:
+            self._log({'csv': csv_path, 'size': stat.st_size, 'ino': stat.st_ino})
+            self._csv_started[csv_path] = (stat.st_size, stat.st_ino)
+        return True
+
+    def after_csv(self, csv_path: str):
+        """CSVWriterPool hook: the CSV now holds every row of the job"""
+        self._log({'csv_done': csv_path})
+        self._csv_done.add(csv_path)
+
+    def finish(self):
+        """Mark the job finished and drop the record spool"""
+        self._log({'finished': datetime.datetime.now().isoformat()})
+        self.finished = True
+        self._spool.close()
+        self._spool = None
+        try:
+            os.remove(self.spool_path)
+        except OSError:
+            pass
+
+    def close(self):
+        """Commit what is complete and close the files (the job stays resumable)"""
+        if self._spool is not None:
+            if not self.extracted:
+                self.checkpoint()
+            self._spool.close()
+            self._spool = None
+        self._journal.close()
+
+    def discard(self):
+        """Close and delete the whole job directory"""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        self._journal.close()
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+
+def unfinished_jobs(jobs_dir: str = DEFAULT_JOBS_DIR) -> List[str]:
+    """Job directories under `jobs_dir` that were not finished, oldest first"""
+    try:
+        names = sorted(os.listdir(jobs_dir))
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        journal = os.path.join(jobs_dir, name, JOURNAL_NAME)
+        try:
+            with open(journal, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 4096))
+                tail = f.read().splitlines()
+        except OSError:
+            continue
+        if not tail or b'"finished"' not in tail[-1]:
+            found.append(os.path.join(jobs_dir, name))
+    return found
@@ -0,0 +1,190 @@
+"""Low-overhead per-stage timing, latency histograms and byte counters
+
+Instrumented code calls METRICS.start() before a stage and METRICS.stop()
+after it. When metrics are disabled start() returns None and stop() returns
+at once, so the cost is two method calls. When enabled, each sample
+updates a fixed-size log2 histogram keyed by (stage, extension); per file
+type and per extension breakdowns are built only when a summary is asked
+for. Worker processes ship their state back with export_state() and the
+parent folds it in with merge_state().
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+# Histogram bucket i holds samples shorter than 2**i microseconds
+_BUCKETS = 40
+
+
+class _Histogram:
+    """Count, total, max, bytes and log2 latency buckets for one key"""
+
+    __slots__ = ('count', 'total', 'max', 'bytes', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.bytes = 0
+        self.buckets = [0] * _BUCKETS
+
+    def add(self, seconds: float, nbytes: int):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.bytes += nbytes
+        self.buckets[min(_BUCKETS - 1, int(seconds * 1e6).bit_length())] += 1
+
+    def merge(self, other: '_Histogram'):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.bytes += other.bytes
+        for i, n in enumerate(other.buckets):
+            self.buckets[i] += n
+
+    def quantile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket holding the q-th sample"""
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(self.max, (1 << i) / 1e6)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        result = {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.quantile(0.50) * 1000, 3),
+            'p90_ms': round(self.quantile(0.90) * 1000, 3),
+            'p99_ms': round(self.quantile(0.99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+            'bytes': self.bytes,
+        }
+        if self.bytes and self.total > 0:
+            result['mb_per_sec'] = round(self.bytes / (1024 * 1024) / self.total, 2)
+        return result
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._started = time.perf_counter()
+
+    def start(self) -> Optional[float]:
+        """Begin timing a stage; None when metrics are off"""
+        return time.perf_counter() if self.enabled else None
+
+    def stop(self, token: Optional[float], stage: str, filepath: str = '', nbytes: int = 0):
+        """Record the stage started by `token` for a file (no-op when token is None)"""
+        if token is None:
+            return
+        self.record(stage, filepath, time.perf_counter() - token, nbytes)
+
+    def record(self, stage: str, filepath: str, seconds: float, nbytes: int = 0):
+        """Add one sample; the extension is taken from `filepath`"""
+        key = (stage, os.path.splitext(filepath)[1].lower())
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.add(seconds, nbytes)
+
+    def reset(self):
+        """Discard all samples and restart the run clock"""
+        with self._lock:
+            self._histograms = {}
+            self._started = time.perf_counter()
+
+    def export_state(self) -> Dict[Tuple[str, str], Tuple]:
+        """Picklable copy of the raw histograms (for worker processes)"""
+        with self._lock:
+            return {key: (h.count, h.total, h.max, h.bytes, list(h.buckets))
+                    for key, h in self._histograms.items()}
+
+    def merge_state(self, state: Dict[Tuple[str, str], Tuple]):
+        """Fold in histograms exported by another process"""
+        with self._lock:
+            for key, (count, total, peak, nbytes, buckets) in state.items():
+                other = _Histogram()
+                other.count, other.total, other.max, other.bytes, other.buckets = \
+                    count, total, peak, nbytes, buckets
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = _Histogram()
+                histogram.merge(other)
+
+    def totals(self) -> Dict[str, _Histogram]:
+        """Per-stage histograms across every extension"""
+        with self._lock:
+            items = list(self._histograms.items())
+        totals = {}
+        for (stage, _), histogram in items:
+            total = totals.get(stage)
+            if total is None:
+                total = totals[stage] = _Histogram()
+            total.merge(histogram)
+        return totals
+
+    def summary(self) -> Dict[str, Any]:
+        """Machine-readable report: per stage, then by file type and extension"""
+        from .core import MetadataExtractor
+
+        with self._lock:
+            items = list(self._histograms.items())
+        elapsed = time.perf_counter() - self._started
+
+        stages = {}
+        for (stage, ext), histogram in items:
+            entry = stages.get(stage)
+            if entry is None:
+                entry = stages[stage] = {'total': _Histogram(), 'by_type': {}, 'by_extension': {}}
+            entry['total'].merge(histogram)
+            file_type = MetadataExtractor.get_file_type_category('x' + ext)
+            entry['by_type'].setdefault(file_type, _Histogram()).merge(histogram)
+            entry['by_extension'][ext or '(none)'] = histogram
+
+        report = {'elapsed_seconds': round(elapsed, 3), 'stages': {}}
+        for stage, entry in stages.items():
+            result = entry['total'].summary()
+            result['by_type'] = {k: h.summary() for k, h in sorted(entry['by_type'].items())}
+            result['by_extension'] = {k: h.summary() for k, h in sorted(entry['by_extension'].items())}
+            report['stages'][stage] = result
+        return report
+
+    def format_line(self) -> str:
+        """One-line live view: mean latency (and MB/s) per stage"""
+        parts = []
+        for stage, histogram in sorted(self.totals().items()):
+            if not histogram.count:
+                continue
+            text = f"{stage} {histogram.count} x {histogram.total / histogram.count * 1000:.2f}ms"
+            if histogram.bytes and histogram.total > 0:
+                text += f" {histogram.bytes / (1024 * 1024) / histogram.total:.0f}MB/s"
+            parts.append(text)
+        return ' | '.join(parts)
+
+    def format_table(self) -> str:
+        """Per-stage table for the end-of-run report"""
+        lines = [f"{'stage':<16}{'count':>9}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}"
+                 f"{'p99 ms':>10}{'MB/s':>9}"]
+        for stage, histogram in sorted(self.totals().items()):
+            s = histogram.summary()
+            rate = f"{s['mb_per_sec']:.1f}" if 'mb_per_sec' in s else '-'
+            lines.append(f"{stage:<16}{s['count']:>9}{s['total_ms'] / 1000:>10.2f}{s['mean_ms']:>10.3f}"
+                         f"{s['p50_ms']:>10.3f}{s['p99_ms']:>10.3f}{rate:>9}")
+        return '\n'.join(lines)
+
+
+# Process-wide registry used by the instrumented stages
+METRICS = Metrics()
@@ -0,0 +1,353 @@
+"""Perceptual image hashes and near-duplicate search over them
+
+MD5/SHA digests only match byte-identical files; a photo that was
+resized, recompressed or re-saved by a messenger app gets a new digest.
+A perceptual hash summarises what an image looks like in 64 bits, so
+such copies end up a few bits apart:
+
+- aHash: 8x8 grayscale thumbnail, one bit per pixel brighter than the mean
+- dHash: 9x8 thumbnail, one bit per pixel darker than its right neighbour
+- pHash: 32x32 thumbnail, 2-D DCT, one bit per low-frequency coefficient
+  above their median (the most robust to recompression and gamma changes)
+
+All three come from one 32x32 grayscale thumbnail, so JPEGs are decoded
+in draft mode: libjpeg scales by 1/2 to 1/8 while decoding and the
+full-size image is never built. Hashes are 64-bit integers, written to
+records as 16 hex digits (perceptual_ahash, perceptual_dhash,
+perceptual_phash).
+
+Finding every pair within Hamming distance d among n hashes must not
+compare all n² pairs. HammingIndex uses multi-index hashing: the 64 bits
+are split into four 16-bit chunks, and two hashes within distance d
+differ in at most d // 4 bits of at least one chunk (pigeonhole). Each
+chunk is a lookup table, so only hashes with a nearly identical chunk are
+ever compared. With NumPy the lookups are sorted-array searches over the
+whole set at once and distances come from a vectorized popcount; without
+it the same scheme runs on dicts. Identical hashes are collapsed first,
+so a thousand copies of one image cost a single entry.
+"""
+
+import csv
+import math
+import os
+from itertools import combinations
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Sequence, Tuple
+
+from .backends import is_installed, load_numpy, load_pillow
+from .metrics import METRICS
+from .projection import PERCEPTUAL_PREFIX
+
+NUMPY_AVAILABLE = is_installed('numpy')
+
+ALGORITHMS = ('ahash', 'dhash', 'phash')
+DEFAULT_ALGORITHM = 'phash'
+
+HASH_BITS = 64
+
+# Side of the grayscale thumbnail every hash is computed from
+THUMBNAIL_SIZE = 32
+
+# Low-frequency DCT coefficients kept by pHash (LOW_FREQUENCIES² bits)
+LOW_FREQUENCIES = 8
+
+# Largest distance reported as a near duplicate by default (pHash: 0-6 is the same picture)
+DEFAULT_MAX_DISTANCE = 6
+
+DEFAULT_INDEX_NAME = 'near_duplicate_groups.csv'
+
+# Multi-index hashing: the hash is split into CHUNKS lookup keys of CHUNK_BITS each
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+# Candidate pairs checked per vectorized step; bounds the temporary arrays
+CANDIDATE_BATCH = 1 << 22
+
+# DCT-II basis rows for the low frequencies (constant scale factors do not change the bits)
+_DCT = [[math.cos(math.pi * k * (2 * n + 1) / (2 * THUMBNAIL_SIZE)) for n in range(THUMBNAIL_SIZE)]
+        for k in range(LOW_FREQUENCIES)]
+
+_popcount = getattr(int, 'bit_count', None) or (lambda value: bin(value).count('1'))
+_byte_popcounts = None
+
+
+def field_name(algorithm: str) -> str:
+    """Record key holding a perceptual hash, e.g. 'perceptual_phash'"""
+    return PERCEPTUAL_PREFIX + algorithm
+
+
+def format_hash(value: int) -> str:
+    return f'{value:016x}'
+
+
+def parse_hash(value: Any) -> Optional[int]:
+    """64-bit hash from its hex text (or an int); None if missing or malformed"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if 0 <= value < 1 << HASH_BITS else None
+    if not isinstance(value, str) or len(value) != HASH_BITS // 4:
+        return None
+    try:
+        return int(value, 16)
+    except ValueError:
+        return None
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return _popcount(a ^ b)
+
+
+# Hashing ------------------------------------------------------------------
+
+def _pack(bits: Iterable[bool]) -> int:
+    """Bits, most significant first, as an integer"""
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bit
+    return value
+
+
+def average_hash(pixels: bytes) -> int:
+    """aHash of 8x8 grayscale pixels (row-major)"""
+    mean = sum(pixels) / len(pixels)
+    return _pack(p > mean for p in pixels)
+
+
+def difference_hash(pixels: bytes, width: int = 9) -> int:
+    """dHash of 9x8 grayscale pixels (row-major)"""
+    return _pack(pixels[i + 1] > pixels[i] for i in range(len(pixels) - 1)
+                 if (i + 1) % width)
+
+
+def dct_hash(pixels: bytes) -> int:
+    """pHash of THUMBNAIL_SIZE² grayscale pixels (row-major)"""
+    size = THUMBNAIL_SIZE
+    rows = [pixels[start:start + size] for start in range(0, size * size, size)]
+    # Vertical frequencies first, then horizontal; only the low ones are ever computed
+    columns = [[sum(c * row[x] for c, row in zip(basis, rows)) for x in range(size)]
+               for basis in _DCT]
+    low = [sum(c * v for c, v in zip(basis, line)) for line in columns for basis in _DCT]
+    ordered = sorted(low)
+    middle = len(ordered) // 2
+    median = (ordered[middle - 1] + ordered[middle]) / 2
+    return _pack(v > median for v in low)
+
+
+def image_hashes(source: Any) -> Dict[str, int]:
+    """aHash, dHash and pHash of an image file (path or file object)"""
+    pillow = load_pillow()
+    if pillow is None:
+        raise RuntimeError('PIL/Pillow not available')
+    Image = pillow[0]
+    # Pillow 9.1 moved the filter constants to Image.Resampling
+    resampling = getattr(Image, 'Resampling', Image)
+    with Image.open(source) as img:
+        # JPEG: pick the smallest DCT scaling that still covers the thumbnail;
+        # other formats ignore the request
+        img.draft('L', (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        thumbnail = img.convert('L').resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), resampling.LANCZOS)
+    return {
+        'ahash': average_hash(thumbnail.resize((8, 8), resampling.BOX).tobytes()),
+        'dhash': difference_hash(thumbnail.resize((9, 8), resampling.BOX).tobytes()),
+        'phash': dct_hash(thumbnail.tobytes()),
+    }
+
+
+def perceptual_fields(filepath: str, source: Any = None) -> Dict[str, Any]:
+    """Record fields for an image; `source` (e.g. in-memory bytes) defaults to the path"""
+    if load_pillow() is None:
+        return {PERCEPTUAL_PREFIX + 'error': 'PIL/Pillow not available'}
+    timer = METRICS.start()
+    try:
+        hashes = image_hashes(filepath if source is None else source)
+    finally:
+        METRICS.stop(timer, 'perceptual', filepath)
+    return {field_name(name): format_hash(value) for name, value in hashes.items()}
+
+
+# Search -------------------------------------------------------------------
+
+def _chunk_masks(radius: int) -> List[int]:
+    """Every CHUNK_BITS-bit mask with at most `radius` bits set"""
+    masks = [0]
+    for count in range(1, min(radius, CHUNK_BITS) + 1):
+        for bits in combinations(range(CHUNK_BITS), count):
+            masks.append(sum(1 << bit for bit in bits))
+    return masks
+
+
+def _popcount_array(np, values):
+    """Set bits of every element of a uint64 array"""
+    global _byte_popcounts
+    if hasattr(np, 'bitwise_count'):  # NumPy 2.0+
+        return np.bitwise_count(values)
+    if _byte_popcounts is None:
+        _byte_popcounts = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    as_bytes = np.ascontiguousarray(values, dtype=np.uint64).view(np.uint8)
+    return _byte_popcounts[as_bytes].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+class HammingIndex:
+    """Multi-index hashing over 64-bit hashes: radius search without a full scan
+
+    `use_numpy` forces (True) or avoids (False) the vectorized path;
+    the default uses NumPy when it is installed.
+    """
+
+    def __init__(self, hashes: Sequence[int], use_numpy: Optional[bool] = None):
+        self.hashes = list(hashes)
+        self._np = load_numpy() if use_numpy is not False else None
+        if use_numpy and self._np is None:
+            raise RuntimeError("numpy not available: pip install numpy")
+        self._tables: Optional[List[Dict[int, List[int]]]] = None
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _build_tables(self) -> List[Dict[int, List[int]]]:
+        if self._tables is None:
+            tables = [{} for _ in range(CHUNKS)]
+            for position, value in enumerate(self.hashes):
+                for k, table in enumerate(tables):
+                    table.setdefault((value >> (k * CHUNK_BITS)) & CHUNK_MASK, []).append(position)
+            self._tables = tables
+        return self._tables
+
+    def query(self, value: int, max_distance: int) -> List[Tuple[int, int]]:
+        """(position, distance) of every stored hash within `max_distance` of `value`"""
+        masks = _chunk_masks(max_distance // CHUNKS)
+        hashes = self.hashes
+        found = {}
+        for k, table in enumerate(self._build_tables()):
+            key = (value >> (k * CHUNK_BITS)) & CHUNK_MASK
+            for mask in masks:
+                for position in table.get(key ^ mask, ()):
+                    if position not in found:
+                        found[position] = _popcount(value ^ hashes[position])
+        return sorted((position, distance) for position, distance in found.items()
+                      if distance <= max_distance)
+
+    def pairs(self, max_distance: int) -> Iterator[Tuple[int, int, int]]:
+        """Every (i, j, distance) with i < j and distance <= `max_distance`, each once"""
+        if self._np is not None:
+            yield from self._pairs_vectorized(max_distance)
+            return
+        for i, value in enumerate(self.hashes):
+            for j, distance in self.query(value, max_distance):
+                if j > i:
+                    yield i, j, distance
+
+    def _pairs_vectorized(self, max_distance: int) -> Iterator[Tuple[int, int, int]]:
+        np = self._np
+        values = np.array(self.hashes, dtype=np.uint64)
+        n = len(values)
+        radius = max_distance // CHUNKS
+        chunk_mask = np.uint64(CHUNK_MASK)
+        keys = [((values >> np.uint64(k * CHUNK_BITS)) & chunk_mask).astype(np.int64)
+                for k in range(CHUNKS)]
+        positions = np.arange(n)
+
+        for k in range(CHUNKS):
+            order = np.argsort(keys[k], kind='stable')
+            sorted_keys = keys[k][order]
+            for mask in _chunk_masks(radius):
+                probe = keys[k] ^ mask
+                lo = np.searchsorted(sorted_keys, probe, 'left')
+                counts = np.searchsorted(sorted_keys, probe, 'right') - lo
+                ends = np.cumsum(counts)
+                start = 0
+                while start < n:
+                    # Rows [start, stop) whose candidates fit in one batch (at least one row)
+                    base = int(ends[start - 1]) if start else 0
+                    stop = max(int(np.searchsorted(ends, base + CANDIDATE_BATCH, 'right')),
+                               start + 1)
+                    block = counts[start:stop]
+                    total = int(ends[stop - 1]) - base
+                    if total:
+                        rows = np.repeat(positions[start:stop], block)
+                        first = lo[start:stop] - (ends[start:stop] - block - base)
+                        cols = order[np.repeat(first, block) + np.arange(total)]
+                        keep = cols > rows
+                        rows, cols = rows[keep], cols[keep]
+                        diff = values[rows] ^ values[cols]
+                        distances = _popcount_array(np, diff)
+                        keep = distances <= max_distance
+                        # A pair close in several chunks is reported by the first of them only
+                        for earlier in range(k):
+                            chunk = (diff >> np.uint64(earlier * CHUNK_BITS)) & chunk_mask
+                            keep &= _popcount_array(np, chunk) > radius
+                        for i, j, distance in zip(rows[keep].tolist(), cols[keep].tolist(),
+                                                  distances[keep].tolist()):
+                            yield i, j, distance
+                    start = stop
+
+
+class SimilarGroup:
+    """Images whose perceptual hashes are linked by near-duplicate pairs"""
+
+    __slots__ = ('paths', 'hashes')
+
+    def __init__(self, paths: List[str], hashes: List[int]):
+        self.paths = paths
+        self.hashes = hashes
+
+    def distances(self) -> List[int]:
+        """Distance of every member to the first one"""
+        first = self.hashes[0]
+        return [hamming_distance(first, value) for value in self.hashes]
+
+
+def find_near_duplicates(entries: Iterable[Tuple[str, int]],
+                         max_distance: int = DEFAULT_MAX_DISTANCE,
+                         use_numpy: Optional[bool] = None) -> List[SimilarGroup]:
+    """Group (filepath, hash) entries within `max_distance` of each other; largest first
+
+    Groups are connected components: A and C share a group when A is
+    close to B and B to C, even if A and C are further apart.
+    """
+    by_hash: Dict[int, List[str]] = {}
+    for filepath, value in entries:
+        by_hash.setdefault(value, []).append(filepath)
+    distinct = list(by_hash)
+
+    parent = list(range(len(distinct)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    timer = METRICS.start()
+    for i, j, _ in HammingIndex(distinct, use_numpy).pairs(max_distance):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    METRICS.stop(timer, 'near_duplicate_search')
+
+    members: Dict[int, List[int]] = {}
+    for i in range(len(distinct)):
+        members.setdefault(find(i), []).append(i)
+    groups = []
+    for component in members.values():
+        files = sorted((path, distinct[i]) for i in component for path in by_hash[distinct[i]])
+        if len(files) > 1:
+            groups.append(SimilarGroup([path for path, _ in files], [value for _, value in files]))
+    groups.sort(key=lambda g: (-len(g.paths), g.paths[0]))
+    return groups
+
+
+def write_similar_index(groups: Iterable[SimilarGroup], path: str,
+                        algorithm: str = DEFAULT_ALGORITHM) -> int:
+    """Write groups as CSV (one row per file); returns the number of groups"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['group_id', 'members', field_name(algorithm), 'distance', 'filepath'])
+        for count, group in enumerate(groups, 1):
+            for filepath, value, distance in zip(group.paths, group.hashes, group.distances()):
+                writer.writerow([count, len(group.paths), format_hash(value), distance, filepath])
+    os.replace(tmp_path, path)
+    return count
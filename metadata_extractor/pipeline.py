@@ -0,0 +1,301 @@
+"""Staged streaming pipeline: discover -> stat -> read/hash -> parse -> sink
+
+Each stage runs on its own threads and hands work to the next through a
+bounded queue, so slow disk reads overlap with header parsing and a stalled
+consumer throttles discovery instead of letting memory grow. The hashing
+stage keeps the first bytes of each file and the parse stage hands them to
+the type sniffer and the EXIF/container parsers, so most files are opened
+exactly once.
+
+With a DeviceScheduler (iosched.py) the queue in front of the hashing
+stage is replaced by per-device queues, so files on a fast SSD and a
+slow hard disk are read side by side, each with its own adaptive
+number of reads in flight.
+"""
+
+import os
+import queue
+import threading
+from typing import TYPE_CHECKING, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from .batch import iter_files
+from .cache import ExtractionCache
+from .core import PARSE_HEADER_SIZE, MetadataExtractor, read_header
+from .hashing import DEFAULT_ALGORITHMS, FileHasher
+from .iosched import DeviceScheduler
+from .metrics import METRICS
+from .projection import FULL_PROJECTION, Projection
+
+if TYPE_CHECKING:
+    from .hashsets import KnownFiles
+
+# Capacity of each inter-stage queue
+DEFAULT_QUEUE_SIZE = 64
+
+# How often blocked workers re-check for cancellation (seconds)
+_POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+class _Item:
+    """One file travelling through the pipeline"""
+
+    __slots__ = ('seq', 'filepath', 'stat', 'digests', 'header', 'record')
+
+    def __init__(self, seq: int, filepath: str):
+        self.seq = seq
+        self.filepath = filepath
+        self.stat = None
+        self.digests = None
+        self.header = None
+        self.record = None  # set once the item is finished (result, cache hit or error)
+
+
+class _Stage:
+    """A worker pool between two queues"""
+
+    def __init__(self, name: str, func: Callable[[_Item], None], workers: int):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.remaining = self.workers
+        self.lock = threading.Lock()
+
+
+class StagedPipeline:
+    """Extract metadata through discover/stat/hash/parse stages
+
+    Worker counts are per stage: hashing is I/O bound (hashlib releases the
+    GIL on large buffers), parsing is mostly CPU. At most `max_in_flight`
+    files are between discovery and the consumer at any time; the loop
+    iterating run() is the sink stage. Results arrive in completion order
+    unless `ordered` is set. With an `io_scheduler` the hash stage runs
+    its max_concurrency threads and reads are scheduled per device.
+    """
+
+    def __init__(self, stat_workers: int = 2, hash_workers: int = 4, parse_workers: int = 2,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, max_in_flight: Optional[int] = None,
+                 ordered: bool = False, hash_algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+                 cache: Optional[ExtractionCache] = None, deep_media: bool = False,
+                 projection: Projection = FULL_PROJECTION,
+                 known_files: Optional['KnownFiles'] = None,
+                 io_scheduler: Optional[DeviceScheduler] = None):
+        self.hasher = FileHasher(hash_algorithms)
+        self.projection = projection
+        self.known_files = known_files
+        # Digests a record carries (none when the projection skips hashing)
+        self.hash_algorithms = self.hasher.algorithms if projection.hashes else ()
+        self.queue_size = max(1, queue_size)
+        self.io_scheduler = io_scheduler
+        if max_in_flight:
+            self.max_in_flight = max_in_flight
+        elif io_scheduler is not None:
+            # Files waiting for their device hold no header yet; a wider window
+            # lets every device's files reach the scheduler
+            self.max_in_flight = self.queue_size * 16
+        else:
+            self.max_in_flight = self.queue_size * 4
+        self.ordered = ordered
+        self.deep_media = deep_media
+        self.cache = cache
+        self.cache_profile = ('deep' if deep_media else '') + projection.profile
+        if known_files is not None:
+            self.cache_profile += known_files.profile
+        # Lookups and stores run on different stage threads; SQLite sees one at a time
+        self._cache_lock = threading.Lock()
+        self.stages = [
+            _Stage('stat', self._stat, stat_workers),
+            _Stage('hash', self._hash,
+                   io_scheduler.max_concurrency if io_scheduler is not None else hash_workers),
+            _Stage('parse', self._parse, parse_workers),
+        ]
+
+    # Stage functions ---------------------------------------------------
+
+    def _stat(self, item: _Item):
+        """Stat the file and resolve cache hits"""
+        timer = METRICS.start()
+        try:
+            item.stat = os.stat(item.filepath)
+        except OSError:
+            item.record = {'filepath': item.filepath, 'error': f'File not found: {item.filepath}'}
+            return
+        METRICS.stop(timer, 'stat', item.filepath)
+        if self.cache is not None:
+            with self._cache_lock:
+                item.record = self.cache.lookup(item.filepath, self.hash_algorithms,
+                                                item.stat, self.cache_profile)
+
+    def _hash(self, item: _Item):
+        """Hash the file in one read pass, keeping its header for sniffing and parsing
+
+        Every file keeps its header (the extension may be lying), so at most
+        max_in_flight * PARSE_HEADER_SIZE bytes of headers are held at once.
+        Without hashes only the header is read, or nothing at all.
+        """
+        if self.io_scheduler is None:
+            self._read(item)
+            return
+        try:
+            self._read(item, self.io_scheduler.throttle(item))
+        finally:
+            nbytes = item.stat.st_size if self.projection.hashes else len(item.header or b'')
+            self.io_scheduler.done(item, nbytes)
+
+    def _read(self, item: _Item, throttle=None):
+        if not self.projection.hashes:
+            item.digests = {}
+            if self.projection.detect_type:
+                item.header = read_header(item.filepath)
+            return
+        try:
+            item.digests, item.header = self.hasher.hash_file_header(
+                item.filepath, PARSE_HEADER_SIZE, binary=True, throttle=throttle)
+        except Exception as e:
+            item.digests = {name: f"Error: {str(e)}" for name in self.hash_algorithms}
+
+    def _parse(self, item: _Item):
+        """Build the record (same keys as extract_all_metadata) and cache it"""
+        metadata = MetadataExtractor.extract_stat_metadata(item.filepath, item.stat)
+        if self.hash_algorithms:
+            metadata.set_digests(self.hash_algorithms, tuple(item.digests.values()))
+        metadata.mark_extracted()
+        # Known-good files keep their stat fields and digests only
+        known = self.known_files is not None and self.known_files.tag(metadata)
+        if self.projection.detect_type:
+            ext = MetadataExtractor.detect_file_type(metadata, item.header)
+            if self.projection.runs_plugins and known != 'good':
+                metadata.update(MetadataExtractor.extract_type_metadata(
+                    item.filepath, metadata['file_type'], ext, self.deep_media,
+                    item.header, item.stat.st_size, self.projection.plugins))
+        item.header = None
+
+        if self.cache is not None:
+            with self._cache_lock:
+                self.cache.store(item.filepath, metadata, item.stat, self.cache_profile)
+        item.record = metadata
+
+    # Plumbing -----------------------------------------------------------
+
+    def _put(self, q: queue.Queue, item, stop: threading.Event) -> bool:
+        """Blocking put that gives up once the run is cancelled"""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue, stop: threading.Event):
+        """Blocking get that returns None once the run is cancelled"""
+        while not stop.is_set():
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+
+    def _worker(self, stage: _Stage, inbox: queue.Queue, outbox: queue.Queue,
+                downstream: int, stop: threading.Event):
+        """Run one stage function until the upstream stage is exhausted"""
+        while True:
+            item = self._get(inbox, stop)
+            if item is None:
+                return
+            if item is _DONE:
+                break
+            if item.record is None:  # finished items pass straight through
+                try:
+                    stage.func(item)
+                except Exception as e:
+                    item.record = {'filepath': item.filepath,
+                                   'error': f"Extraction failed: {str(e)}"}
+            if not self._put(outbox, item, stop):
+                return
+
+        # The last worker of a stage tells every downstream worker to finish
+        with stage.lock:
+            stage.remaining -= 1
+            last = stage.remaining == 0
+        if last:
+            for _ in range(downstream):
+                self._put(outbox, _DONE, stop)
+
+    def _discover(self, files: Iterable[str], outbox: queue.Queue, downstream: int,
+                  slots: threading.Semaphore, stop: threading.Event, errors: list):
+        """Feed paths into the first stage, at most max_in_flight at a time
+
+        An exception from `files` is appended to `errors` for run() to
+        re-raise once the files before it have gone through.
+        """
+        try:
+            for seq, filepath in enumerate(files):
+                while not slots.acquire(timeout=_POLL_INTERVAL):
+                    if stop.is_set():
+                        return
+                if not self._put(outbox, _Item(seq, filepath), stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for _ in range(downstream):
+                self._put(outbox, _DONE, stop)
+
+    def run(self, files: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Yield one metadata dict per input file"""
+        stop = threading.Event()
+        slots = threading.Semaphore(self.max_in_flight)
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        if self.io_scheduler is not None:
+            self.io_scheduler.clear()
+            queues[1] = self.io_scheduler  # between the stat and hash stages
+        for stage in self.stages:
+            stage.remaining = stage.workers
+
+        errors = []
+        threads = [threading.Thread(target=self._discover, name='discover', daemon=True,
+                                    args=(files, queues[0], self.stages[0].workers, slots, stop,
+                                          errors))]
+        for index, stage in enumerate(self.stages):
+            downstream = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._worker, name=f'{stage.name}-{n}', daemon=True,
+                    args=(stage, queues[index], queues[index + 1], downstream, stop)))
+        for thread in threads:
+            thread.start()
+
+        results = queues[-1]
+        reorder = {}
+        next_seq = 0
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    if errors:
+                        # A failing input (e.g. an unreadable directory) must not look
+                        # like a complete run
+                        raise errors[0]
+                    break
+                if not self.ordered:
+                    slots.release()
+                    yield item.record
+                    continue
+                reorder[item.seq] = item.record
+                while next_seq in reorder:
+                    slots.release()
+                    yield reorder.pop(next_seq)
+                    next_seq += 1
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def run_paths(self, paths: Iterable[str], recursive: bool = True,
+                  on_error: Optional[Callable[[str, Exception], None]] = None,
+                  exclude_names: Iterable[str] = ()) -> Iterator[Dict[str, Any]]:
+        """Walk files and directories (on the discover thread) and extract them"""
+        return self.run(iter_files(paths, recursive=recursive, on_error=on_error,
+                                   exclude_names=exclude_names))
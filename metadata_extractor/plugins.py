@@ -0,0 +1,122 @@
+"""Registry of type-specific extractor plugins
+
+A plugin is a callable `func(filepath, header=None, size=None,
+deep_media=False) -> dict` registered for one or more file types
+('image', 'video', 'audio', 'document', 'other'), optionally limited to
+some extensions. extract_type_metadata() runs every plugin that matches a
+file and merges their fields in registration order. The built-in image
+and media extractors are registered by core.py; backends they need are
+only imported once a matching file is seen.
+
+Plugins registered with default=False are opt-in: they only run when a
+projection names them (e.g. the perceptual image hashes, which decode
+every image).
+
+Process-pool workers import the package afresh, so register third-party
+plugins at import time of a module the workers also import.
+"""
+
+import threading
+from typing import Dict, Any, Callable, Iterable, List, Mapping, Optional
+
+Extractor = Callable[..., Dict[str, Any]]
+
+
+class ExtractorPlugin:
+    """One registered extractor"""
+
+    __slots__ = ('name', 'file_types', 'extensions', 'func', 'default')
+
+    def __init__(self, name: str, file_types: Iterable[str], func: Extractor,
+                 extensions: Optional[Iterable[str]] = None, default: bool = True):
+        self.name = name
+        self.file_types = frozenset(file_types)
+        self.extensions = frozenset(e.lower() for e in extensions) if extensions is not None else None
+        self.func = func
+        self.default = default
+
+    def matches(self, file_type: str, ext: str) -> bool:
+        return file_type in self.file_types and (self.extensions is None or ext in self.extensions)
+
+
+class ExtractorRegistry:
+    """Plugins keyed by file type"""
+
+    def __init__(self):
+        self._plugins = []
+        self._by_type = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, file_types: Iterable[str], func: Extractor,
+                 extensions: Optional[Iterable[str]] = None,
+                 default: bool = True) -> ExtractorPlugin:
+        """Add (or replace, by name) a plugin; default=False makes it opt-in"""
+        plugin = ExtractorPlugin(name, file_types, func, extensions, default)
+        with self._lock:
+            self._plugins = [p for p in self._plugins if p.name != name] + [plugin]
+            self._rebuild()
+        return plugin
+
+    def unregister(self, name: str) -> bool:
+        """Remove a plugin; returns False if it was not registered"""
+        with self._lock:
+            count = len(self._plugins)
+            self._plugins = [p for p in self._plugins if p.name != name]
+            self._rebuild()
+            return len(self._plugins) != count
+
+    def _rebuild(self):
+        by_type = {}
+        for plugin in self._plugins:
+            for file_type in plugin.file_types:
+                by_type.setdefault(file_type, []).append(plugin)
+        self._by_type = by_type
+
+    def plugins(self) -> List[ExtractorPlugin]:
+        """All plugins in registration order"""
+        return list(self._plugins)
+
+    def extractors_for(self, file_type: str, ext: str) -> List[ExtractorPlugin]:
+        """Plugins that apply to a file of this type and extension"""
+        return [p for p in self._by_type.get(file_type, ()) if p.matches(file_type, ext)]
+
+    def extract(self, filepath: str, file_type: str, ext: str,
+                only: Optional[Mapping[str, Optional[Callable[[str], bool]]]] = None,
+                **context) -> Dict[str, Any]:
+        """Run every matching plugin; a failing plugin reports '<name>_error'
+
+        `only` limits the run to the named plugins, each with an optional
+        predicate choosing which of its fields to keep (see projection.py);
+        without it every default plugin runs.
+        """
+        metadata = {}
+        for plugin in self.extractors_for(file_type, ext.lower()):
+            keep = None
+            if only is None:
+                if not plugin.default:
+                    continue
+            else:
+                if plugin.name not in only:
+                    continue
+                keep = only[plugin.name]
+            try:
+                fields = plugin.func(filepath, **context)
+            except Exception as e:
+                metadata[f'{plugin.name}_error'] = str(e)
+                continue
+            if keep is not None:
+                fields = {key: value for key, value in fields.items() if keep(key)}
+            metadata.update(fields)
+        return metadata
+
+
+REGISTRY = ExtractorRegistry()
+
+
+def register_extractor(name: str, file_types: Iterable[str],
+                       extensions: Optional[Iterable[str]] = None, default: bool = True):
+    """Decorator form of REGISTRY.register"""
+    def decorator(func: Extractor) -> Extractor:
+        REGISTRY.register(name, file_types, func, extensions, default)
+        return func
+    return decorator
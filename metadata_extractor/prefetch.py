@@ -0,0 +1,64 @@
+"""File objects that reuse header bytes already read by an earlier stage"""
+
+import os
+from typing import Optional
+
+
+class PrefetchedFile:
+    """Read-only, seekable file served from an in-memory header
+
+    Reads that fall inside `header` never touch the disk; the real file is
+    only opened when a parser seeks past it (e.g. an MP4 'moov' box at the
+    end of the file). If the header is the whole file it is never opened.
+    """
+
+    def __init__(self, filepath: str, header: bytes, size: Optional[int] = None):
+        self.filepath = filepath
+        self.header = header
+        self.size = size if size is not None else os.stat(filepath).st_size
+        self.opened = False
+        self._file = None
+        self._pos = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Move the read position like io.RawIOBase.seek"""
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        """Current read position"""
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        """Read from the header when possible, otherwise from the file"""
+        if size is None or size < 0:
+            size = max(0, self.size - self._pos)
+        end = self._pos + size
+        if end <= len(self.header) or len(self.header) >= self.size:
+            data = self.header[self._pos:end]
+        else:
+            if self._file is None:
+                self._file = open(self.filepath, 'rb')
+                self.opened = True
+            self._file.seek(self._pos)
+            data = self._file.read(size)
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        """Close the underlying file if it was ever opened"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,216 @@
+"""Field selection: run only the reads and extractors the requested columns need
+
+A full record costs a complete read of the file (hashes), a header read
+(type sniffing) and one or more parser passes (EXIF, media tracks). A
+triage run that only wants sizes and timestamps needs none of that: the
+stat fields come from a single os.stat call. plan_projection() turns a
+list of field groups and/or column names into a Projection, which the
+extraction engines consult to decide:
+
+- whether to hash the file (whole-file read) or only read its header
+- whether to sniff the content type
+- which extractor plugins to run, and which of their fields to keep
+
+The basic stat fields are always present; they cost nothing extra.
+Opt-in groups such as 'perceptual' (image similarity hashes, a decode of
+every image) are never part of "everything"; they run only when named
+in the fields or passed as `include`.
+"""
+
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from .plugins import REGISTRY
+from .record import STAT_KEYS
+
+BASIC_FIELDS = STAT_KEYS + ('extraction_timestamp',)
+TYPE_FIELDS = ('claimed_type', 'detected_type', 'detected_format', 'type_mismatch')
+IMAGE_FIELDS = ('image_width', 'image_height', 'image_mode', 'image_format', 'has_transparency')
+PERCEPTUAL_PREFIX = 'perceptual_'
+
+# MediaInfo track types used as field prefixes
+MEDIA_PREFIXES = ('general_', 'video_', 'audio_', 'text_', 'menu_', 'other_')
+
+# Group -> (plugin that produces it, exact field names, field prefixes);
+# 'basic', 'hashes' and 'type' are produced by the engines themselves
+GROUPS: Dict[str, Tuple[Optional[str], Tuple[str, ...], Tuple[str, ...]]] = {
+    'basic': (None, BASIC_FIELDS, ()),
+    'hashes': (None, (), ()),
+    'type': (None, TYPE_FIELDS, ()),
+    'image': ('image', IMAGE_FIELDS, ()),
+    'exif': ('image', ('exif_status',), ('exif_',)),
+    'media': ('media', (), MEDIA_PREFIXES),
+    'perceptual': ('perceptual', (), (PERCEPTUAL_PREFIX,)),
+}
+
+
+class FieldFilter:
+    """Keeps the selected fields of one plugin's output (and its error fields)"""
+
+    __slots__ = ('names', 'prefixes')
+
+    def __init__(self, names: Iterable[str] = (), prefixes: Iterable[str] = ()):
+        self.names = frozenset(names)
+        self.prefixes = tuple(prefixes)
+
+    def __call__(self, key: str) -> bool:
+        return key in self.names or key.startswith(self.prefixes) or key.endswith('_error')
+
+    def __eq__(self, other):
+        return (isinstance(other, FieldFilter) and self.names == other.names
+                and set(self.prefixes) == set(other.prefixes))
+
+    def describe(self) -> str:
+        return '|'.join(sorted(self.names) + sorted(prefix + '*' for prefix in self.prefixes))
+
+    def __repr__(self):
+        return f"FieldFilter({sorted(self.names)!r}, {sorted(self.prefixes)!r})"
+
+
+class Projection:
+    """What to compute for each record
+
+    `plugins` maps plugin name to a FieldFilter (None keeps every field);
+    None instead of a mapping runs every default (not opt-in) plugin
+    unfiltered.
+    """
+
+    __slots__ = ('hashes', 'detect_type', 'plugins')
+
+    def __init__(self, hashes: bool = True, detect_type: bool = True,
+                 plugins: Optional[Dict[str, Optional[FieldFilter]]] = None):
+        self.hashes = hashes
+        # Plugins are dispatched on the sniffed type, so they imply type detection
+        self.detect_type = detect_type or bool(plugins is None or plugins)
+        self.plugins = plugins
+
+    @property
+    def is_full(self) -> bool:
+        return self.hashes and self.plugins is None
+
+    @property
+    def reads_header(self) -> bool:
+        """True if the file must be opened at all"""
+        return self.hashes or self.detect_type
+
+    @property
+    def runs_plugins(self) -> bool:
+        return self.plugins is None or bool(self.plugins)
+
+    @property
+    def profile(self) -> str:
+        """Stable description, used to keep cached partial records apart"""
+        if self.is_full:
+            return ''
+        parts = ['hashes'] if self.hashes else []
+        if self.detect_type:
+            parts.append('type')
+        if self.plugins is None:
+            parts.append('plugins')
+        else:
+            for name in sorted(self.plugins):
+                keep = self.plugins[name]
+                parts.append(name if keep is None else f'{name}[{keep.describe()}]')
+        return 'fields:' + ','.join(parts)
+
+    def __repr__(self):
+        return (f"Projection(hashes={self.hashes}, detect_type={self.detect_type}, "
+                f"plugins={self.plugins!r})")
+
+
+FULL_PROJECTION = Projection()
+
+
+def _group_of(field: str) -> Optional[str]:
+    """Group producing a column name, or None if no known group does"""
+    if field.endswith('_hash'):
+        return 'hashes'
+    for group, (_, names, prefixes) in GROUPS.items():
+        if field in names or (prefixes and field.startswith(prefixes)):
+            return group
+    return None
+
+
+def plan_projection(fields: Optional[Iterable[str]] = None, exclude: Iterable[str] = (),
+                    include: Iterable[str] = ()) -> Projection:
+    """Projection for field groups and/or column names
+
+    Entries may be group names (basic, hashes, type, image, exif, media,
+    perceptual), names of registered extractor plugins, or single columns
+    such as 'exif_Model' or 'image_width'. None selects everything except
+    opt-in groups; `include` adds groups or columns to the selection and
+    groups in `exclude` are removed afterwards. Raises ValueError for
+    names that no group produces.
+    """
+    excluded = set(exclude)
+    for name in excluded:
+        if name not in GROUPS:
+            raise ValueError(f"Unknown field group: {name}")
+    included = [name for name in include if name not in excluded]
+
+    groups = set()
+    # Plugin -> requested (names, prefixes); None once a plugin's whole output is wanted
+    selected: Dict[str, Any] = {}
+    plugin_names = {p.name for p in REGISTRY.plugins()}
+
+    if fields is None:
+        if not excluded and not included:
+            return FULL_PROJECTION
+        if excluded & {'image', 'exif', 'media'}:
+            fields = default_group_names()
+        elif not included:
+            return Projection(hashes='hashes' not in excluded, plugins=None)
+        else:
+            # Everything plus opt-in groups: every default plugin runs unfiltered
+            groups.update(('hashes', 'type'))
+            selected.update((p.name, None) for p in REGISTRY.plugins() if p.default)
+            fields = ()
+    fields = list(fields) + included
+
+    def want(plugin: str, names: Iterable[str], prefixes: Iterable[str]):
+        if plugin in selected and selected[plugin] is None:
+            return
+        current = selected.setdefault(plugin, (set(), set()))
+        current[0].update(names)
+        current[1].update(prefixes)
+
+    for field in fields:
+        field = field.strip()
+        if not field or field in excluded:
+            continue
+        if field in GROUPS:
+            groups.add(field)
+            plugin, names, prefixes = GROUPS[field]
+            if plugin is None:
+                continue
+            if field == 'media':
+                selected[plugin] = None  # MediaInfo track types are open-ended
+            else:
+                want(plugin, names, prefixes)
+        elif field in plugin_names:
+            selected[field] = None
+        else:
+            group = _group_of(field)
+            if group is None:
+                raise ValueError(f"Unknown field or group: {field}")
+            groups.add(group)
+            plugin = GROUPS[group][0]
+            if plugin is not None:
+                want(plugin, (field,), ())
+
+    plugins = {name: None if wanted is None else FieldFilter(*wanted)
+               for name, wanted in selected.items()}
+    return Projection(hashes='hashes' in groups and 'hashes' not in excluded,
+                      detect_type='type' in groups, plugins=plugins)
+
+
+def group_names() -> Tuple[str, ...]:
+    """Every name plan_projection() accepts as a group"""
+    extra = tuple(p.name for p in REGISTRY.plugins() if p.name not in GROUPS)
+    return tuple(GROUPS) + extra
+
+
+def default_group_names() -> Tuple[str, ...]:
+    """Groups that make up "everything": all but those of opt-in plugins"""
+    optional = {p.name for p in REGISTRY.plugins() if not p.default}
+    return tuple(name for name in group_names()
+                 if name not in optional and GROUPS.get(name, (name,))[0] not in optional)
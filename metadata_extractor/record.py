@@ -0,0 +1,224 @@
+"""Compact per-file record that formats its fixed fields on demand
+
+Extraction used to build a dict of ready-formatted strings for every
+file: three ISO timestamps, size_mb, octal permissions, hex digests and
+an extraction timestamp. On multi-million file runs those strings are
+most of the resident memory and of the pickling work between processes.
+FileRecord keeps the raw values instead (integer nanosecond timestamps,
+st_mode, binary digests) in __slots__ and renders them only when a sink
+reads them. Variable fields (EXIF tags, track fields, detection results)
+live in a plain dict whose keys are interned, so a million records share
+one copy of every key name.
+
+FileRecord is a MutableMapping with exactly the keys, order and values
+the dict records had, so callers keep using record['modified'],
+record.get(...), `in` and update(); json needs to_dict() (see as_dict).
+"""
+
+import datetime
+import os
+import sys
+import time
+from collections.abc import MutableMapping
+from typing import Dict, Any, Iterator, Optional, Sequence, Tuple, Union
+
+# Keys before the digests, in the order extract_stat_metadata always used
+STAT_KEYS = ('filename', 'filepath', 'directory', 'extension', 'file_type', 'size_bytes',
+             'size_mb', 'created', 'modified', 'accessed', 'permissions')
+
+_interned: Dict[Any, str] = {}
+
+
+def intern_key(name: str) -> str:
+    """Shared copy of a field name"""
+    key = _interned.get(name)
+    if key is None:
+        key = _interned[name] = sys.intern(name)
+    return key
+
+
+def prefixed_key(prefix: str, name: Any) -> str:
+    """Interned '<prefix>_<name>' without building the string again on every file"""
+    key = _interned.get((prefix, name))
+    if key is None:
+        key = _interned[(prefix, name)] = intern_key(f'{prefix}_{name}')
+    return key
+
+
+def hash_keys(algorithms: Sequence[str]) -> Tuple[str, ...]:
+    """Interned '<algorithm>_hash' keys for a tuple of algorithm names"""
+    keys = _interned.get(('hash', algorithms))
+    if keys is None:
+        keys = _interned[('hash', algorithms)] = tuple(
+            intern_key(f'{name}_hash') for name in algorithms)
+    return keys
+
+
+def format_timestamp(ns: int) -> str:
+    """ISO local time of a nanosecond timestamp, identical to fromtimestamp(st_mtime)"""
+    # os.stat computes st_mtime as sec + nsec * 1e-9; repeat that exactly
+    seconds, nanoseconds = divmod(ns, 1000000000)
+    return datetime.datetime.fromtimestamp(seconds + nanoseconds * 1e-9).isoformat()
+
+
+def _digest_text(digest: Union[bytes, str]) -> str:
+    # Failed hashes are kept as their 'Error: ...' string
+    return digest.hex() if isinstance(digest, bytes) else digest
+
+
+# Fixed keys rendered from the slots
+_GETTERS = {
+    'filename': lambda r: os.path.basename(r.filepath),
+    'filepath': lambda r: r.filepath,
+    'directory': lambda r: r.directory,
+    'extension': lambda r: r.extension,
+    'file_type': lambda r: r.file_type,
+    'size_bytes': lambda r: r.size,
+    'size_mb': lambda r: round(r.size / (1024 * 1024), 2),
+    'created': lambda r: format_timestamp(r.ctime_ns),
+    'modified': lambda r: format_timestamp(r.mtime_ns),
+    'accessed': lambda r: format_timestamp(r.atime_ns),
+    'permissions': lambda r: oct(r.mode)[-3:],
+}
+
+# Fixed keys that can be reassigned (anything else assigned goes to `extra`)
+_SETTERS = {
+    'filepath': 'filepath',
+    'directory': 'directory',
+    'extension': 'extension',
+    'file_type': 'file_type',
+    'size_bytes': 'size',
+}
+
+
+class FileRecord(MutableMapping):
+    """Metadata record of one file: raw stat fields and digests plus variable fields"""
+
+    __slots__ = ('filepath', 'directory', 'extension', 'file_type', 'size', 'ctime_ns',
+                 'mtime_ns', 'atime_ns', 'mode', 'algorithms', 'digests', 'extracted_ns',
+                 'extra')
+
+    def __init__(self, filepath: str, directory: str, extension: str, file_type: str,
+                 stat: Optional[os.stat_result] = None):
+        self.filepath = filepath
+        self.directory = directory
+        self.extension = intern_key(extension)
+        self.file_type = intern_key(file_type)
+        if stat is not None:
+            self.size = stat.st_size
+            self.ctime_ns = stat.st_ctime_ns
+            self.mtime_ns = stat.st_mtime_ns
+            self.atime_ns = stat.st_atime_ns
+            self.mode = stat.st_mode
+        self.algorithms = ()
+        self.digests = ()
+        self.extracted_ns = None
+        self.extra = {}
+
+    def set_digests(self, algorithms: Sequence[str], digests: Sequence[Union[bytes, str]]):
+        """Attach digests (raw bytes, or hex/error strings) in algorithm order"""
+        self.algorithms = hash_keys(tuple(algorithms))
+        self.digests = tuple(digests)
+
+    def mark_extracted(self, ns: Optional[int] = None):
+        """Set extraction_timestamp (now unless given, in nanoseconds)"""
+        self.extracted_ns = time.time_ns() if ns is None else ns
+
+    def digest(self, algorithm: str) -> Optional[bytes]:
+        """Raw digest for an algorithm; None if missing or failed"""
+        key = f'{algorithm}_hash'
+        for name, value in zip(self.algorithms, self.digests):
+            if name == key:
+                return value if isinstance(value, bytes) else None
+        return None
+
+    # Mapping interface -----------------------------------------------------
+
+    def __getitem__(self, key: str) -> Any:
+        extra = self.extra
+        if key in extra:
+            return extra[key]
+        getter = _GETTERS.get(key)
+        if getter is not None:
+            return getter(self)
+        if key == 'extraction_timestamp' and self.extracted_ns is not None:
+            return format_timestamp(self.extracted_ns)
+        for name, value in zip(self.algorithms, self.digests):
+            if name == key:
+                return _digest_text(value)
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return (key in _GETTERS or key in self.extra or key in self.algorithms
+                or (key == 'extraction_timestamp' and self.extracted_ns is not None))
+
+    def _own_keys(self) -> Tuple[str, ...]:
+        keys = STAT_KEYS + self.algorithms
+        if self.extracted_ns is not None:
+            keys += ('extraction_timestamp',)
+        return keys
+
+    def __iter__(self) -> Iterator[str]:
+        own = self._own_keys()
+        yield from own
+        for key in self.extra:
+            # Overrides of fixed keys keep the fixed key's position
+            if key not in own:
+                yield key
+
+    def __len__(self) -> int:
+        own = self._own_keys()
+        return len(own) + sum(1 for key in self.extra if key not in own)
+
+    def __setitem__(self, key: str, value: Any):
+        slot = _SETTERS.get(key)
+        if slot is not None and key not in self.extra:
+            setattr(self, slot, intern_key(value) if slot in ('extension', 'file_type') else value)
+        else:
+            self.extra[intern_key(key)] = value
+
+    def __delitem__(self, key: str):
+        if key in self.extra:
+            del self.extra[key]
+        elif key in self:
+            raise TypeError(f"'{key}' is a fixed field of FileRecord")
+        else:
+            raise KeyError(key)
+
+    def __repr__(self):
+        return f"FileRecord({self.filepath!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict with every field formatted"""
+        return {key: self[key] for key in self}
+
+    # Pickling (process pools, spool files) ---------------------------------
+
+    def __reduce__(self):
+        return _restore, (self.filepath, self.directory, self.extension, self.file_type,
+                          self.size, self.ctime_ns, self.mtime_ns, self.atime_ns, self.mode,
+                          self.algorithms, self.digests, self.extracted_ns, self.extra)
+
+
+def _restore(filepath, directory, extension, file_type, size, ctime_ns, mtime_ns, atime_ns,
+             mode, algorithms, digests, extracted_ns, extra) -> FileRecord:
+    record = FileRecord.__new__(FileRecord)
+    record.filepath = filepath
+    record.directory = directory
+    record.extension = intern_key(extension)
+    record.file_type = intern_key(file_type)
+    record.size = size
+    record.ctime_ns = ctime_ns
+    record.mtime_ns = mtime_ns
+    record.atime_ns = atime_ns
+    record.mode = mode
+    record.algorithms = tuple(intern_key(name) for name in algorithms)
+    record.digests = digests
+    record.extracted_ns = extracted_ns
+    record.extra = {intern_key(key): value for key, value in extra.items()}
+    return record
+
+
+def as_dict(record: MutableMapping) -> Dict[str, Any]:
+    """A plain dict for serializers that need one (json)"""
+    return record.to_dict() if isinstance(record, FileRecord) else record
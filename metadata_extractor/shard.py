@@ -0,0 +1,344 @@
+"""Deterministic sharding of a case across workstations, and the merge step
+
+Workstations coordinate only through a shared directory (the "shard
+directory"); there is no server:
+
+1. plan_shards() walks the evidence once and writes a manifest: a header
+   (manifest.json) and one path list per shard, each sorted by path.
+   Files go to a shard by a hash of their path (stable however the case
+   is re-planned) or by greedy size balancing (largest file first onto
+   the lightest shard).
+2. run_shard() claims a shard by creating its lock file with O_EXCL, so
+   two machines never process the same shard, extracts it in path order
+   and publishes results/shard_NNNNN.jsonl.gz with an atomic rename.
+   A shard whose output exists is done; a stale lock (crashed machine)
+   is taken over with force=True.
+3. merge_shards() streams the sorted shard outputs through a heap merge
+   into one sorted, de-duplicated CSV/JSON result and checks every
+   manifest entry was covered exactly once.
+
+Paths are stored absolute, so every workstation must see the evidence
+under the same path (e.g. the same mount point).
+"""
+
+import datetime
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import socket
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from .batch import iter_files
+from .metrics import METRICS
+from .sinks import CSVWriterPool, JSONLinesSink
+
+MANIFEST_NAME = 'manifest.json'
+RESULTS_DIR = 'results'
+DEFAULT_MERGED_NAME = 'merged_metadata.csv'
+REPORT_NAME = 'merge_report.json'
+
+STRATEGIES = ('hash', 'size')
+
+# Problem paths listed in the merge report (counts are always complete)
+REPORT_LIMIT = 1000
+
+ManifestEntry = Tuple[str, int, int]  # (path, size, mtime_ns)
+
+
+def shard_of(path: str, shards: int) -> int:
+    """Shard index of a path under the 'hash' strategy (same on every machine)"""
+    digest = hashlib.md5(path.encode('utf-8', 'surrogateescape')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+def _shard_name(index: int, suffix: str) -> str:
+    return f'shard_{index:05d}{suffix}'
+
+
+def _write_atomic(path: str, lines: Iterable[str]):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _temp_path(path: str) -> str:
+    """Sibling temporary name that keeps the compression suffix of `path`"""
+    path = os.path.abspath(path)
+    return os.path.join(os.path.dirname(path), '.tmp-' + os.path.basename(path))
+
+
+def plan_shards(paths: Iterable[str], shard_dir: str, shards: int, strategy: str = 'hash',
+                recursive: bool = True, exclude_names: Iterable[str] = (),
+                on_error: Optional[Callable[[str, Exception], None]] = None) -> Dict[str, Any]:
+    """Walk `paths` and write the manifest; returns the manifest header"""
+    if shards < 1:
+        raise ValueError("At least one shard is required")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown shard strategy: {strategy}")
+    shard_dir = os.path.abspath(shard_dir)
+    if os.path.exists(os.path.join(shard_dir, MANIFEST_NAME)):
+        raise FileExistsError(f"A manifest already exists in {shard_dir}")
+
+    entries: List[ManifestEntry] = []
+    for filepath in iter_files(paths, recursive=recursive, on_error=on_error,
+                               exclude_names=exclude_names):
+        filepath = os.path.abspath(filepath)
+        if filepath.startswith(shard_dir + os.sep):
+            continue  # never shard our own outputs
+        try:
+            timer = METRICS.start()
+            stat = os.stat(filepath)
+            METRICS.stop(timer, 'stat', filepath)
+        except OSError as e:
+            if on_error is not None:
+                on_error(filepath, e)
+            continue
+        entries.append((filepath, stat.st_size, stat.st_mtime_ns))
+
+    assigned: List[List[ManifestEntry]] = [[] for _ in range(shards)]
+    if strategy == 'hash':
+        for entry in entries:
+            assigned[shard_of(entry[0], shards)].append(entry)
+    else:
+        # Longest-processing-time first: biggest file onto the lightest shard
+        entries.sort(key=lambda e: (-e[1], e[0]))
+        heap = [(0, index) for index in range(shards)]
+        for entry in entries:
+            load, index = heapq.heappop(heap)
+            assigned[index].append(entry)
+            heapq.heappush(heap, (load + entry[1], index))
+
+    os.makedirs(os.path.join(shard_dir, RESULTS_DIR), exist_ok=True)
+    header = {
+        'created': datetime.datetime.now().isoformat(),
+        'roots': [os.path.abspath(p) for p in paths],
+        'strategy': strategy,
+        'shards': [],
+        'files': len(entries),
+        'bytes': sum(e[1] for e in entries),
+    }
+    for index, shard in enumerate(assigned):
+        shard.sort()
+        name = _shard_name(index, '.jsonl')
+        _write_atomic(os.path.join(shard_dir, name),
+                      (json.dumps(entry, ensure_ascii=False) + '\n' for entry in shard))
+        header['shards'].append({'index': index, 'list': name, 'files': len(shard),
+                                 'bytes': sum(e[1] for e in shard)})
+    # The header is written last: its presence means the plan is complete
+    _write_atomic(os.path.join(shard_dir, MANIFEST_NAME), [json.dumps(header, indent=2)])
+    return header
+
+
+def load_manifest(shard_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(shard_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_shard_entries(shard_dir: str, index: int) -> Iterator[ManifestEntry]:
+    """Manifest entries of one shard, in path order"""
+    list_path = os.path.join(shard_dir, _shard_name(index, '.jsonl'))
+    with open(list_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            path, size, mtime_ns = json.loads(line)
+            yield path, size, mtime_ns
+
+
+def result_path(shard_dir: str, index: int) -> str:
+    return os.path.join(shard_dir, RESULTS_DIR, _shard_name(index, '.jsonl.gz'))
+
+
+def _lock_path(shard_dir: str, index: int) -> str:
+    return os.path.join(shard_dir, RESULTS_DIR, _shard_name(index, '.lock'))
+
+
+def claim_shard(shard_dir: str, index: int, force: bool = False) -> bool:
+    """Take the lock of a shard that is not done; False if someone else holds it"""
+    if os.path.exists(result_path(shard_dir, index)):
+        return False
+    lock = _lock_path(shard_dir, index)
+    if force:
+        try:
+            os.remove(lock)
+        except FileNotFoundError:
+            pass
+    try:
+        fd = os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'host': socket.gethostname(), 'pid': os.getpid(),
+                   'claimed': datetime.datetime.now().isoformat()}, f)
+    return True
+
+
+def shard_status(shard_dir: str) -> List[Dict[str, Any]]:
+    """Per-shard state: 'done', 'claimed' (with lock details) or 'pending'"""
+    status = []
+    for shard in load_manifest(shard_dir)['shards']:
+        index = shard['index']
+        entry = dict(shard, state='pending')
+        if os.path.exists(result_path(shard_dir, index)):
+            entry['state'] = 'done'
+        elif os.path.exists(_lock_path(shard_dir, index)):
+            entry['state'] = 'claimed'
+            try:
+                with open(_lock_path(shard_dir, index), 'r', encoding='utf-8') as f:
+                    entry['lock'] = json.load(f)
+            except (OSError, ValueError):
+                pass
+        status.append(entry)
+    return status
+
+
+def next_shard(shard_dir: str) -> Optional[int]:
+    """Claim the first pending shard; None when every shard is done or claimed"""
+    for shard in load_manifest(shard_dir)['shards']:
+        if claim_shard(shard_dir, shard['index']):
+            return shard['index']
+    return None
+
+
+def run_shard(shard_dir: str, index: int, engine) -> Dict[str, int]:
+    """Extract one claimed shard with `engine` (BatchExtractor or StagedPipeline)
+
+    The engine must deliver results in input order so the output stays
+    sorted by path. Output is written under a private name and renamed
+    into place once complete, then the lock is released.
+    """
+    final = result_path(shard_dir, index)
+    owner = f'{socket.gethostname()}.{os.getpid()}'
+    partial = os.path.join(os.path.dirname(final), f'.{_shard_name(index, "")}.{owner}.jsonl.gz')
+    counts = {'files': 0, 'errors': 0}
+    try:
+        with JSONLinesSink(partial) as sink:
+            paths = (path for path, _, _ in iter_shard_entries(shard_dir, index))
+            for metadata in engine.run(paths):
+                counts['files'] += 1
+                if 'error' in metadata:
+                    counts['errors'] += 1
+                sink.write(metadata)
+        os.replace(partial, final)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+        try:
+            os.remove(_lock_path(shard_dir, index))
+        except FileNotFoundError:
+            pass
+    return counts
+
+
+def _iter_results(path: str, index: int) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+    """(filepath, shard index, record) from one shard output"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            yield record.get('filepath', ''), index, record
+
+
+def merge_shards(shard_dir: str, csv_path: Optional[str] = None,
+                 json_path: Optional[str] = None) -> Dict[str, Any]:
+    """Merge shard outputs into one sorted result and check manifest coverage
+
+    Each manifest entry must appear in exactly one shard output. Records
+    for a path seen twice (a shard run twice, or shards of two plans)
+    are written once. Returns the report that is also saved as
+    merge_report.json; `complete` is False if anything is missing,
+    duplicated or not in the manifest.
+    """
+    manifest = load_manifest(shard_dir)
+    indexes = [shard['index'] for shard in manifest['shards']]
+    missing_outputs = [i for i in indexes if not os.path.exists(result_path(shard_dir, i))]
+
+    expected = heapq.merge(*(iter_shard_entries(shard_dir, i) for i in indexes))
+    results = heapq.merge(*(_iter_results(result_path(shard_dir, i), i)
+                            for i in indexes if i not in missing_outputs),
+                          key=lambda item: item[0])
+
+    report = {
+        'manifest_files': manifest['files'],
+        'missing_shards': missing_outputs,
+        'written': 0,
+        'errors': 0,
+        'missing': 0,
+        'duplicates': 0,
+        'unexpected': 0,
+        'changed': 0,
+        'missing_paths': [],
+        'duplicate_paths': [],
+        'unexpected_paths': [],
+        'changed_paths': [],
+    }
+
+    def note(kind: str, path: str):
+        report[kind] += 1
+        paths = report[kind.rstrip('s') + '_paths']
+        if len(paths) < REPORT_LIMIT:
+            paths.append(path)
+
+    # Outputs are built under temporary names and replace the previous merge
+    # only once complete; CSVWriterPool would otherwise append to it
+    outputs = [(_temp_path(path), path) for path in (csv_path, json_path) if path]
+    for tmp_path, _ in outputs:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)  # left by an interrupted merge
+    csv_pool = CSVWriterPool() if csv_path else None
+    json_sink = JSONLinesSink(_temp_path(json_path)) if json_path else None
+    try:
+        pending = next(expected, None)
+        last_path = None
+        for path, _, record in results:
+            if path == last_path:
+                note('duplicates', path)
+                continue
+            last_path = path
+            # Manifest entries sorting before this record were never produced
+            while pending is not None and pending[0] < path:
+                note('missing', pending[0])
+                pending = next(expected, None)
+            if pending is None or pending[0] != path:
+                note('unexpected', path)
+            else:
+                if 'error' not in record and record.get('size_bytes') != pending[1]:
+                    note('changed', path)  # file changed between planning and extraction
+                pending = next(expected, None)
+
+            if 'error' in record:
+                report['errors'] += 1
+                continue
+            report['written'] += 1
+            if csv_pool is not None:
+                csv_pool.write(_temp_path(csv_path), record)
+            if json_sink is not None:
+                json_sink.write(record)
+        while pending is not None:
+            note('missing', pending[0])
+            pending = next(expected, None)
+        if csv_pool is not None and not csv_pool.close():
+            raise OSError(f"Could not write the merged CSV {csv_path}")
+        if json_sink is not None:
+            json_sink.close()
+    except BaseException:
+        # Both sinks tolerate a second close()
+        if csv_pool is not None:
+            csv_pool.close()
+        if json_sink is not None:
+            json_sink.close()
+        for tmp_path, _ in outputs:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    for tmp_path, path in outputs:
+        if not os.path.exists(tmp_path):
+            open(tmp_path, 'w').close()  # nothing to write: still replace the old merge
+        os.replace(tmp_path, path)
+
+    report['complete'] = not (missing_outputs or report['missing'] or report['duplicates']
+                              or report['unexpected'])
+    _write_atomic(os.path.join(shard_dir, REPORT_NAME), [json.dumps(report, indent=2)])
+    return report
@@ -0,0 +1,213 @@
+"""Magic-byte file type detection from a single header buffer
+
+The extension only says what a file claims to be; a JPEG renamed to .dat
+is still a JPEG. sniff() matches the first bytes of a file against a
+table of prefix/offset signatures, compiled into a dict keyed by the two
+bytes at each offset so a lookup is one slice and one dict probe. A few
+container formats (RIFF, ISO-BMFF, Matroska, ZIP, ID3) are refined by
+looking a little further into the same buffer. No file is opened here:
+callers pass the header they already read for hashing and parsing.
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+class Signature:
+    """A detected format, its file type and the extensions it may carry"""
+
+    __slots__ = ('format', 'file_type', 'extensions', 'extension')
+
+    def __init__(self, format: str, file_type: str, extensions: Iterable[str]):
+        self.format = format
+        self.file_type = file_type
+        extensions = tuple(extensions)
+        self.extensions = frozenset(extensions)
+        # Canonical extension, used to pick an extractor for renamed files
+        self.extension = extensions[0] if extensions else ''
+
+    def __repr__(self):
+        return f"Signature({self.format!r}, {self.file_type!r})"
+
+
+def _sig(format: str, file_type: str, *extensions: str) -> Signature:
+    return Signature(format, file_type, extensions)
+
+
+JPEG = _sig('jpeg', 'image', '.jpg', '.jpeg', '.jpe', '.jfif')
+PNG = _sig('png', 'image', '.png')
+GIF = _sig('gif', 'image', '.gif')
+BMP = _sig('bmp', 'image', '.bmp', '.dib')
+# Camera raw formats are TIFF containers too
+TIFF = _sig('tiff', 'image', '.tif', '.tiff', '.dng', '.nef', '.cr2', '.arw', '.orf', '.rw2', '.pef')
+WEBP = _sig('webp', 'image', '.webp')
+HEIF = _sig('heif', 'image', '.heic', '.heif', '.avif')
+WAV = _sig('wav', 'audio', '.wav')
+AVI = _sig('avi', 'video', '.avi')
+
+# ISO base media files share one family: an .m4a with an 'isom' brand is fine
+_ISO_BMFF = ('.mp4', '.m4v', '.mov', '.m4a', '.m4b', '.3gp', '.3g2')
+MP4 = _sig('mp4', 'video', *_ISO_BMFF)
+MOV = _sig('mov', 'video', '.mov', *_ISO_BMFF)
+M4A = _sig('m4a', 'audio', '.m4a', *_ISO_BMFF)
+M4V = _sig('m4v', 'video', '.m4v', *_ISO_BMFF)
+THREE_GP = _sig('3gp', 'video', '.3gp', *_ISO_BMFF)
+
+_MATROSKA = ('.mkv', '.webm', '.mka', '.mk3d')
+MKV = _sig('matroska', 'video', *_MATROSKA)
+WEBM = _sig('webm', 'video', '.webm', *_MATROSKA)
+FLV = _sig('flv', 'video', '.flv')
+ASF = _sig('asf', 'video', '.wmv', '.wma', '.asf')
+
+FLAC = _sig('flac', 'audio', '.flac')
+MP3 = _sig('mp3', 'audio', '.mp3')
+ID3 = _sig('mp3', 'audio', '.mp3', '.aac')  # ID3 tag in front of MPEG/ADTS audio
+AAC = _sig('aac', 'audio', '.aac')
+OGG = _sig('ogg', 'audio', '.ogg', '.oga', '.ogv', '.opus')
+
+PDF = _sig('pdf', 'document', '.pdf')
+RTF = _sig('rtf', 'document', '.rtf')
+OLE = _sig('ole', 'document', '.doc', '.xls', '.ppt', '.msg', '.dot', '.xlt', '.pot', '.msi')
+DOCX = _sig('docx', 'document', '.docx', '.docm', '.dotx', '.dotm')
+XLSX = _sig('xlsx', 'document', '.xlsx', '.xlsm', '.xltx', '.xltm')
+PPTX = _sig('pptx', 'document', '.pptx', '.pptm', '.potx', '.ppsx')
+ODF = _sig('odf', 'document', '.odt', '.ods', '.odp', '.odg')
+EPUB = _sig('epub', 'document', '.epub')
+# A ZIP whose first entries did not fit in the header may still be OOXML/ODF
+ZIP = _sig('zip', 'other', '.zip', '.jar', '.apk', '.kmz', '.xpi', *DOCX.extensions,
+           *XLSX.extensions, *PPTX.extensions, *ODF.extensions, *EPUB.extensions)
+TAR = _sig('tar', 'other', '.tar')
+GZIP = _sig('gzip', 'other', '.gz', '.tgz', '.svgz')
+BZIP2 = _sig('bzip2', 'other', '.bz2', '.tbz', '.tbz2')
+XZ = _sig('xz', 'other', '.xz', '.txz')
+SEVEN_ZIP = _sig('7z', 'other', '.7z')
+
+
+def _refine_riff(header: bytes) -> Optional[Signature]:
+    return {b'WAVE': WAV, b'AVI ': AVI, b'WEBP': WEBP}.get(header[8:12])
+
+
+_FTYP_BRANDS = {
+    b'qt  ': MOV, b'M4A ': M4A, b'M4B ': M4A, b'M4P ': M4A, b'M4V ': M4V, b'M4VH': M4V,
+    b'M4VP': M4V, b'heic': HEIF, b'heix': HEIF, b'heim': HEIF, b'heis': HEIF,
+    b'mif1': HEIF, b'msf1': HEIF, b'avif': HEIF, b'avis': HEIF,
+}
+
+
+def _refine_ftyp(header: bytes) -> Optional[Signature]:
+    brand = header[8:12]
+    if brand[:3] in (b'3gp', b'3g2'):
+        return THREE_GP
+    return _FTYP_BRANDS.get(brand, MP4)
+
+
+def _refine_matroska(header: bytes) -> Optional[Signature]:
+    # The DocType element sits in the EBML header, within the first few dozen bytes
+    return WEBM if b'webm' in header[:64] else MKV
+
+
+def _refine_id3(header: bytes) -> Optional[Signature]:
+    if len(header) < 10:
+        return ID3
+    body = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    start = 10 + body + (10 if header[5] & 0x10 else 0)
+    return FLAC if header[start:start + 4] == b'fLaC' else ID3
+
+
+def _refine_zip(header: bytes) -> Optional[Signature]:
+    # Entry names are stored uncompressed, so the first local headers are readable
+    if header[30:38] == b'mimetype':
+        if b'application/epub+zip' in header[38:80]:
+            return EPUB
+        if b'application/vnd.oasis.opendocument' in header[38:100]:
+            return ODF
+    if b'[Content_Types].xml' in header or b'_rels/.rels' in header:
+        if b'word/' in header:
+            return DOCX
+        if b'xl/' in header:
+            return XLSX
+        if b'ppt/' in header:
+            return PPTX
+    return ZIP
+
+
+def _refine_bmp(header: bytes) -> Optional[Signature]:
+    # 'BM' alone is common in text; the four reserved bytes must be zero
+    return BMP if header[6:10] == b'\x00\x00\x00\x00' else None
+
+
+# (offset, magic, signature or refiner)
+SIGNATURES: List[Tuple[int, bytes, object]] = [
+    (0, b'\xff\xd8\xff', JPEG),
+    (0, b'\x89PNG\r\n\x1a\n', PNG),
+    (0, b'GIF87a', GIF),
+    (0, b'GIF89a', GIF),
+    (0, b'BM', _refine_bmp),
+    (0, b'II*\x00', TIFF),
+    (0, b'MM\x00*', TIFF),
+    (0, b'RIFF', _refine_riff),
+    (0, b'\x1aE\xdf\xa3', _refine_matroska),
+    (0, b'FLV\x01', FLV),
+    (0, b'0&\xb2u\x8ef\xcf\x11', ASF),
+    (0, b'fLaC', FLAC),
+    (0, b'ID3', _refine_id3),
+    (0, b'OggS', OGG),
+    # MPEG audio frame sync (layer III, MPEG-1/2/2.5) and ADTS AAC
+    (0, b'\xff\xfb', MP3),
+    (0, b'\xff\xfa', MP3),
+    (0, b'\xff\xf3', MP3),
+    (0, b'\xff\xf2', MP3),
+    (0, b'\xff\xe3', MP3),
+    (0, b'\xff\xf1', AAC),
+    (0, b'\xff\xf9', AAC),
+    (0, b'%PDF-', PDF),
+    (0, b'{\\rtf', RTF),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', OLE),
+    (0, b'PK\x03\x04', _refine_zip),
+    (0, b'PK\x05\x06', ZIP),  # empty archive
+    (0, b'\x1f\x8b', GZIP),
+    (0, b'BZh', BZIP2),
+    (0, b'\xfd7zXZ\x00', XZ),
+    (0, b"7z\xbc\xaf'\x1c", SEVEN_ZIP),
+    (4, b'ftyp', _refine_ftyp),
+    # QuickTime files without an ftyp box (the native MP4 parser accepts these too)
+    (4, b'moov', MOV),
+    (4, b'mdat', MOV),
+    (4, b'wide', MOV),
+    (4, b'free', MOV),
+    (4, b'skip', MOV),
+    (257, b'ustar', TAR),  # POSIX and GNU tar headers
+]
+
+# Every extension some signature accounts for; a file claiming one of these
+# whose content matches nothing is reported as a mismatch
+SIGNATURE_EXTENSIONS: FrozenSet[str] = frozenset(
+    ext for sig in (JPEG, PNG, GIF, BMP, TIFF, WEBP, HEIF, WAV, AVI, MP4, MKV, FLV, ASF, FLAC,
+                    MP3, ID3, AAC, OGG, PDF, RTF, OLE, ZIP, TAR, GZIP, BZIP2, XZ, SEVEN_ZIP)
+    for ext in sig.extensions)
+
+
+def _compile(signatures) -> List[Tuple[int, Dict[bytes, List[Tuple[bytes, object]]]]]:
+    """Group signatures by offset and by their first two bytes, longest magic first"""
+    by_offset = {}
+    for offset, magic, target in signatures:
+        by_offset.setdefault(offset, {}).setdefault(magic[:2], []).append((magic, target))
+    for table in by_offset.values():
+        for candidates in table.values():
+            candidates.sort(key=lambda c: len(c[0]), reverse=True)
+    return sorted(by_offset.items())
+
+
+_TABLE = _compile(SIGNATURES)
+
+
+def sniff(header: bytes) -> Optional[Signature]:
+    """Identify a file from its first bytes; None if nothing matches"""
+    for offset, table in _TABLE:
+        for magic, target in table.get(header[offset:offset + 2], ()):
+            if not header.startswith(magic, offset):
+                continue
+            signature = target if isinstance(target, Signature) else target(header)
+            if signature is not None:
+                return signature
+    return None
+
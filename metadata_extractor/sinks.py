@@ -0,0 +1,437 @@
+"""Output sinks for extracted metadata"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, BinaryIO, Callable, Iterable, Iterator, Optional
+
+from .metrics import METRICS
+from .record import as_dict
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Rows kept in memory per output file before they are spooled to disk
+DEFAULT_BATCH_SIZE = 256
+
+# Spool file handles kept open at once (one per output folder)
+DEFAULT_MAX_OPEN = 64
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# One lock per output CSV, shared by every pool in the process: GUI drops,
+# the folder watcher and jobs can finalize into the same file at once
+_csv_locks: Dict[str, threading.Lock] = {}
+_csv_locks_lock = threading.Lock()
+
+# mkstemp creates files 0600; new CSVs get the usual umask-based mode instead
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _csv_lock(csv_path: str) -> threading.Lock:
+    with _csv_locks_lock:
+        lock = _csv_locks.get(csv_path)
+        if lock is None:
+            lock = _csv_locks[csv_path] = threading.Lock()
+        return lock
+
+
+class _SpoolTarget:
+    """Per-CSV state: union schema, in-memory batch and spool file"""
+
+    __slots__ = ('csv_path', 'spool_name', 'spooled', 'fieldnames', 'batch', 'rows')
+
+    def __init__(self, csv_path: str, spool_name: str):
+        self.csv_path = csv_path
+        self.spool_name = spool_name
+        self.spooled = False
+        self.fieldnames = {}  # insertion-ordered union of all row keys
+        self.batch = []
+        self.rows = 0
+
+
+class CSVWriterPool:
+    """Buffered CSV writer with a stable union schema across rows
+
+    Rows for each output CSV are batched in memory and spooled to a
+    private temporary file through a small pool of open handles. The
+    header is only decided at close(), once every column is known, so
+    image, video and audio rows with different EXIF/track keys always
+    line up. Existing CSVs are appended to, or rewritten with a widened
+    header when new columns appear.
+
+    `before_finalize(csv_path)` runs before each CSV is written and can
+    skip it by returning False; `after_finalize(csv_path)` runs once it
+    is complete (used by resumable jobs to make the export idempotent).
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, max_open: int = DEFAULT_MAX_OPEN,
+                 spool_dir: Optional[str] = None,
+                 before_finalize: Optional[Callable[[str], bool]] = None,
+                 after_finalize: Optional[Callable[[str], None]] = None):
+        self.batch_size = max(1, batch_size)
+        self.max_open = max(1, max_open)
+        self.before_finalize = before_finalize
+        self.after_finalize = after_finalize
+        self._spool_parent = spool_dir
+        self._spool_dir = None  # created on the first spill to disk
+        self._targets = {}
+        self._handles = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, csv_path: str, row: Dict[str, Any]):
+        """Queue one metadata row for the given CSV file"""
+        timer = METRICS.start()
+        csv_path = os.path.abspath(csv_path)
+        target = self._targets.get(csv_path)
+        if target is None:
+            target = _SpoolTarget(csv_path, f'{len(self._targets)}.spool')
+            self._targets[csv_path] = target
+
+        for key in row:
+            if key not in target.fieldnames:
+                target.fieldnames[key] = None
+        target.batch.append(row)
+        target.rows += 1
+
+        if len(target.batch) >= self.batch_size:
+            self._spool(target)
+        METRICS.stop(timer, 'csv_write', csv_path)
+
+    def _spool(self, target: _SpoolTarget):
+        """Append the in-memory batch to the target's spool file"""
+        if not target.batch:
+            return
+        if self._spool_dir is None:
+            self._spool_dir = tempfile.mkdtemp(prefix='metadata_spool_', dir=self._spool_parent)
+        handle = self._handles.pop(target.csv_path, None)
+        if handle is None:
+            if len(self._handles) >= self.max_open:
+                _, oldest = self._handles.popitem(last=False)
+                oldest.close()
+            spool_path = os.path.join(self._spool_dir, target.spool_name)
+            handle = open(spool_path, 'ab', buffering=WRITE_BUFFER_SIZE)
+        self._handles[target.csv_path] = handle  # most recently used last
+        pickle.dump(target.batch, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        target.batch = []
+        target.spooled = True
+
+    def _read_spool(self, target: _SpoolTarget):
+        """Yield spooled rows in write order, then the unspooled tail"""
+        if target.spooled:
+            with open(os.path.join(self._spool_dir, target.spool_name), 'rb') as f:
+                while True:
+                    try:
+                        batch = pickle.load(f)
+                    except EOFError:
+                        break
+                    yield from batch
+        yield from target.batch
+
+    @staticmethod
+    def _read_header(csv_path: str) -> List[str]:
+        """Return the header of an existing CSV, or [] if absent/empty"""
+        try:
+            with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+                return next(csv.reader(f), [])
+        except FileNotFoundError:
+            return []
+
+    def _finalize(self, target: _SpoolTarget):
+        """Write all rows for one target into its CSV with a union header"""
+        handle = self._handles.pop(target.csv_path, None)
+        if handle is not None:
+            handle.close()
+
+        os.makedirs(os.path.dirname(target.csv_path), exist_ok=True)
+        existing = self._read_header(target.csv_path)
+        new_columns = [key for key in target.fieldnames if key not in existing]
+
+        if existing and not new_columns:
+            # Schema unchanged: plain append in the existing column order
+            with open(target.csv_path, 'a', newline='', encoding='utf-8',
+                      buffering=WRITE_BUFFER_SIZE) as f:
+                writer = csv.DictWriter(f, fieldnames=existing, restval='')
+                writer.writerows(self._read_spool(target))
+            return
+
+        # New file, or new columns: (re)write with the widened header
+        fieldnames = existing + new_columns
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', suffix='.csv',
+                                        dir=os.path.dirname(target.csv_path))
+        try:
+            self._rewrite(target, fd, existing, fieldnames)
+            if existing:
+                shutil.copymode(target.csv_path, tmp_path)
+            else:
+                os.chmod(tmp_path, 0o666 & ~_UMASK)
+            os.replace(tmp_path, target.csv_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _rewrite(self, target: _SpoolTarget, fd: int, existing: List[str],
+                 fieldnames: List[str]):
+        """Write the old rows, padded to the widened header, then the new ones"""
+        new_columns = fieldnames[len(existing):]
+        with open(fd, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, restval='')
+            writer.writeheader()
+            if existing:
+                # Old rows keep their column positions; only pad the new columns
+                raw_writer = csv.writer(f)
+                padding = [''] * len(new_columns)
+                with open(target.csv_path, 'r', newline='', encoding='utf-8') as old:
+                    reader = csv.reader(old)
+                    next(reader, None)
+                    for row in reader:
+                        raw_writer.writerow(row + padding[:max(0, len(fieldnames) - len(row))])
+            writer.writerows(self._read_spool(target))
+
+    def close(self) -> bool:
+        """Finalize every CSV; returns False if any of them failed"""
+        ok = True
+        for target in self._targets.values():
+            timer = METRICS.start()
+            try:
+                # Another pool may be rewriting this CSV: its read of the old
+                # rows and its replace must not interleave with ours
+                with _csv_lock(target.csv_path):
+                    if (self.before_finalize is not None
+                            and not self.before_finalize(target.csv_path)):
+                        continue
+                    self._finalize(target)
+                    if self.after_finalize is not None:
+                        self.after_finalize(target.csv_path)
+                if timer is not None:
+                    METRICS.stop(timer, 'csv_finalize', target.csv_path, os.path.getsize(target.csv_path))
+            except Exception as e:
+                print(f"Error writing to CSV {target.csv_path}: {str(e)}")
+                ok = False
+        for handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
+        self._targets.clear()
+        if self._spool_dir is not None:
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+            self._spool_dir = None
+        return ok
+
+
+def open_compressed_writer(path: str) -> BinaryIO:
+    """Open a binary writer, compressing by extension (.gz or .zst)"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wb', compresslevel=6)
+    if path.endswith('.zst'):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard not available: pip install zstandard")
+        raw = open(path, 'wb')
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+    return open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+
+
+def _strip_compression_suffix(path: str) -> str:
+    """'out.json.gz' -> 'out.json'"""
+    for suffix in ('.gz', '.zst'):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def open_compressed_reader(path: str) -> BinaryIO:
+    """Open a binary reader, decompressing by extension (.gz or .zst)"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard not available: pip install zstandard")
+        raw = open(path, 'rb')
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return open(path, 'rb', buffering=WRITE_BUFFER_SIZE)
+
+
+def iter_result_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Records from an output file: CSV, JSON array or JSON lines (.gz/.zst allowed)
+
+    CSV values come back as strings and empty cells are left out. A JSON
+    array is loaded whole; JSON lines are streamed.
+    """
+    name = _strip_compression_suffix(path).lower()
+    with open_compressed_reader(path) as raw:
+        text = io.TextIOWrapper(raw, encoding='utf-8', newline='' if name.endswith('.csv') else None)
+        if name.endswith('.csv'):
+            for row in csv.DictReader(text):
+                yield {key: value for key, value in row.items() if value}
+        elif name.endswith('.json'):
+            yield from json.load(text)
+        else:
+            for line in text:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    """Serialize one record as a single NDJSON line"""
+    return json.dumps(as_dict(record), ensure_ascii=False, default=str).encode('utf-8') + b'\n'
+
+
+class JSONLinesSink:
+    """Streaming JSON sink: each record is written as soon as it is produced
+
+    The output format follows the file name: '.json' gives a JSON array,
+    anything else (e.g. '.jsonl', '.ndjson') one object per line, and a
+    trailing '.gz' or '.zst' adds compression. Records never accumulate
+    in memory, and write() is safe to call from worker threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.as_array = _strip_compression_suffix(path).lower().endswith('.json')
+        self._lock = threading.Lock()
+        self._file = open_compressed_writer(path)
+        if self.as_array:
+            self._file.write(b'[\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record: Dict[str, Any]):
+        """Append one record"""
+        timer = METRICS.start()
+        line = encode_record(record)
+        with self._lock:
+            if self.as_array and self.count:
+                self._file.write(b',\n')
+            self._file.write(line[:-1] if self.as_array else line)
+            self.count += 1
+        METRICS.stop(timer, 'json_write', self.path, len(line))
+
+    def write_many(self, records: Iterable[Dict[str, Any]]):
+        """Append every record from an iterable"""
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        """Terminate the array (if any) and close the file"""
+        with self._lock:
+            if self._file is None:
+                return
+            if self.as_array:
+                self._file.write(b'\n]\n')
+            self._file.close()
+            self._file = None
+
+
+class SessionJournal:
+    """Uncompressed NDJSON spool of a session's records, exportable on demand
+
+    Used by the GUI instead of keeping every record in a list: records are
+    appended as they are produced and export() copies the bytes written so
+    far to the destination, converting to a JSON array or compressing only
+    when the destination name asks for it. Nothing is re-serialized.
+    write() returns the record's byte offset so a single record can be
+    read back later with read(), e.g. to show details on selection.
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None):
+        fd, self.path = tempfile.mkstemp(prefix='metadata_session_', suffix='.jsonl', dir=spool_dir)
+        self._file = os.fdopen(fd, 'wb', buffering=WRITE_BUFFER_SIZE)
+        self._reader = None  # opened on the first read()
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, record: Dict[str, Any]) -> int:
+        """Append one record to the spool; returns its byte offset"""
+        line = encode_record(record)
+        with self._lock:
+            offset = self._file.tell()
+            self._file.write(line)
+            self.count += 1
+        return offset
+
+    def read(self, offset: int) -> Dict[str, Any]:
+        """Return the record written at `offset`"""
+        with self._lock:
+            self._file.flush()
+            if self._reader is None:
+                self._reader = open(self.path, 'rb')
+            self._reader.seek(offset)
+            line = self._reader.readline()
+        return json.loads(line)
+
+    def _snapshot(self) -> int:
+        """Flush and return the byte length of the complete records so far"""
+        with self._lock:
+            self._file.flush()
+            return self._file.tell()
+
+    def export(self, dest_path: str) -> int:
+        """Copy the session to dest_path; returns the number of bytes read"""
+        length = self._snapshot()
+        as_array = _strip_compression_suffix(dest_path).lower().endswith('.json')
+
+        with open(self.path, 'rb') as src, open_compressed_writer(dest_path) as dst:
+            if not as_array:
+                remaining = length
+                while remaining > 0:
+                    chunk = src.read(min(WRITE_BUFFER_SIZE, remaining))
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    remaining -= len(chunk)
+                return length
+
+            # Each spool line is already a JSON object: join them with commas
+            dst.write(b'[\n')
+            first = True
+            while src.tell() < length:
+                line = src.readline()
+                if not line:
+                    break
+                if not first:
+                    dst.write(b',\n')
+                dst.write(line.rstrip(b'\n'))
+                first = False
+            dst.write(b'\n]\n')
+        return length
+
+    def clear(self):
+        """Discard every record written so far"""
+        with self._lock:
+            self._file.seek(0)
+            self._file.truncate()
+            self.count = 0
+
+    def close(self):
+        """Close and delete the spool file"""
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
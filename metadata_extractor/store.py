@@ -0,0 +1,433 @@
+"""Queryable SQLite store of extraction results
+
+CSV and JSON output are fine for reading one folder but not for questions
+across a case ("every image from camera X taken in March"). ResultStore
+keeps one row per file in a `records` table with typed, indexed columns
+for the fields every record has, plus a few values normalised from
+EXIF/media tags (camera, capture date, GPS position, duration). All other
+keys (EXIF tags, media track fields, digests) go to a `fields` key/value
+side table indexed on (key, value), so a digest or tag lookup is an index
+probe too. Key names are interned in a small `keys` table so the side
+table and its index only hold integers for them. Rows are buffered and inserted with executemany inside one
+transaction per batch.
+"""
+
+import json
+import os
+import re
+import sqlite3
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Sequence, Tuple
+
+from .metrics import METRICS
+
+DEFAULT_STORE_NAME = 'metadata_results.sqlite'
+
+# Bump when the tables change; older stores are rebuilt, not migrated
+SCHEMA_VERSION = 1
+
+# Records buffered before they are inserted in one transaction
+DEFAULT_BATCH_SIZE = 2000
+
+# SQLite page cache of a writer, in KiB
+CACHE_KIB = 64 * 1024
+
+# (record key, SQL type) stored as typed columns under the same name
+BASIC_COLUMNS: List[Tuple[str, str]] = [
+    ('filepath', 'TEXT NOT NULL UNIQUE'),
+    ('filename', 'TEXT'),
+    ('directory', 'TEXT'),
+    ('extension', 'TEXT'),
+    ('file_type', 'TEXT'),
+    ('size_bytes', 'INTEGER'),
+    ('created', 'TEXT'),
+    ('modified', 'TEXT'),
+    ('accessed', 'TEXT'),
+    ('permissions', 'TEXT'),
+    ('claimed_type', 'TEXT'),
+    ('detected_type', 'TEXT'),
+    ('detected_format', 'TEXT'),
+    ('type_mismatch', 'INTEGER'),
+    ('parent_path', 'TEXT'),
+    ('extraction_timestamp', 'TEXT'),
+]
+
+# Columns derived from variable tags; the tags themselves stay in `fields`
+DERIVED_COLUMNS: List[Tuple[str, str]] = [
+    ('camera_make', 'TEXT'),
+    ('camera_model', 'TEXT'),
+    ('date_taken', 'TEXT'),
+    ('image_width', 'INTEGER'),
+    ('image_height', 'INTEGER'),
+    ('gps_latitude', 'REAL'),
+    ('gps_longitude', 'REAL'),
+    ('duration_ms', 'REAL'),
+]
+
+COLUMNS = [name for name, _ in BASIC_COLUMNS + DERIVED_COLUMNS]
+_BASIC_KEYS = frozenset(name for name, _ in BASIC_COLUMNS)
+
+# Keys that are recomputed rather than stored
+_SKIPPED_KEYS = {'size_mb'}
+
+# First present tag wins
+_DATE_TAGS = ('exif_DateTimeOriginal', 'exif_DateTimeDigitized', 'exif_DateTime',
+              'general_recorded_date', 'general_encoded_date', 'general_tagged_date')
+_DURATION_TAGS = ('general_duration', 'video_duration', 'audio_duration')
+
+_DATE_PATTERN = re.compile(r'(\d{4})[-:](\d{2})[-:](\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2}))?)?')
+_NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    {columns}
+);
+CREATE TABLE IF NOT EXISTS keys (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS fields (
+    record_id INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    value,
+    PRIMARY KEY (record_id, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fields_key_value ON fields (key, value);
+CREATE INDEX IF NOT EXISTS records_file_type ON records (file_type);
+CREATE INDEX IF NOT EXISTS records_extension ON records (extension);
+CREATE INDEX IF NOT EXISTS records_modified ON records (modified);
+CREATE INDEX IF NOT EXISTS records_size ON records (size_bytes);
+CREATE INDEX IF NOT EXISTS records_date_taken ON records (date_taken);
+CREATE INDEX IF NOT EXISTS records_camera ON records (camera_model, date_taken);
+CREATE INDEX IF NOT EXISTS records_directory ON records (directory);
+""".format(columns=',\n    '.join(f'{name} {sql_type}'
+                                   for name, sql_type in BASIC_COLUMNS + DERIVED_COLUMNS))
+
+
+def normalize_date(value: Any) -> Optional[str]:
+    """'2024:01:31 10:00:00' / 'UTC 2024-01-31 10:00:00' -> '2024-01-31T10:00:00'"""
+    if not value:
+        return None
+    match = _DATE_PATTERN.search(str(value))
+    if match is None:
+        return None
+    year, month, day, hour, minute, second = match.groups()
+    if hour is None:
+        return f'{year}-{month}-{day}'
+    return f'{year}-{month}-{day}T{hour}:{minute}:{second or "00"}'
+
+
+def parse_coordinate(value: Any, ref: Any = None) -> Optional[float]:
+    """Decimal degrees from a number or a '(deg, min, sec)' EXIF value"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        parts = [float(value)]
+    else:
+        parts = [float(n) for n in _NUMBER_PATTERN.findall(str(value))]
+    if not parts:
+        return None
+    degrees = parts[0] + (parts[1] / 60 if len(parts) > 1 else 0) + (
+        parts[2] / 3600 if len(parts) > 2 else 0)
+    if str(ref or '').strip().upper() in ('S', 'W'):
+        degrees = -degrees
+    return round(degrees, 7)
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def derive_columns(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Values for DERIVED_COLUMNS from a record's EXIF and media tags"""
+    date_taken = None
+    for key in _DATE_TAGS:
+        date_taken = normalize_date(metadata.get(key))
+        if date_taken:
+            break
+    duration = None
+    for key in _DURATION_TAGS:
+        duration = _to_float(metadata.get(key))
+        if duration is not None:
+            break
+    return {
+        'camera_make': str(metadata['exif_Make']).strip() if metadata.get('exif_Make') else None,
+        'camera_model': str(metadata['exif_Model']).strip() if metadata.get('exif_Model') else None,
+        'date_taken': date_taken,
+        'image_width': _to_int(metadata.get('image_width', metadata.get('video_width'))),
+        'image_height': _to_int(metadata.get('image_height', metadata.get('video_height'))),
+        'gps_latitude': parse_coordinate(metadata.get('exif_GPSLatitude'),
+                                         metadata.get('exif_GPSLatitudeRef')),
+        'gps_longitude': parse_coordinate(metadata.get('exif_GPSLongitude'),
+                                          metadata.get('exif_GPSLongitudeRef')),
+        'duration_ms': duration,
+    }
+
+
+def _field_value(value: Any) -> Any:
+    """SQLite value for a side-table field: numbers stay numbers, booleans become 0/1"""
+    if value is None or isinstance(value, (int, float, str)):
+        return int(value) if isinstance(value, bool) else value
+    return json.dumps(value, ensure_ascii=False, default=str) if isinstance(
+        value, (list, dict)) else str(value)
+
+
+class ResultStore:
+    """SQLite database of extracted records with typed columns and a key/value table
+
+    write() buffers records; they are inserted in one transaction every
+    `batch_size` records and on flush()/close(). A record for a filepath
+    already in the store replaces the old one. One writer at a time;
+    open with readonly=True to query a store another process may be
+    writing.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 readonly: bool = False):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.count = 0
+        self._batch = []
+
+        if readonly:
+            if not os.path.exists(db_path):
+                raise FileNotFoundError(f"Result store not found: {db_path}")
+            uri = 'file:' + os.path.abspath(db_path).replace('?', '%3f') + '?mode=ro'
+            self.conn = sqlite3.connect(uri, uri=True)
+            if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                self.conn.close()
+                raise ValueError(f"Not a result store (or an older version): {db_path}")
+            self._next_id = None
+            return
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        # Index pages for large batches stay in memory between transactions
+        self.conn.execute(f'PRAGMA cache_size = -{CACHE_KIB}')
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.conn.execute('DROP TABLE IF EXISTS records')
+            self.conn.execute('DROP TABLE IF EXISTS fields')
+            self.conn.execute('DROP TABLE IF EXISTS keys')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.executescript(_SCHEMA)
+        self._keys = dict(self.conn.execute('SELECT name, id FROM keys'))
+        self._next_id = self.conn.execute(
+            'SELECT COALESCE(MAX(id), 0) + 1 FROM records').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        self.flush()
+        return self.conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    # Writing --------------------------------------------------------------
+
+    def write(self, metadata: Dict[str, Any]):
+        """Queue one record (records with an 'error' key are ignored)"""
+        if 'error' in metadata:
+            return
+        self._batch.append(metadata)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records: Iterable[Dict[str, Any]]):
+        for metadata in records:
+            self.write(metadata)
+
+    def flush(self):
+        """Insert the buffered records in one transaction"""
+        if not self._batch:
+            return
+        timer = METRICS.start()
+        rows = []
+        fields = []
+        paths = []
+        new_keys = []
+        # A path written twice in one batch keeps its last record
+        batch = list({metadata.get('filepath'): metadata for metadata in self._batch}.values())
+        for metadata in batch:
+            record_id = self._next_id
+            self._next_id += 1
+            row = [record_id]
+            for name, _ in BASIC_COLUMNS:
+                value = metadata.get(name)
+                row.append(int(value) if isinstance(value, bool) else value)
+            derived = derive_columns(metadata)
+            row.extend(derived[name] for name, _ in DERIVED_COLUMNS)
+            rows.append(row)
+            paths.append(metadata.get('filepath'))
+            for key, value in metadata.items():
+                if key not in _BASIC_KEYS and key not in _SKIPPED_KEYS:
+                    key_id = self._keys.get(key)
+                    if key_id is None:
+                        key_id = self._keys[key] = len(self._keys) + 1
+                        new_keys.append((key_id, key))
+                    fields.append((record_id, key_id, _field_value(value)))
+
+        placeholders = ', '.join('?' * (len(COLUMNS) + 1))
+        try:
+            with self.conn:
+                # Re-extracted files replace their previous record
+                stale = self._existing_ids(paths)
+                if stale:
+                    self.conn.executemany('DELETE FROM fields WHERE record_id = ?', stale)
+                    self.conn.executemany('DELETE FROM records WHERE id = ?', stale)
+                self.conn.executemany(
+                    f'INSERT INTO records (id, {", ".join(COLUMNS)}) VALUES ({placeholders})', rows)
+                self.conn.executemany('INSERT INTO keys VALUES (?, ?)', new_keys)
+                self.conn.executemany('INSERT INTO fields VALUES (?, ?, ?)', fields)
+        except sqlite3.Error:
+            # Rolled back: forget key ids that were never stored
+            self._keys = dict(self.conn.execute('SELECT name, id FROM keys'))
+            raise
+        self.count += len(batch)
+        self._batch = []
+        METRICS.stop(timer, 'store_insert', self.db_path)
+
+    def _existing_ids(self, paths: List[str]) -> List[Tuple[int]]:
+        """Ids of records already stored for any of these paths"""
+        ids = []
+        for start in range(0, len(paths), 500):
+            chunk = paths[start:start + 500]
+            marks = ', '.join('?' * len(chunk))
+            ids.extend(self.conn.execute(
+                f'SELECT id FROM records WHERE filepath IN ({marks})', chunk).fetchall())
+        return ids
+
+    # Reading --------------------------------------------------------------
+
+    def select(self, sql: str, params: Sequence[Any] = ()) -> Iterator[Dict[str, Any]]:
+        """Run a read-only query; yields one dict per row"""
+        self.flush()
+        cursor = self.conn.execute(sql, params)
+        names = [d[0] for d in cursor.description]
+        for row in cursor:
+            yield dict(zip(names, row))
+
+    def records(self, ids: Sequence[int]) -> List[Dict[str, Any]]:
+        """Full records (typed columns followed by their side-table fields)"""
+        self.flush()
+        result = []
+        for start in range(0, len(ids), 500):
+            chunk = list(ids[start:start + 500])
+            marks = ', '.join('?' * len(chunk))
+            by_id = {}
+            cursor = self.conn.execute(
+                f'SELECT id, {", ".join(COLUMNS)} FROM records WHERE id IN ({marks})', chunk)
+            for row in cursor:
+                metadata = {}
+                for name, value in zip(COLUMNS, row[1:]):
+                    if value is not None:
+                        metadata[name] = bool(value) if name == 'type_mismatch' else value
+                by_id[row[0]] = metadata
+            cursor = self.conn.execute(
+                'SELECT record_id, name, value FROM fields JOIN keys ON keys.id = fields.key '
+                f'WHERE record_id IN ({marks})', chunk)
+            for record_id, key, value in cursor:
+                by_id[record_id][key] = value
+            result.extend(by_id[i] for i in chunk if i in by_id)
+        return result
+
+    def close(self):
+        """Flush, refresh planner statistics and close the database"""
+        if self.conn is None:
+            return
+        if self._next_id is not None:
+            self.flush()
+            self.conn.execute('PRAGMA optimize')
+        self.conn.close()
+        self.conn = None
+
+
+def build_query(columns: Sequence[str] = (), file_type: Optional[str] = None,
+                extension: Optional[str] = None, camera_make: Optional[str] = None,
+                camera_model: Optional[str] = None, date_from: Optional[str] = None,
+                date_to: Optional[str] = None, date_column: str = 'date_taken',
+                min_size: Optional[int] = None, max_size: Optional[int] = None,
+                fields: Sequence[Tuple[str, Any]] = (), path_like: Optional[str] = None,
+                mismatch_only: bool = False, where: Optional[str] = None,
+                order_by: Optional[str] = None, limit: Optional[int] = None,
+                count: bool = False) -> Tuple[str, List[Any]]:
+    """SQL and parameters selecting `columns` (plus id) from records
+
+    Dates are compared as ISO strings; a date-only `date_to` includes the
+    whole day. `fields` are (key, value) pairs matched in the side table
+    (e.g. ('md5_hash', digest)). `where` is appended verbatim.
+    """
+    for name in list(columns) + [date_column]:
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown column: {name}")
+    clauses = []
+    params = []
+
+    def add(clause, *values):
+        clauses.append(clause)
+        params.extend(values)
+
+    if file_type:
+        add('file_type = ?', file_type)
+    if extension:
+        add('extension = ?', extension.lower() if extension.startswith('.') else
+            '.' + extension.lower())
+    if camera_make:
+        add('camera_make = ? COLLATE NOCASE', camera_make)
+    if camera_model:
+        add('camera_model = ?', camera_model)
+    if date_from:
+        add(f'{date_column} >= ?', normalize_date(date_from) or date_from)
+    if date_to:
+        date_to = normalize_date(date_to) or date_to
+        if len(date_to) == 10:
+            date_to += 'T99'  # sorts after every time of that day
+        add(f'{date_column} <= ?', date_to)
+    if min_size is not None:
+        add('size_bytes >= ?', min_size)
+    if max_size is not None:
+        add('size_bytes <= ?', max_size)
+    if path_like:
+        add('filepath LIKE ?', path_like)
+    if mismatch_only:
+        add('type_mismatch = 1')
+    for key, value in fields:
+        add('id IN (SELECT record_id FROM fields '
+            'WHERE key = (SELECT id FROM keys WHERE name = ?) AND value = ?)', key, value)
+    if where:
+        clauses.append(f'({where})')
+
+    selected = 'COUNT(*) AS count' if count else ', '.join(['id'] + list(columns))
+    sql = f'SELECT {selected} FROM records'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    if order_by and not count:
+        sql += f' ORDER BY {order_by}'
+    if limit is not None and not count:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    return sql, params
+
+
+def coerce_field_value(value: str) -> Any:
+    """Command-line field value: numbers compare as numbers, everything else as text"""
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
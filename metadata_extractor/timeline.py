@@ -0,0 +1,309 @@
+"""Super-timeline: every timestamp of every file in one chronological list
+
+Each record yields one event per timestamp it carries (file system
+created/modified/accessed, EXIF capture dates, media recording dates).
+A case of a few million files gives tens of millions of events, more
+than a workstation can sort in memory, so ExternalSorter sorts them in
+bounded memory:
+
+1. events are buffered until the estimated buffer size reaches the
+   memory limit, then sorted and spilled to a temporary run file
+   (pickled blocks of RUN_BLOCK events)
+2. once every event is in, the runs are merged with a k-way heap merge;
+   with more than MAX_FAN_IN runs, intermediate merge passes combine
+   them first, so open files and read buffers stay bounded too
+
+Events sort by (timestamp, filepath, event). Timestamps are ISO-8601
+local time strings, which sort chronologically as text. The timeline is
+written as CSV or in the layout of mactime's CSV output (events of one
+file at the same second folded into one MACB line).
+"""
+
+import csv
+import heapq
+import io
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+from .metrics import METRICS
+from .sinks import WRITE_BUFFER_SIZE, open_compressed_writer
+from .store import normalize_date
+
+# Record keys that become events; the stat timestamps are used as they are,
+# tag values are normalised to ISO-8601 first
+STAT_EVENTS = ('created', 'modified', 'accessed')
+TAG_EVENTS = ('exif_DateTimeOriginal', 'exif_DateTimeDigitized', 'general_recorded_date',
+              'general_encoded_date')
+EVENT_FIELDS = STAT_EVENTS + TAG_EVENTS
+
+FORMATS = ('csv', 'mactime')
+DEFAULT_TIMELINE_NAME = 'timeline.csv'
+
+DEFAULT_MEMORY_LIMIT = 512 * 1024 * 1024
+
+# Events per pickled block in a run file; one block per run is in memory while merging
+RUN_BLOCK = 1024
+
+# Runs merged at once; more runs are merged in several passes
+MAX_FAN_IN = 64
+
+# Estimated bytes of a buffered event besides its path (tuple, strings, ints)
+EVENT_OVERHEAD = 400
+
+CSV_COLUMNS = ('timestamp', 'event', 'filepath', 'file_type', 'size_bytes', 'hash')
+MACTIME_COLUMNS = ('Date', 'Size', 'Type', 'Mode', 'UID', 'GID', 'Meta', 'File Name')
+
+# MACB position of the stat events in mactime's Type column ('created' is the
+# birth time on Windows, the inode change time elsewhere)
+_MACB = {'modified': 0, 'accessed': 1, 'created': 3}
+
+# (timestamp, filepath, event, file_type, size_bytes, hash, permissions)
+Event = Tuple[str, str, str, str, int, str, str]
+
+
+def record_events(metadata: Dict[str, Any], fields: Sequence[str] = EVENT_FIELDS) -> List[Event]:
+    """Events of one record (none for error records)"""
+    if 'error' in metadata:
+        return []
+    filepath = metadata.get('filepath', '')
+    file_type = metadata.get('file_type', '')
+    size = metadata.get('size_bytes')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        size = -1
+    digest = ''
+    for key in metadata:
+        if key.endswith('_hash'):
+            value = metadata[key]
+            if value and not str(value).startswith('Error:'):
+                digest = value
+            break
+    permissions = metadata.get('permissions') or ''
+
+    events = []
+    for key in fields:
+        value = metadata.get(key)
+        if not value:
+            continue
+        timestamp = value if key in STAT_EVENTS else normalize_date(value)
+        if timestamp:
+            events.append((timestamp, filepath, key, file_type, size, digest, permissions))
+    return events
+
+
+def _estimate_size(event: Event) -> int:
+    return EVENT_OVERHEAD + len(event[1])
+
+
+class ExternalSorter:
+    """Sorts more items than fit in memory: sorted runs spilled to disk, then merged
+
+    `memory_limit` caps the estimated size of the in-memory buffer, as
+    measured by `size_of`. Items must be picklable and mutually
+    comparable. Spill files go to a private directory (named `prefix`...)
+    under `temp_dir` (the system default if None), removed by close().
+    """
+
+    def __init__(self, memory_limit: int = DEFAULT_MEMORY_LIMIT, temp_dir: Optional[str] = None,
+                 size_of: Callable[[Any], int] = lambda item: EVENT_OVERHEAD,
+                 prefix: str = 'metadata_timeline_'):
+        self.memory_limit = max(1, memory_limit)
+        self.temp_dir = temp_dir
+        self.prefix = prefix
+        self.count = 0
+        self.spilled_runs = 0
+        self._size_of = size_of
+        self._buffer = []
+        self._buffered = 0
+        self._runs: List[str] = []
+        self._dir: Optional[str] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, item: Any):
+        self._buffer.append(item)
+        self._buffered += self._size_of(item)
+        self.count += 1
+        if self._buffered >= self.memory_limit:
+            self._spill()
+
+    def add_many(self, items: Iterable[Any]):
+        for item in items:
+            self.add(item)
+
+    def _write_run(self, items: Iterable[Any]) -> str:
+        """Write sorted items as a run file; returns its path"""
+        if self._dir is None:
+            if self.temp_dir:
+                os.makedirs(self.temp_dir, exist_ok=True)
+            self._dir = tempfile.mkdtemp(prefix=self.prefix, dir=self.temp_dir)
+        fd, path = tempfile.mkstemp(suffix='.run', dir=self._dir)
+        with os.fdopen(fd, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            block = []
+            for item in items:
+                block.append(item)
+                if len(block) >= RUN_BLOCK:
+                    pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    block = []
+            if block:
+                pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @staticmethod
+    def _read_run(path: str) -> Iterator[Any]:
+        with open(path, 'rb', buffering=WRITE_BUFFER_SIZE // 4) as f:
+            while True:
+                try:
+                    block = pickle.load(f)
+                except EOFError:
+                    return
+                yield from block
+
+    def _spill(self):
+        timer = METRICS.start()
+        self._buffer.sort()
+        path = self._write_run(self._buffer)
+        self._runs.append(path)
+        self.spilled_runs += 1
+        self._buffer = []
+        self._buffered = 0
+        METRICS.stop(timer, 'timeline_spill', path)
+
+    def sorted(self) -> Iterator[Any]:
+        """Every item added, in order (the sorter can not be added to afterwards)"""
+        self._buffer.sort()
+        runs = self._runs
+        # Leave room for the in-memory buffer as the last input of the final merge
+        while len(runs) >= MAX_FAN_IN:
+            timer = METRICS.start()
+            group, runs = runs[:MAX_FAN_IN], runs[MAX_FAN_IN:]
+            runs.append(self._write_run(heapq.merge(*(self._read_run(p) for p in group))))
+            for path in group:
+                os.remove(path)
+            METRICS.stop(timer, 'timeline_merge_pass')
+        self._runs = runs
+        yield from heapq.merge(*(self._read_run(p) for p in runs), self._buffer)
+
+    def close(self):
+        """Delete the spill files"""
+        self._buffer = []
+        self._runs = []
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+
+def _macb(events: Iterable[str]) -> str:
+    """mactime Type column, e.g. 'm..b'; other events are appended by name"""
+    flags = ['.', '.', '.', '.']
+    other = []
+    for event in events:
+        position = _MACB.get(event)
+        if position is None:
+            other.append(event)
+        else:
+            flags[position] = 'macb'[position]
+    stat = [''.join(flags)] if flags != ['.', '.', '.', '.'] else []
+    return ' '.join(stat + other)
+
+
+class TimelineBuilder:
+    """Collects the events of records and writes them in chronological order"""
+
+    def __init__(self, memory_limit: int = DEFAULT_MEMORY_LIMIT, temp_dir: Optional[str] = None,
+                 fields: Sequence[str] = EVENT_FIELDS):
+        self.fields = tuple(fields)
+        self.records = 0
+        self._sorter = ExternalSorter(memory_limit, temp_dir, size_of=_estimate_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def events(self) -> int:
+        return self._sorter.count
+
+    @property
+    def spilled_runs(self) -> int:
+        return self._sorter.spilled_runs
+
+    def add(self, metadata: Dict[str, Any]):
+        """Add the events of one record"""
+        events = record_events(metadata, self.fields)
+        if events:
+            self.records += 1
+            self._sorter.add_many(events)
+
+    def add_many(self, records: Iterable[Dict[str, Any]]):
+        for metadata in records:
+            self.add(metadata)
+
+    def write(self, path: str, output_format: str = 'csv') -> int:
+        """Write the sorted timeline (.gz/.zst compress); returns the number of rows"""
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown timeline format: {output_format}")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # The private name keeps the extension that selects the compression
+        tmp_path = os.path.join(directory, '.tmp-' + os.path.basename(path))
+        timer = METRICS.start()
+        rows = 0
+        try:
+            with io.TextIOWrapper(open_compressed_writer(tmp_path), encoding='utf-8',
+                                  newline='') as f:
+                writer = csv.writer(f)
+                events = self._sorter.sorted()
+                if output_format == 'csv':
+                    writer.writerow(CSV_COLUMNS)
+                    for timestamp, filepath, event, file_type, size, digest, _ in events:
+                        writer.writerow((timestamp, event, filepath, file_type,
+                                         '' if size < 0 else size, digest))
+                        rows += 1
+                else:
+                    writer.writerow(MACTIME_COLUMNS)
+                    rows = self._write_mactime(writer, events)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            METRICS.stop(timer, 'timeline_write', path)
+        return rows
+
+    @staticmethod
+    def _write_mactime(writer, events: Iterator[Event]) -> int:
+        """mactime CSV rows: events of a file at the same timestamp share one line"""
+        rows = 0
+        pending = None
+        kinds: List[str] = []
+        for event in events:
+            if pending is not None and event[:2] == pending[:2]:
+                kinds.append(event[2])
+                continue
+            if pending is not None:
+                writer.writerow(_mactime_row(pending, kinds))
+                rows += 1
+            pending = event
+            kinds = [event[2]]
+        if pending is not None:
+            writer.writerow(_mactime_row(pending, kinds))
+            rows += 1
+        return rows
+
+    def close(self):
+        self._sorter.close()
+
+
+def _mactime_row(event: Event, kinds: List[str]) -> Tuple[Any, ...]:
+    timestamp, filepath, _, _, size, _, permissions = event
+    return (timestamp, '' if size < 0 else size, _macb(kinds), permissions, '', '', '', filepath)
@@ -0,0 +1,330 @@
+"""Watch drop folders and hand over files once they have finished arriving
+
+On Linux, inotify (through ctypes, no extra dependency) reports new,
+written and moved-in files, so nothing is rescanned after start-up. Other
+platforms, or filesystems where inotify is unavailable, fall back to
+polling the tree. Either way a changed file only becomes a candidate: it
+is released once its size and mtime have not changed for
+`settle_seconds`, so half-copied evidence is never read.
+
+A journal of (size, mtime_ns, path) lines remembers what has been
+processed. It is loaded at start-up, so after a restart only files that
+are new or changed since the last run are processed again.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Dict, List, Iterable, Iterator, Optional, Set, Tuple
+
+from .batch import iter_files
+
+DEFAULT_JOURNAL_NAME = '.metadata_watch_journal'
+
+# Seconds a file's size and mtime must stay unchanged before it is processed
+DEFAULT_SETTLE_SECONDS = 2.0
+
+# Seconds between stability checks (and between tree scans when polling)
+DEFAULT_POLL_INTERVAL = 0.5
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc():
+    """libc with inotify support, or None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return libc
+
+
+_LIBC = _load_libc()
+INOTIFY_AVAILABLE = _LIBC is not None
+
+
+class WatchJournal:
+    """Append-only record of processed files, keyed by path, size and mtime"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._done: Dict[str, Tuple[int, int]] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    size, mtime_ns, filepath = line.rstrip('\n').split('\t', 2)
+                    self._done[filepath] = (int(size), int(mtime_ns))
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __len__(self):
+        return len(self._done)
+
+    def is_done(self, filepath: str, stat: os.stat_result) -> bool:
+        """True if this exact version of the file was already processed"""
+        return self._done.get(filepath) == (stat.st_size, stat.st_mtime_ns)
+
+    def record(self, entries: Iterable[Tuple[str, os.stat_result]]):
+        """Mark a batch as processed; durable once this returns"""
+        lines = []
+        for filepath, stat in entries:
+            self._done[filepath] = (stat.st_size, stat.st_mtime_ns)
+            lines.append(f"{stat.st_size}\t{stat.st_mtime_ns}\t{filepath}\n")
+        if lines:
+            self._file.write(''.join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class _PollingSource:
+    """Find new or changed files by rescanning the tree"""
+
+    mode = 'polling'
+
+    def __init__(self, roots: List[str], recursive: bool, exclude: Set[str]):
+        self.roots = roots
+        self.recursive = recursive
+        self.exclude = exclude
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        self._next_scan = 0.0
+
+    def scan(self) -> List[str]:
+        """Files under the roots that are new or changed since the last scan"""
+        changed = []
+        files = iter_files(self.roots, recursive=self.recursive, exclude_names=self.exclude)
+        for filepath in files:
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+            key = (stat.st_size, stat.st_mtime_ns)
+            if self._seen.get(filepath) != key:
+                self._seen[filepath] = key
+                changed.append(filepath)
+        return changed
+
+    def changes(self, timeout: float, interval: float) -> List[str]:
+        now = time.monotonic()
+        if now < self._next_scan:
+            time.sleep(min(timeout, self._next_scan - now))
+            return []
+        self._next_scan = now + interval
+        return self.scan()
+
+    def close(self):
+        pass
+
+
+class _InotifySource:
+    """Collect changed paths from inotify watches on every directory"""
+
+    mode = 'inotify'
+
+    def __init__(self, roots: List[str], recursive: bool, exclude: Set[str]):
+        self.roots = roots
+        self.recursive = recursive
+        self.exclude = exclude
+        self._dirs: Dict[int, str] = {}
+        self._fd = _LIBC.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        try:
+            for root in roots:
+                if os.path.isdir(root):
+                    self._watch_tree(root)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _watch(self, directory: str):
+        wd = _LIBC.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+        self._dirs[wd] = directory
+
+    def _watch_tree(self, root: str) -> List[str]:
+        """Watch a directory (and its subdirectories); return files already inside
+
+        Raises OSError when a watch cannot be added (e.g. fs.inotify.max_user_watches
+        is exhausted) so the caller can fall back to polling.
+        """
+        files = []
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                self._watch(directory)
+            except OSError as e:
+                if e.errno in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    continue  # vanished or unreadable directory
+                raise
+            subdirs = []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif (entry.is_file(follow_symlinks=False)
+                              and entry.name not in self.exclude):
+                            files.append(entry.path)
+            except OSError:
+                continue  # vanished or unreadable directory
+            if self.recursive:
+                stack.extend(subdirs)
+        return files
+
+    def scan(self) -> List[str]:
+        """Every file under the roots"""
+        return list(iter_files(self.roots, recursive=self.recursive, exclude_names=self.exclude))
+
+    def changes(self, timeout: float, interval: float) -> List[str]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: fall back to one full scan
+                changed.extend(self.scan())
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name or name in self.exclude:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                # New subdirectory: watch it, then pick up whatever already landed in it
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        changed.extend(self._watch_tree(path))
+                    except OSError:
+                        # Out of watches: at least take what is there now
+                        changed.extend(iter_files([path], recursive=True,
+                                                  exclude_names=self.exclude))
+                continue
+            changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class FolderWatcher:
+    """Yield batches of files that are new or changed and have stopped growing
+
+    Call mark_processed() after a batch has been written out; the journal
+    is only updated then, so a crash re-processes the batch instead of
+    losing it.
+    """
+
+    def __init__(self, paths: Iterable[str], journal_path: str,
+                 settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, recursive: bool = True,
+                 exclude_names: Iterable[str] = (), use_inotify: bool = True):
+        self.roots = [os.path.abspath(p) for p in paths]
+        self.settle_seconds = max(0.0, settle_seconds)
+        self.poll_interval = max(0.05, poll_interval)
+        self.exclude = set(exclude_names)
+        self.exclude.add(os.path.basename(journal_path))
+        self.journal = WatchJournal(journal_path)
+
+        self.source = None
+        if use_inotify and INOTIFY_AVAILABLE:
+            try:
+                self.source = _InotifySource(self.roots, recursive, self.exclude)
+            except OSError:
+                self.source = None  # e.g. watch limit reached or unsupported filesystem
+        if self.source is None:
+            self.source = _PollingSource(self.roots, recursive, self.exclude)
+
+        # path -> (size, mtime_ns, monotonic time it last changed)
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+
+    @property
+    def mode(self) -> str:
+        return self.source.mode
+
+    def _note(self, filepath: str):
+        """Start (or keep) tracking a candidate path"""
+        if filepath not in self._pending:
+            self._pending[filepath] = (-1, -1, time.monotonic())
+
+    def _settled(self) -> List[Tuple[str, os.stat_result]]:
+        """Candidates whose size and mtime held still for settle_seconds"""
+        now = time.monotonic()
+        ready = []
+        for filepath, (size, mtime_ns, since) in list(self._pending.items()):
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                del self._pending[filepath]  # deleted or moved away before it settled
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self._pending[filepath] = (stat.st_size, stat.st_mtime_ns, now)
+                continue
+            if now - since < self.settle_seconds:
+                continue
+            del self._pending[filepath]
+            if not self.journal.is_done(filepath, stat):
+                ready.append((filepath, stat))
+        return ready
+
+    def batches(self, stop: Optional[threading.Event] = None
+                ) -> Iterator[List[Tuple[str, os.stat_result]]]:
+        """Yield lists of (filepath, stat) ready to process until `stop` is set"""
+        for filepath in self.source.scan():
+            self._note(filepath)
+
+        while stop is None or not stop.is_set():
+            for filepath in self.source.changes(self.poll_interval, self.poll_interval):
+                self._note(filepath)
+            ready = self._settled()
+            if ready:
+                yield ready
+
+    def mark_processed(self, batch: Iterable[Tuple[str, os.stat_result]]):
+        """Record a finished batch in the journal"""
+        self.journal.record(batch)
+
+    def close(self):
+        self.source.close()
+        self.journal.close()